@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Measure requests per second of the ui/api results server for
+per-jurisdiction lookups over keep-alive connections.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from benchmarks.payloads import cdc_payload
+from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.ui.api import ResultsServer
+from tests.stub_server import StubHTTPServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=60)
+    parser.add_argument('--requests', type=int, default=5000,
+                        help='Requests per client')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--path', default='/regions/S001')
+    args = parser.parse_args()
+
+    with StubHTTPServer() as stub:
+        stub.set_response('GET', '/cdc', body=json.dumps(cdc_payload(args.records)).encode())
+        scraper = CDCCovidCasesScraper('cdc_cases')
+        scraper.url = f'{stub.url}/cdc'
+        with ResultsServer(scraper, port=0) as server:
+            server.update()
+            host, port = server._server.server_address
+
+            def client():
+                connection = http.client.HTTPConnection(host, port)
+                for _ in range(args.requests):
+                    connection.request('GET', args.path)
+                    connection.getresponse().read()
+                connection.close()
+
+            threads = [threading.Thread(target=client) for _ in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+    total = args.requests * args.clients
+    print(f'{total} requests in {elapsed:.2f} s: {total / elapsed:,.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Compare record-by-record line protocol encoding with the columnar NumPy
+RegionColumns path on a synthetic CDC payload, and time a vectorized
+aggregate against a Python loop. Requires numpy.
+"""
+import argparse
+import time
+from benchmarks.payloads import cdc_region_records
+from data_processing.encoders import RegionColumns
+from data_processing.scrapers import CDCCovidCasesScraper
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    encoder = CDCCovidCasesScraper('cdc_cases').encoder
+    records = cdc_region_records(args.records)
+    timestamp = 1678230480
+
+    rows_elapsed, row_lines = timed(
+        lambda: list(encoder.encode_records(records, timestamp)), args.repeat)
+    build_elapsed, columns = timed(
+        lambda: RegionColumns.from_records(records, encoder), args.repeat)
+    encode_elapsed, column_lines = timed(lambda: columns.encode(timestamp), args.repeat)
+    loop_elapsed, loop_total = timed(
+        lambda: sum(record['tot_cases'] for record in records if record['tot_cases']),
+        args.repeat)
+    total_elapsed, total = timed(lambda: columns.total('tot_cases'), args.repeat)
+
+    print(f'records:         {args.records}')
+    print(f'encode_records:  {rows_elapsed * 1000:10.1f} ms')
+    print(f'columns build:   {build_elapsed * 1000:10.1f} ms')
+    print(f'columns encode:  {encode_elapsed * 1000:10.1f} ms '
+          f'({rows_elapsed / encode_elapsed:.2f}x, '
+          f'{rows_elapsed / (build_elapsed + encode_elapsed):.2f}x including build)')
+    print(f'total (loop):    {loop_elapsed * 1000:10.3f} ms')
+    print(f'total (numpy):   {total_elapsed * 1000:10.3f} ms')
+    print(f'identical output: {row_lines == column_lines and loop_total == total}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Compare bytes on the wire and end-to-end write latency of compressed
+and uncompressed InfluxDBAPIv2Exporter.write_to_bucket calls against a
+local stub server. --bandwidth simulates a slow (WAN) link.
+"""
+import argparse
+import json
+import statistics
+import time
+from data_processing.exporters import InfluxDBAPIv2Exporter
+from tests.stub_server import StubHTTPServer
+
+
+def synthetic_line_protocol(lines):
+    return '\n'.join(
+        f'cases,abbr=S{i % 60},fips={i % 60:02d},jurisdiction=State\\ {i % 60} '
+        f'total_cases={1000000 + i}i,total_deaths={10000 + i % 977}i,'
+        f'death_per_100k={i % 500}.0,rate_per_100k={30000 + i % 9000}.0 '
+        f'{1678230480 + i}'
+        for i in range(lines))
+
+
+def run(exporter, server, data, compression, repeat):
+    latencies = []
+    wire_bytes = 0
+    for _ in range(repeat):
+        server.requests.clear()
+        start = time.perf_counter()
+        exporter.write_to_bucket(data, precision='s', compression=compression)
+        latencies.append(time.perf_counter() - start)
+        wire_bytes = len(server.requests[-1].body)
+    return {
+        'compression': compression or 'none',
+        'wire_bytes': wire_bytes,
+        'median_ms': statistics.median(latencies) * 1000,
+        'min_ms': min(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--level', type=int, default=6)
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='Simulated link bandwidth in bytes/s')
+    args = parser.parse_args()
+
+    data = synthetic_line_protocol(args.lines)
+    buckets = json.dumps({'buckets': [{'name': 'bench'}]}).encode()
+    with StubHTTPServer(bandwidth=args.bandwidth) as server:
+        server.set_response('GET', '/api/v2/buckets', body=buckets)
+        server.set_response('POST', '/api/v2/write', status=204, body=b'')
+        exporter = InfluxDBAPIv2Exporter(
+            server.url, 'bench', 'bench', 'token',
+            compression_level=args.level)
+        print(f'payload: {args.lines} lines, {len(data.encode())} bytes')
+        for compression in (None, 'deflate', 'gzip'):
+            result = run(exporter, server, data, compression, args.repeat)
+            print(
+                f"{result['compression']:>8}: "
+                f"{result['wire_bytes']:>10} bytes on the wire, "
+                f"median {result['median_ms']:8.1f} ms, "
+                f"min {result['min_ms']:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
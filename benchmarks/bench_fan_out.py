@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Compare fetching many endpoints one after another with
+FanOutHTTPEndpointScraper, against a local stub server that adds a fixed
+latency to every response.
+"""
+import argparse
+import json
+import time
+from benchmarks.payloads import cdc_payload
+from data_processing.base import FanOutHTTPEndpointScraper, HTTPEndpointScraper
+from tests.stub_server import StubHTTPServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--endpoints', type=int, nargs='+', default=[1, 5, 10, 25, 50])
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per response')
+    parser.add_argument('--records', type=int, default=60, help='Records per response')
+    parser.add_argument('--max-per-host', type=int, default=8)
+    args = parser.parse_args()
+
+    body = json.dumps(cdc_payload(args.records)).encode('utf-8')
+    with StubHTTPServer(latency=args.latency) as stub:
+        stub.set_response('GET', '/data', body=body)
+        print(f'{args.latency * 1000:.0f} ms latency per response, '
+              f'max {args.max_per_host} requests per host')
+        print(f'{"endpoints":>10}{"sequential":>14}{"fan-out":>14}')
+        for endpoints in args.endpoints:
+            urls = [f'{stub.url}/data?id={i}' for i in range(endpoints)]
+            scraper = HTTPEndpointScraper(urls[0])
+            start = time.perf_counter()
+            for url in urls:
+                scraper.url = url
+                scraper.scrape()
+            sequential = time.perf_counter() - start
+            scraper.close()
+
+            fan_out = FanOutHTTPEndpointScraper(urls, max_per_host=args.max_per_host)
+            start = time.perf_counter()
+            fan_out.scrape()
+            concurrent = time.perf_counter() - start
+            fan_out.close()
+            print(f'{endpoints:>10}{sequential * 1000:>11.0f} ms{concurrent * 1000:>11.0f} ms'
+                  f' ({sequential / concurrent:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
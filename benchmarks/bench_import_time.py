@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Measure the cold import time of the entry points with
+python -X importtime, listing the slowest imports and which heavy
+dependencies each one pulls in.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    'data_processing.ui.cli',
+    'data_processing.ui.api',
+    'data_processing.base',
+    'data_processing.encoders',
+    'data_processing.exporters',
+    'data_processing.scrapers',
+]
+HEAVY_MODULES = ['requests', 'urllib3', 'numpy', 'yaml', 'aiohttp', 'orjson']
+
+
+def import_times(module):
+    """Import module in a fresh interpreter. Returns a list of
+    (cumulative microseconds, module name) for every module imported;
+    names of nested imports keep their indentation.
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        times.append((int(cumulative_us), name[1:].rstrip()))
+    return times
+
+
+def heaviest_children(times, module):
+    """Return the (microseconds, name) imports made directly by module,
+    slowest first. -X importtime lists imports after their children.
+    """
+    end = next(index for index, (_, name) in enumerate(times) if name.strip() == module)
+    children = []
+    for us, name in reversed(times[:end]):
+        if not name.startswith(' '):
+            break
+        if not name.startswith('   '):
+            children.append((us, name.strip()))
+    return sorted(children, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        totals = [dict((name.strip(), us) for us, name in times)[module] for times in runs]
+        loaded = {name.strip() for _, name in runs[0]}
+        heavy = [name for name in HEAVY_MODULES if name in loaded] or ['none']
+        print(f'{module}: {statistics.median(totals) / 1000:.1f} ms '
+              f'(median of {args.repeat}), heavy imports: {", ".join(heavy)}')
+        for us, name in heaviest_children(runs[0], module)[:args.top]:
+            print(f'    {us / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Compare JSON decoding of a synthetic CDC payload: requests'
+response.json() (charset detection and the stdlib json module) against
+HTTPEndpointScraper.decode_json with each json_decoder option, which
+decode straight from the response bytes.
+"""
+import argparse
+import gc
+import json
+import time
+import requests
+from benchmarks.payloads import cdc_payload
+from data_processing.base import HTTPEndpointScraper
+
+DECODERS = ['json', 'orjson', 'auto']
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def make_response(body, content_type):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers['Content-Type'] = content_type
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--content-type', default='text/plain',
+                        help="Response Content-Type (the CDC endpoint's is text/plain-like "
+                             'without a charset)')
+    args = parser.parse_args()
+
+    for records in args.records:
+        body = json.dumps(cdc_payload(records)).encode('utf-8')
+        response = make_response(body, args.content_type)
+        baseline, expected = timed(response.json, args.repeat)
+        print(f'{records} records ({len(body) / 1e6:.1f} MB), Content-Type: {args.content_type}')
+        print(f'    {"response.json()":<24}{baseline * 1000:10.1f} ms')
+        for decoder in DECODERS:
+            try:
+                scraper = HTTPEndpointScraper('http://localhost', json_decoder=decoder)
+            except ImportError:
+                print(f'    {decoder:<24}{"not installed":>13}')
+                continue
+            elapsed, data = timed(lambda: scraper.decode_json(response), args.repeat)
+            assert data == expected
+            print(f'    {decoder:<24}{elapsed * 1000:10.1f} ms ({baseline / elapsed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compare CDCCovidCasesScraper line protocol encoding throughput on a
+synthetic payload against the original per-key membership-test encoder.
+"""
+import argparse
+import time
+from benchmarks.payloads import cdc_payload
+from data_processing.scrapers import CDCCovidCasesScraper
+
+
+def legacy_encode(scraper):
+    """Original CDCCovidCasesScraper line protocol encoding, kept as the
+    benchmark reference
+    """
+    lines = []
+    for record in scraper.region_data:
+        tag_str = ''
+        field_str = ''
+
+        for key in record:
+            if record[key] and key not in scraper.IGNORED_KEYS:
+                value = record[key]
+
+                if isinstance(value, str):
+                    value = value.replace(' ', '\\ ')
+
+                if key in scraper.TAG_KEYS:
+                    tag_str += f'{scraper.KEY_MAP[key]}={value},'
+                else:
+                    if key in scraper.KEY_MAP:
+                        field_str += f'{scraper.KEY_MAP[key]}={value},'
+                    else:
+                        field_str += f'{key}={value},'
+
+        line_protocol_str = f'{scraper.measurement},'
+        line_protocol_str += f'{tag_str[:-1]} '
+        line_protocol_str += f'{field_str[:-1]} '
+        line_protocol_str += f'{int(scraper.updated_at)}'
+        lines.append(line_protocol_str)
+    return lines
+
+
+def current_encode(scraper):
+    scraper.line_protocol_lines = []
+    scraper._parse_region_data_to_line_protocol_lines()
+    return scraper.line_protocol_lines
+
+
+def best_of(func, scraper, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(scraper)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    scraper = CDCCovidCasesScraper('cdc_cases')
+    scraper.data = cdc_payload(args.records)
+    scraper.update()
+
+    results = {}
+    for name, func in (('legacy', legacy_encode), ('current', current_encode)):
+        elapsed, lines = best_of(func, scraper, args.repeat)
+        results[name] = (elapsed, lines)
+        print(f'{name:>8}: {elapsed * 1000:8.1f} ms, '
+              f'{args.records / elapsed:12,.0f} records/s')
+    legacy_elapsed, legacy_lines = results['legacy']
+    current_elapsed, current_lines = results['current']
+    print(f' speedup: {legacy_elapsed / current_elapsed:.2f}x')
+    print(f'identical output: {current_lines == legacy_lines}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Compare single-process line protocol encoding with ParallelEncoder
+across worker counts and payload sizes, and report the smallest payload
+at which the process pool beats encoding in the main process. Pools are
+started (and warmed up) before timing; the startup cost is reported
+separately.
+"""
+import argparse
+import os
+import time
+from benchmarks.payloads import cdc_region_records
+from data_processing.encoders.parallel import ParallelEncoder
+from data_processing.scrapers import CDCCovidCasesScraper
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 50000, 100000, 500000])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, cpus} & set(range(1, cpus + 1))))
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    encoder = CDCCovidCasesScraper('cdc_cases').encoder
+    timestamp = 1678230480
+    records = cdc_region_records(max(args.sizes))
+    pools = {}
+    for workers in args.workers:
+        start = time.perf_counter()
+        pool = ParallelEncoder(encoder, workers, args.chunk_size, min_records=0)
+        list(pool.encode(records[:args.chunk_size * workers], timestamp))
+        pools[workers] = pool
+        print(f'pool startup, {workers} workers: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    print(f'\n{cpus} CPUs, chunks of {args.chunk_size} records')
+    header = ''.join(f'{f"{workers} workers":>20}' for workers in args.workers)
+    print(f'{"records":>10}{"serial":>12}{header}')
+    break_even = None
+    for size in args.sizes:
+        sample = records[:size]
+        serial_elapsed, serial_lines = timed(
+            lambda: list(encoder.encode_records(sample, timestamp)), args.repeat)
+        row = f'{size:>10}{serial_elapsed * 1000:>10.1f}ms'
+        for workers, pool in pools.items():
+            elapsed, lines = timed(lambda: list(pool.encode_lines(sample, timestamp)), args.repeat)
+            assert lines == serial_lines
+            row += f'{elapsed * 1000:>10.1f}ms ({serial_elapsed / elapsed:4.2f}x)'
+            if elapsed < serial_elapsed and break_even is None:
+                break_even = size
+        print(row)
+    for pool in pools.values():
+        pool.close()
+    if break_even is None:
+        print('\nParallel encoding did not beat serial encoding at these sizes')
+    else:
+        print(f'\nParallel encoding pays off from {break_even} records')
+
+
+if __name__ == '__main__':
+    main()
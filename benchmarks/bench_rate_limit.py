@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Compare concurrent writers without rate_limit, with adaptive
+concurrency only, and with a token bucket just under the server's quota,
+against a local stub server that answers 429 (with Retry-After) to
+requests over a quota of --capacity requests per second.
+"""
+import argparse
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from data_processing.base import HTTPRESTController
+from data_processing.base.rate_limit import HOST_LIMITERS
+from tests.stub_server import StubHTTPServer
+
+
+class QuotaServer:
+    """Stub response accepting at most capacity requests per window
+    seconds, like a per-second write quota
+    """
+
+    def __init__(self, capacity, latency, window=1.0):
+        self.capacity = capacity
+        self.latency = latency
+        self.window = window
+        self.throttled = 0
+        self._window_start = time.monotonic()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._count = 0
+            if self._count >= self.capacity:
+                self.throttled += 1
+                retry_after = math.ceil(self._window_start + self.window - now)
+                return 429, {'Retry-After': str(retry_after)}, b''
+            self._count += 1
+        time.sleep(self.latency)
+        return 204, {}, b''
+
+
+def run(url, writers, requests, rate_limit):
+    HOST_LIMITERS.clear()
+    controllers = [
+        HTTPRESTController(url, {}, retries=20, backoff_factor=0.05, rate_limit=rate_limit)
+        for _ in range(writers)]
+
+    def write(controller):
+        return [controller.post('/write', data=b'x').status_code for _ in range(requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        statuses = [status for result in executor.map(write, controllers) for status in result]
+    elapsed = time.perf_counter() - start
+    for controller in controllers:
+        controller.session.close()
+    return elapsed, statuses.count(204)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=25, help='Requests per writer')
+    parser.add_argument('--capacity', type=int, default=100, help='Requests per second served')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per response')
+    args = parser.parse_args()
+
+    modes = {
+        'off': None,
+        'adaptive': {'initial_concurrency': args.writers},
+        'token bucket': {'rate': args.capacity * 0.95, 'burst': 1,
+                         'initial_concurrency': args.writers},
+    }
+    print(f'{args.writers} writers x {args.requests} requests, server quota '
+          f'{args.capacity} requests/s, {args.latency * 1000:.0f} ms per response')
+    print(f'{"rate_limit":>14}{"time":>10}{"ok":>7}{"429s":>7}{"ok/s":>8}')
+    for label, rate_limit in modes.items():
+        server = QuotaServer(args.capacity, args.latency)
+        with StubHTTPServer() as stub:
+            stub.responses[('POST', '/write')] = server
+            elapsed, ok = run(stub.url, args.writers, args.requests, rate_limit)
+        print(f'{label:>14}{elapsed:>8.2f} s{ok:>7}{server.throttled:>7}{ok / elapsed:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare the memory held by CDC region data kept as decoded dicts with
+the same regions as CDCRegionRecord objects (the form
+CDCCovidCasesScraper.region_data now takes), on a synthetic payload
+decoded from JSON, plus the cost of building the records and encoding
+either form.
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from benchmarks.payloads import cdc_region_records
+from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.scrapers.cdc_covid_cases import CDCRegionRecord
+
+
+def decoded_records(count, chunk=100000):
+    """Synthetic regions decoded from JSON, so every record owns its
+    strings as in a scraped payload
+    """
+    records = []
+    for start in range(0, count, chunk):
+        body = json.dumps(cdc_region_records(min(chunk, count - start), seed=start))
+        records += json.loads(body)
+    return records
+
+
+def traced_bytes():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def encode_seconds(encoder, records):
+    start = time.perf_counter()
+    for _ in encoder.encode_records(records, 0):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--encode-records', type=int, default=100000,
+                        help='Records to time encoding on')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    baseline = traced_bytes()
+    dicts = decoded_records(args.records)
+    dict_bytes = traced_bytes() - baseline
+    records = list(map(CDCRegionRecord.from_dict, dicts))
+    del dicts
+    record_bytes = traced_bytes() - baseline
+    tracemalloc.stop()
+    del records
+
+    encoder = CDCCovidCasesScraper('cdc_cases').encoder
+    dicts = decoded_records(args.encode_records)
+    start = time.perf_counter()
+    records = list(map(CDCRegionRecord.from_dict, dicts))
+    build_elapsed = time.perf_counter() - start
+    dict_encode = min(encode_seconds(encoder, dicts) for _ in range(3))
+    record_encode = min(encode_seconds(encoder, records) for _ in range(3))
+
+    mib = 1024 * 1024
+    print(f'records:            {args.records:,}')
+    print(f'dicts:              {dict_bytes / mib:8.0f} MiB ({dict_bytes / args.records:.0f} B/record)')
+    print(f'CDCRegionRecord:    {record_bytes / mib:8.0f} MiB ({record_bytes / args.records:.0f} B/record)'
+          f', {dict_bytes / record_bytes:.1f}x smaller')
+    print(f'build {args.encode_records:,} records:  {build_elapsed * 1000:6.0f} ms')
+    print(f'encode {args.encode_records:,} dicts:   {dict_encode * 1000:6.0f} ms')
+    print(f'encode {args.encode_records:,} records: {record_encode * 1000:6.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare reloading an archived CDC payload from its JSON response body
+with reloading it from a memory-mapped columnar snapshot, and reading
+back a gzip line protocol archive.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks.payloads import cdc_payload
+from data_processing.exporters import LineProtocolFileExporter, Snapshot
+from data_processing.exporters.file import line_protocol_files, read_line_protocol_files
+from data_processing.scrapers import CDCCovidCasesScraper
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=200000)
+    args = parser.parse_args()
+
+    scraper = CDCCovidCasesScraper('cdc_cases')
+    payload = cdc_payload(args.records)
+    scraper.data = payload
+    scraper.update()
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'payload.json')
+        with open(json_path, 'w') as json_file:
+            json.dump(payload, json_file)
+        snapshot_path = os.path.join(directory, 'payload.snap')
+        write_elapsed, _ = timed(lambda: scraper.save_snapshot(snapshot_path))
+
+        def load_json():
+            with open(json_path, 'rb') as json_file:
+                return json.load(json_file)['US_MAP_DATA']
+
+        def load_snapshot():
+            with Snapshot(snapshot_path) as snapshot:
+                return list(snapshot.iter_records())
+
+        def sum_snapshot_column():
+            with Snapshot(snapshot_path) as snapshot:
+                view = snapshot.column('tot_cases')
+                total = sum(view)
+                view.release()
+                return total
+
+        json_elapsed, _ = timed(load_json)
+        snapshot_elapsed, _ = timed(load_snapshot)
+        column_elapsed, _ = timed(sum_snapshot_column)
+
+        archive = os.path.join(directory, 'archive')
+        with LineProtocolFileExporter(archive, compression='gzip') as exporter:
+            archive_elapsed, _ = timed(
+                lambda: exporter.write_batches(scraper.line_protocol_lines, precision='s'))
+        read_elapsed, lines = timed(
+            lambda: sum(1 for _ in read_line_protocol_files(line_protocol_files(archive))))
+
+        print(f'records:               {args.records}')
+        print(f'json size:             {os.path.getsize(json_path):>12,} bytes')
+        print(f'snapshot size:         {os.path.getsize(snapshot_path):>12,} bytes')
+        print(f'snapshot write:        {write_elapsed * 1000:10.1f} ms')
+        print(f'json load:             {json_elapsed * 1000:10.1f} ms')
+        print(f'snapshot load records: {snapshot_elapsed * 1000:10.1f} ms')
+        print(f'snapshot sum column:   {column_elapsed * 1000:10.1f} ms')
+        print(f'gzip archive write:    {archive_elapsed * 1000:10.1f} ms')
+        print(f'gzip archive read:     {read_elapsed * 1000:10.1f} ms ({lines} lines)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Minimal benchmark harness: timed repeats, latency percentiles, peak
+memory and comparison against a stored JSON baseline
+"""
+import json
+import time
+import tracemalloc
+
+
+class BenchmarkResult:
+    """Timings (seconds) of repeated runs of one benchmark that each
+    processed items units of work (records, lines, bytes...)
+    """
+
+    def __init__(self, name, timings, items, peak_memory):
+        self.name = name
+        self.timings = sorted(timings)
+        self.items = items
+        self.peak_memory = peak_memory
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the timings"""
+        rank = max(1, -(-percent * len(self.timings) // 100))
+        return self.timings[int(rank) - 1]
+
+    @property
+    def throughput(self):
+        """Items per second at the median timing"""
+        median = self.percentile(50)
+        return self.items / median if median else float('inf')
+
+    def to_dict(self):
+        return {
+            'throughput': self.throughput,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'peak_memory': self.peak_memory,
+        }
+
+
+class Regression:
+    def __init__(self, name, metric, baseline, current):
+        self.name = name
+        self.metric = metric
+        self.baseline = baseline
+        self.current = current
+
+    def __str__(self):
+        return f'{self.name} {self.metric}: {self.baseline:.6g} -> {self.current:.6g}'
+
+
+def run_benchmark(name, func, items, repeat=20, warmup=2, setup=None):
+    """Call func(setup()) warmup + repeat times, timing only func. Peak
+    memory is measured with tracemalloc in one extra untimed run, since
+    tracing slows everything down.
+    """
+    setup = setup or (lambda: None)
+    for _ in range(warmup):
+        func(setup())
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+    argument = setup()
+    tracemalloc.start()
+    try:
+        func(argument)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name, timings, items, peak_memory)
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Return a Regression for every metric that is more than tolerance
+    (a fraction) worse than the baseline. Throughput regresses when it
+    drops, latency and memory when they grow.
+    """
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            continue
+        current = result.to_dict()
+        for metric, value in current.items():
+            if metric not in expected:
+                continue
+            if metric == 'throughput':
+                worse = value < expected[metric] * (1 - tolerance)
+            else:
+                worse = value > expected[metric] * (1 + tolerance)
+            if worse:
+                regressions.append(Regression(result.name, metric, expected[metric], value))
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, 'r') as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline_file:
+        json.dump(
+            {result.name: result.to_dict() for result in results},
+            baseline_file,
+            indent=2,
+            sort_keys=True)
+
+
+def format_results(results, baseline=None):
+    baseline = baseline or {}
+    rows = [f'{"benchmark":<24}{"items/s":>14}{"p50 ms":>10}{"p90 ms":>10}'
+            f'{"p99 ms":>10}{"peak MiB":>10}{"vs base":>9}']
+    for result in results:
+        stats = result.to_dict()
+        change = ''
+        if result.name in baseline:
+            change = f'{stats["throughput"] / baseline[result.name]["throughput"]:.2f}x'
+        rows.append(
+            f'{result.name:<24}{stats["throughput"]:>14,.0f}'
+            f'{stats["p50"] * 1000:>10.2f}{stats["p90"] * 1000:>10.2f}'
+            f'{stats["p99"] * 1000:>10.2f}{stats["peak_memory"] / 1048576:>10.2f}'
+            f'{change:>9}')
+    return '\n'.join(rows)
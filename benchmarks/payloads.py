@@ -0,0 +1,42 @@
+"""Synthetic payloads shaped like the CDC US_MAP_DATA endpoint"""
+import random
+
+UPDATE = 'Mar  7 2023  3:08PM'
+
+
+def cdc_region_records(count, seed=0):
+    """Return count CDC-style region records, including the ignored keys
+    the real endpoint sends
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            'abbr': f'S{i % 1000:03d}',
+            'fips': f'{i:05d}',
+            'name': f'Synthetic Jurisdiction {i}',
+            'tot_cases': rng.randint(1000, 10000000),
+            'tot_death': rng.randint(10, 100000),
+            'death_100k': rng.randint(0, 600),
+            'new_cases07': rng.randint(0, 50000),
+            'new_deaths07': rng.randint(0, 500),
+            'Seven_day_cum_new_cases_per_100k': round(rng.uniform(0, 200), 1),
+            'Seven_day_cum_new_deaths_per_100k': round(rng.uniform(0, 5), 1),
+            'incidence': rng.randint(10000, 50000),
+            'id': i,
+            'us_trend_maxdate': '2023-03-01',
+            'burden': 'Low',
+            'burden_text': 'Low burden of cases',
+            'change': 'Decrease',
+            'change_text': 'Decrease in cases over last week',
+            'data_as_of': '2023-03-07',
+        })
+    return records
+
+
+def cdc_payload(count, seed=0):
+    """Return a decoded CDC US_MAP_DATA style payload with count records"""
+    return {
+        'CSVInfo': {'filename': 'US_MAP_DATA', 'update': UPDATE},
+        'US_MAP_DATA': cdc_region_records(count, seed),
+    }
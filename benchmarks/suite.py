@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Benchmark the scrape, parse, encode and export stages against a local
+stub server with a synthetic CDC payload, and compare the results with a
+stored baseline. Exits non-zero when a stage regresses by more than
+--tolerance.
+
+    python -m benchmarks.suite --records 10000 --save-baseline
+    python -m benchmarks.suite --records 10000
+
+The suite also runs under pytest (BENCH_RECORDS, BENCH_REPEAT and
+BENCH_BASELINE environment variables configure it):
+
+    python -m pytest benchmarks/suite.py
+"""
+import argparse
+import json
+import os
+import sys
+from benchmarks.harness import (
+    compare,
+    format_results,
+    load_baseline,
+    run_benchmark,
+    save_baseline
+)
+from benchmarks.payloads import cdc_payload
+from data_processing.base import HTTPEndpointScraper
+from data_processing.exporters import InfluxDBAPIv2Exporter
+from data_processing.scrapers import CDCCovidCasesScraper
+from tests.stub_server import StubHTTPServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def bench_scrape(server, records, repeat):
+    scraper = HTTPEndpointScraper(f'{server.url}/cdc')
+
+    def setup():
+        server.requests.clear()
+        scraper.reset()
+
+    return run_benchmark(
+        'scrape',
+        lambda _: scraper.scrape(),
+        records,
+        repeat=repeat,
+        setup=setup)
+
+
+def bench_update(payload, records, repeat):
+    scraper = CDCCovidCasesScraper('cdc_cases')
+
+    def setup():
+        scraper.reset()
+        scraper.data = payload
+
+    return run_benchmark(
+        'update',
+        lambda _: scraper.update(),
+        records,
+        repeat=repeat,
+        setup=setup)
+
+
+def bench_line_protocol_data(payload, records, repeat):
+    scraper = CDCCovidCasesScraper('cdc_cases')
+    scraper.data = payload
+    scraper.update()
+    return run_benchmark(
+        'line_protocol_data',
+        lambda _: scraper.line_protocol_data,
+        records,
+        repeat=repeat)
+
+
+def bench_write_to_bucket(server, payload, records, repeat):
+    scraper = CDCCovidCasesScraper('cdc_cases')
+    scraper.data = payload
+    scraper.update()
+    data = scraper.line_protocol_data
+    exporter = InfluxDBAPIv2Exporter(server.url, 'bench', 'bench', 'token')
+    return run_benchmark(
+        'write_to_bucket',
+        lambda _: exporter.write_to_bucket(data, precision='s'),
+        records,
+        repeat=repeat,
+        setup=server.requests.clear)
+
+
+def run_suite(records=10000, repeat=20):
+    """Run every stage and return their BenchmarkResults"""
+    payload = cdc_payload(records)
+    body = json.dumps(payload).encode()
+    buckets = json.dumps({'buckets': [{'name': 'bench'}]}).encode()
+    with StubHTTPServer() as server:
+        server.set_response('GET', '/cdc', body=body)
+        server.set_response('GET', '/api/v2/buckets', body=buckets)
+        server.set_response('POST', '/api/v2/write', status=204, body=b'')
+        return [
+            bench_scrape(server, records, repeat),
+            bench_update(payload, records, repeat),
+            bench_line_protocol_data(payload, records, repeat),
+            bench_write_to_bucket(server, payload, records, repeat),
+        ]
+
+
+def test_suite():
+    records = int(os.environ.get('BENCH_RECORDS', 1000))
+    repeat = int(os.environ.get('BENCH_REPEAT', 5))
+    baseline = load_baseline(os.environ.get('BENCH_BASELINE', DEFAULT_BASELINE))
+    results = run_suite(records, repeat)
+    print(format_results(results, baseline))
+    regressions = compare(results, baseline)
+    assert not regressions, '\n'.join(str(regression) for regression in regressions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed fractional slowdown before failing (default 0.2)')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.records, args.repeat)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(format_results(results))
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    baseline = load_baseline(args.baseline)
+    print(format_results(results, baseline))
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,20 @@
-from data_processing.base.http_endpoint_scraper import HTTPEndpointScraper
-from data_processing.base.http_rest_controller import HTTPRESTController
-from data_processing.base.token_auth import TokenAuth
+from data_processing.lazy import lazy_exports
+
+_EXPORTS = {
+    'HTTPEndpointScraper': 'data_processing.base.http_endpoint_scraper',
+    'FanOutHTTPEndpointScraper': 'data_processing.base.fan_out',
+    'HTTPRESTController': 'data_processing.base.http_rest_controller',
+    'TokenAuth': 'data_processing.base.token_auth',
+    'AsyncHTTPRESTController': 'data_processing.base.async_http_rest_controller',
+    'Backfill': 'data_processing.base.backfill',
+    'date_pages': 'data_processing.base.backfill',
+    'offset_pages': 'data_processing.base.backfill',
+    'HostLimiter': 'data_processing.base.rate_limit',
+    'TokenBucket': 'data_processing.base.rate_limit',
+    'record_class': 'data_processing.base.records',
+    'Metrics': 'data_processing.base.metrics',
+    'NULL_METRICS': 'data_processing.base.metrics',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from data_processing.base.http_rest_controller import HTTPRESTController
+
+
+class AsyncHTTPRESTController(HTTPRESTController):
+    """asyncio counterpart of HTTPRESTController. get, put and post take
+    the same arguments but return coroutines. Requests share one session
+    whose worker threads (and, unless pool_maxsize is given, connection
+    pool) are sized to max_concurrency, which caps the number of requests
+    in flight.
+    """
+
+    def __init__(self, *args, max_concurrency=10, **kwargs):
+        self.max_concurrency = max_concurrency
+        self.executor = None
+        kwargs.setdefault('pool_maxsize', max_concurrency)
+        super().__init__(*args, **kwargs)
+
+    def setup_session(self):
+        super().setup_session()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    def close(self):
+        """Close pooled connections and stop worker threads"""
+        self.session.close()
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            partial(func, *args, **kwargs))
+
+    async def _get(self, url):
+        return await self._run(super()._get, url)
+
+    async def _put(self, url, data=None):
+        return await self._run(super()._put, url, data=data)
+
+    async def _post(self, url, data=None, headers=None):
+        return await self._run(super()._post, url, data=data, headers=headers)
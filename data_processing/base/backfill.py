@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from requests import Session
+from requests.adapters import HTTPAdapter
+from data_processing.base.metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillNotSupportedError(Exception):
+    def __init__(self, scraper_name):
+        super().__init__(f'{scraper_name} has no page_url_template to backfill from')
+
+
+def date_pages(start, end, step=timedelta(days=1), date_format='%Y-%m-%d'):
+    """Yield formatted dates from start to end inclusive (date objects
+    or ISO date strings)
+    """
+    if isinstance(start, str):
+        start = date.fromisoformat(start)
+    if isinstance(end, str):
+        end = date.fromisoformat(end)
+    while start <= end:
+        yield start.strftime(date_format)
+        start += step
+
+
+def offset_pages(start, stop, page_size):
+    """Yield page offsets from start up to (not including) stop"""
+    yield from range(start, stop, page_size)
+
+
+class Backfill:
+    """Fetch historical pages of a scraper and write them to an exporter.
+
+    pages is an iterable of page keys (e.g. date_pages or offset_pages)
+    passed to scraper.fetch_page() and scraper.page_lines(). Up to workers
+    pages are fetched, encoded and written concurrently, each as its own
+    write_batches call, so pages may land in any order. pages is consumed
+    lazily and only in-flight pages are held in memory, so memory use
+    does not grow with the size of the range.
+
+    With checkpoint_path, progress is saved after every page as the
+    number of pages below which every page has finished, plus the
+    finished pages above it (at most workers) and the failed pages. A new
+    Backfill over the same pages resumes from the checkpoint, skipping
+    finished pages and retrying failed ones. pages must yield the same
+    keys in the same order for a checkpoint to be reused.
+    """
+
+    def __init__(self, scraper, exporter, pages, checkpoint_path=None, workers=4,
+                 precision='s', max_lines=5000, max_bytes=4194304, metrics=None):
+        self.scraper = scraper
+        self.exporter = exporter
+        self.pages = pages
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.precision = precision
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.metrics = metrics or NULL_METRICS
+        self.stopped = threading.Event()
+        self.exported = 0
+        self.skipped = 0
+        self.lines = 0
+        self.failed = []
+        self._next = 0
+        self._done = set()
+        self._failed = set()
+        self.load()
+
+    def load(self):
+        """Load the checkpoint, if there is one"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'r') as checkpoint_file:
+            state = json.load(checkpoint_file)
+        self._next = state['next']
+        self._done = set(state['done'])
+        self._failed = set(state['failed'])
+
+    def save(self):
+        if not self.checkpoint_path:
+            return
+        state = {
+            'next': self._next,
+            'done': sorted(self._done),
+            'failed': sorted(self._failed),
+        }
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as checkpoint_file:
+                json.dump(state, checkpoint_file, separators=(',', ':'))
+            os.replace(tmp_path, self.checkpoint_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def run(self):
+        """Backfill every unfinished page. Returns the pages that failed
+        in this run; stop() (or KeyboardInterrupt) finishes the pages in
+        flight, saves the checkpoint and returns early.
+        """
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        in_flight = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            pages = enumerate(self.pages)
+            while not self.stopped.is_set():
+                # Only pull the next pages once a worker is free
+                for index, page in pages:
+                    if self._is_finished(index):
+                        self.skipped += 1
+                        continue
+                    future = executor.submit(self._export_page, page, session)
+                    in_flight[future] = (index, page)
+                    if len(in_flight) >= self.workers:
+                        break
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._finish(*in_flight.pop(future), future)
+        finally:
+            self.stopped.set()
+            for future in list(in_flight):
+                self._finish(*in_flight.pop(future), future)
+            executor.shutdown()
+            session.close()
+            self.save()
+        return self.failed
+
+    def stop(self):
+        self.stopped.set()
+
+    def _is_finished(self, index):
+        if index in self._failed:
+            return False
+        return index < self._next or index in self._done
+
+    def _export_page(self, page, session):
+        with self.metrics.stage('backfill_page', source=self.scraper.__class__.__name__) as stage:
+            data = self.scraper.fetch_page(page, session)
+            lines = self.scraper.page_lines(page, data)
+            results = self.exporter.write_batches(
+                lines, precision=self.precision, max_lines=self.max_lines,
+                max_bytes=self.max_bytes)
+            stage.set(batches=len(results), lines=sum(result.lines for result in results))
+        return results
+
+    def _finish(self, index, page, future):
+        try:
+            results = future.result()
+        except Exception:
+            logger.exception('Backfill of page %s failed', page)
+            results = None
+        if results is not None and all(result.ok for result in results):
+            self.exported += 1
+            self.lines += sum(result.lines for result in results)
+            self._failed.discard(index)
+        else:
+            if results is not None:
+                logger.warning('Backfill of page %s: %d of %d batches failed', page,
+                               sum(not result.ok for result in results), len(results))
+            self.failed.append(page)
+            self._failed.add(index)
+        if index >= self._next:
+            self._done.add(index)
+        # Advance past the contiguous run of finished pages
+        while self._next in self._done:
+            self._done.remove(self._next)
+            self._next += 1
+        self.save()
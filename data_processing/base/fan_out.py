@@ -0,0 +1,130 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+from requests import Session
+from requests.adapters import HTTPAdapter
+from data_processing.base.http_endpoint_scraper import HTTPEndpointScraper
+
+
+class FanOutError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        target, error = next(iter(errors.items()))
+        message = f'{len(errors)} of the fan-out requests failed, e.g. {target}: {error!r}'
+        super().__init__(message)
+
+
+class FanOutHTTPEndpointScraper(HTTPEndpointScraper):
+    """Scraper for many endpoints at once, e.g. one CDC data id or state
+    per request. targets maps a key to a URL, or to a dict of query
+    parameters for url (a list of URLs or parameter dicts is keyed by
+    position). scrape() fetches every target concurrently over one
+    pooled session, with at most max_workers requests in flight and at
+    most max_per_host per host, so wall time grows with the slowest
+    host rather than the number of targets.
+
+    Decoded bodies are stored in self.results by key and passed to
+    merge(), whose return value becomes self.data. Targets that fail are
+    kept in self.errors; scrape() raises FanOutError for them unless
+    allow_partial is set. Subclasses implement merge() and update().
+    """
+
+    def __init__(self, targets, url=None, max_workers=16, max_per_host=4,
+                 allow_partial=False, data_format='json', metrics=None, json_decoder='auto'):
+        self.set_targets(targets, max_workers, max_per_host, allow_partial)
+        super().__init__(url, data_format=data_format, metrics=metrics,
+                         json_decoder=json_decoder)
+
+    def set_targets(self, targets, max_workers=16, max_per_host=4, allow_partial=False):
+        """Set the targets and fan-out limits (see the class docstring).
+        Subclasses that also inherit another scraper's __init__ call this
+        from theirs instead of FanOutHTTPEndpointScraper.__init__.
+        """
+        if not isinstance(targets, dict):
+            targets = dict(enumerate(targets))
+        self.targets = targets
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.allow_partial = allow_partial
+
+    def reset(self):
+        super().reset()
+        self.results = {}
+        self.errors = {}
+
+    def scrape(self):
+        if self.results or self.errors or self.data:
+            self.reset()
+        session = self._get_session()
+        source = self.__class__.__name__
+        queues = {}
+        for key, target in self.targets.items():
+            url, params = self._request(target)
+            queues.setdefault(urlsplit(url).netloc, deque()).append((key, url, params))
+        active = dict.fromkeys(queues, 0)
+        running = {}
+        results = {}
+        with self.metrics.stage('fan_out', source=source) as stage, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while queues or running:
+                # A target is only submitted once its host has a free slot,
+                # so workers never sit blocked behind a slow host
+                for host, key, url, params in self._ready(queues, active, len(running)):
+                    running[executor.submit(self._fetch, session, url, params)] = key, host
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, host = running.pop(future)
+                    active[host] -= 1
+                    try:
+                        results[key] = future.result()
+                    except Exception as error:
+                        self.errors[key] = error
+            stage.set(targets=len(self.targets), errors=len(self.errors))
+        self.results = {key: results[key] for key in self.targets if key in results}
+        if self.errors and not self.allow_partial:
+            raise FanOutError(self.errors)
+        self.data = self.merge(self.results)
+
+    def merge(self, results):
+        """Combine the decoded bodies (dict of key -> body) into
+        self.data. Returns results unchanged by default.
+        """
+        return results
+
+    def _request(self, target):
+        if isinstance(target, dict):
+            return self.url, target
+        return target, None
+
+    def _fetch(self, session, url, params):
+        response = session.get(url, params=params, headers=self.headers)
+        response.raise_for_status()
+        if 'json' in self.headers['Accept']:
+            return self.decode_json(response)
+        return response.content
+
+    def _ready(self, queues, active, running):
+        """Take queued targets, one per host in turn, for hosts below
+        max_per_host until max_workers requests would be running
+        """
+        ready = []
+        while queues and running + len(ready) < self.max_workers:
+            hosts = [host for host in queues if active[host] < self.max_per_host]
+            if not hosts:
+                break
+            for host in hosts[:self.max_workers - running - len(ready)]:
+                ready.append((host, *queues[host].popleft()))
+                active[host] += 1
+                if not queues[host]:
+                    del queues[host]
+        return ready
+
+    def _get_session(self):
+        if not self.session:
+            self.session = Session()
+            # Enough pooled connections per host for max_per_host requests
+            adapter = HTTPAdapter(pool_connections=self.max_workers,
+                                  pool_maxsize=self.max_per_host)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        return self.session
@@ -1,25 +1,152 @@
-from requests import get
+from requests import Session
+from data_processing.base.backfill import BackfillNotSupportedError
+from data_processing.base.json_decode import json_loads, response_json_body
+from data_processing.base.json_stream import JSONStream
+from data_processing.base.metrics import NULL_METRICS
+from data_processing.base.response_cache import ResponseCache
+
+
+class ByteCounter:
+    """Iterate over chunks while counting their total size"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.bytes = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.bytes += len(chunk)
+            yield chunk
 
 
 class HTTPEndpointScraper:
-    """Base class for HTTP endpoint scrapers"""
+    """Base class for HTTP endpoint scrapers. With a Metrics collector,
+    scrapes are recorded as fetch and decode stages (or a single stream
+    stage when streaming).
 
-    def __init__(self, url, data_format='json'):
+    JSON bodies are decoded from the response bytes with json_decoder
+    (see json_loads: 'auto' uses orjson when it is installed), honouring
+    a declared charset instead of guessing one.
+
+    Subclasses support historical backfill (see Backfill) with a
+    page_url_template containing '{page}' and a page_lines()
+    implementation.
+    """
+
+    def __init__(self, url, data_format='json', stream_path=None, chunk_size=65536,
+                 cache_dir=None, metrics=None, page_url_template=None, json_decoder='auto'):
         self.url = url
+        self.json_loads = json_loads(json_decoder)
+        self.page_url_template = page_url_template
         self.headers = {'Accept': f'application/{data_format}'}
+        self.stream_path = stream_path
+        self.chunk_size = chunk_size
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.metrics = metrics or NULL_METRICS
+        self.session = None
         self.reset()
 
     def scrape(self):
         """Generic scrape method. Calls reset method if self.response or
         self.data eval as True, makes HTTP get to self.url and stores as
         self.response, and sets value of self.data based on accept header
-        data type (only supports json currently)
+        data type (only supports json currently). When self.stream_path is
+        set the body is parsed incrementally instead of being loaded whole.
+        With a cache_dir, the request is conditional and self.changed is set
+        to False (leaving self.data empty) when the server answers 304 or
+        the body is identical to the cached one. A new body is only cached
+        once commit() is called, after its data has been exported.
         """
+        if self.stream_path and 'json' in self.headers['Accept']:
+            records = list(self.iter_records())
+            if self.changed:
+                self._set_path(self.data, self.stream_path, records)
+            return
         if self.response or self.data:
             self.reset()
-        self.response = self._get_url()
+        source = self.__class__.__name__
+        with self.metrics.stage('fetch', source=source) as stage:
+            self.response = self._get_url()
+            if self.metrics.enabled:
+                stage.set(status=self.response.status_code, bytes=len(self.response.content))
+        if self.cache and self.cache.is_unchanged(self.url, self.response):
+            self.changed = False
+            return
+        if 'json' in self.headers['Accept']:
+            with self.metrics.stage('decode', source=source):
+                self.data = self.decode_json(self.response)
+        if self.cache:
+            self.cache.store(self.url, self.response)
+
+    def iter_records(self):
+        """Stream the response in self.chunk_size chunks and yield the
+        records of the JSON array at self.stream_path (e.g. 'US_MAP_DATA'
+        or 'outer.inner'). Sibling values are collected into self.data as
+        they are reached, so peak memory grows with record size rather than
+        payload size. With a cache_dir the body is first streamed to a
+        staged cache file and hashed, and nothing is yielded (self.changed
+        is False) when it is a 304 or hashes the same as the cached body.
+        """
+        if self.response or self.data:
+            self.reset()
+        self.response = self._get_url(stream=True)
+        if self.response.status_code == 304:
+            self.changed = False
+            self.response.close()
+            return
+        chunks = self.response.iter_content(self.chunk_size)
+        counter = None
+        if self.metrics.enabled:
+            chunks = counter = ByteCounter(chunks)
+        records = 0
+        # The stream stage also covers the time spent consuming records
+        with self.metrics.stage('stream', source=self.__class__.__name__) as stage:
+            try:
+                if self.cache:
+                    # Hashed before parsing, so an unchanged body is not
+                    # decoded and encoded again when the server ignores the
+                    # conditional request headers
+                    if not self.cache.stage_stream(self.url, self.response, chunks):
+                        self.changed = False
+                        return
+                    chunks = self.cache.staged_chunks(self.url, self.chunk_size)
+                stream = JSONStream(chunks, self.stream_path)
+                self.data = stream.siblings
+                for record in stream:
+                    records += 1
+                    yield record
+            finally:
+                self.response.close()
+                if counter:
+                    stage.set(status=self.response.status_code, bytes=counter.bytes,
+                              records=records)
+
+    def page_url(self, page):
+        """Return the URL of a backfill page, e.g. a date or an offset"""
+        if not self.page_url_template:
+            raise BackfillNotSupportedError(self.__class__.__name__)
+        return self.page_url_template.format(page=page)
+
+    def fetch_page(self, page, session=None):
+        """GET a backfill page and return its decoded body. Unlike
+        scrape() this leaves the scraper's state alone, so pages can be
+        fetched from several threads sharing one session.
+        """
+        session = session or self.session or Session()
+        response = session.get(self.page_url(page), headers=self.headers)
+        response.raise_for_status()
         if 'json' in self.headers['Accept']:
-            self.data = self.response.json()
+            return self.decode_json(response)
+        return response.content
+
+    def page_lines(self, page, data):
+        """Method child classes should implement to return (or yield) the
+        line protocol lines of a backfill page's decoded body
+        """
+        raise NotImplementedError
+
+    def decode_json(self, response):
+        return self.json_loads(response_json_body(response))
 
     def update(self):
         """Method child classes should implement to handle their specific
@@ -27,10 +154,57 @@ class HTTPEndpointScraper:
         """
         raise NotImplementedError
 
+    def load_cache(self):
+        """Set self.data from the cached response body, e.g. after a 304 in
+        a fresh process. Returns False if nothing is cached.
+        """
+        body = self.cache.body(self.url) if self.cache else None
+        if body is None:
+            return False
+        self.data = self.json_loads(body)
+        return True
+
+    def commit(self):
+        """Cache the responses scraped since the last reset(); call after
+        their data has been exported, so a failed export is retried on the
+        next scrape instead of being skipped as unchanged
+        """
+        if self.cache:
+            self.cache.commit()
+
+    def close(self):
+        """Close the HTTP session"""
+        if self.session:
+            self.session.close()
+            self.session = None
+
     def reset(self):
-        """Resets all data attributes to default None/null values"""
+        """Resets all data attributes to default None/null values and
+        drops responses staged for the cache but not committed
+        """
+        if self.cache:
+            self.cache.discard()
         self.response = None
         self.data = {}
+        self.changed = True
+
+    @staticmethod
+    def _set_path(data, path, value):
+        keys = path.split('.') if isinstance(path, str) else list(path)
+        for key in keys[:-1]:
+            data = data.setdefault(key, {})
+        data[keys[-1]] = value
+
+    def _request_headers(self):
+        if not self.cache:
+            return self.headers
+        return {**self.headers, **self.cache.validators(self.url)}
 
-    def _get_url(self):
-        return get(self.url, headers=self.headers)
+    def _get_url(self, stream=False):
+        # The session is kept across scrapes so connections are reused
+        if not self.session:
+            self.session = Session()
+        headers = self._request_headers()
+        if stream:
+            return self.session.get(self.url, headers=headers, stream=True)
+        return self.session.get(self.url, headers=headers)
@@ -1,15 +1,74 @@
+import random
+import time
 from requests import Session
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode
+from urllib3.util.retry import Retry
+from data_processing.base.metrics import NULL_METRICS
+from data_processing.base.rate_limit import HOST_LIMITERS, THROTTLE_STATUS_CODES, parse_retry_after
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry that adds up to backoff_jitter seconds of random
+    jitter to the exponential backoff, so clients retrying together spread
+    out. Retry-After headers are still honoured first.
+    """
+
+    BACKOFF_MAX = 60
+
+    def __init__(self, *args, backoff_jitter=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backoff_jitter = backoff_jitter
+
+    def new(self, **kwargs):
+        kwargs.setdefault('backoff_jitter', self.backoff_jitter)
+        return super().new(**kwargs)
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if not backoff or not self.backoff_jitter:
+            return backoff
+        return min(self.BACKOFF_MAX, backoff + random.uniform(0, self.backoff_jitter))
 
 
 class HTTPRESTController:
-    """Base class for HTTP REST controllers"""
+    """Base class for HTTP REST controllers. Requests share a pooled
+    session with connect/read timeouts and retry transient failures
+    (RETRY_STATUS_CODES and connection errors) with jittered exponential
+    backoff. With a Metrics collector, every request is recorded as an
+    http_request stage.
 
-    def __init__(self, base_url, headers, auth=None, verify=True):
+    With rate_limit (True, or a dict of HostLimiter settings such as
+    rate, burst and max_concurrency), requests wait for the limiter
+    shared by every controller targeting the same host: a token bucket
+    and an AIMD concurrency limit. Throttled responses (429/503) are then
+    retried here instead of by urllib3, so their Retry-After pauses all
+    of those controllers rather than just the one that was throttled.
+    """
+
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    # InfluxDB writes are idempotent, so POST is safe to retry
+    RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'POST'])
+
+    def __init__(self, base_url, headers, auth=None, verify=True,
+                 pool_connections=10, pool_maxsize=10, timeout=(5, 30),
+                 retries=3, backoff_factor=0.5, backoff_jitter=0.5, metrics=None,
+                 rate_limit=None):
         self.base_url = base_url
         self.headers = headers
         self.auth = auth
         self.verify = verify
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.metrics = metrics or NULL_METRICS
+        self.limiter = None
+        if rate_limit:
+            settings = rate_limit if isinstance(rate_limit, dict) else {}
+            self.limiter = HOST_LIMITERS.get(base_url, **settings)
         self.setup_session()
 
     def setup_session(self):
@@ -18,6 +77,28 @@ class HTTPRESTController:
         if self.auth:
             self.session.auth = self.auth
         self.session.verify = self.verify
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.build_retry())
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def build_retry(self):
+        """Return the retry policy mounted on the session"""
+        status_codes = self.RETRY_STATUS_CODES
+        if self.limiter:
+            # Throttling is retried by _request, through the limiter (urllib3
+            # would also retry any throttled response with a Retry-After)
+            status_codes = [code for code in status_codes if code not in THROTTLE_STATUS_CODES]
+        return JitteredRetry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=status_codes,
+            allowed_methods=self.RETRY_METHODS,
+            respect_retry_after_header=not self.limiter,
+            raise_on_status=False)
 
     def get(self, endpoint, params=None):
         """Make GET request to given endpoint with params on self.url"""
@@ -31,11 +112,14 @@ class HTTPRESTController:
         url = self.build_url(endpoint, params)
         return self._put(url, data=data)
 
-    def post(self, endpoint, data=None, params=None):
+    def post(self, endpoint, data=None, params=None, headers=None):
         """Make POST request to endpoint on self.url with given data
-        and params
+        and params. Optional headers are merged over the session headers
+        for this request only.
         """
         url = self.build_url(endpoint, params)
+        if headers:
+            return self._post(url, data=data, headers=headers)
         return self._post(url, data=data)
 
     def build_url(self, endpoint, params=None):
@@ -48,14 +132,61 @@ class HTTPRESTController:
         return urlencode(params)
 
     def _get(self, url):
-        return self.session.get(url)
+        return self._request('GET', url)
 
     def _put(self, url, data=None):
         if not data:
-            return self.session.put(url)
-        return self.session.put(url, data=data)
+            return self._request('PUT', url)
+        return self._request('PUT', url, data=data)
 
-    def _post(self, url, data=None):
+    def _post(self, url, data=None, headers=None):
+        return self._post_sync(url, data=data, headers=headers)
+
+    def _post_sync(self, url, data=None, headers=None):
+        # Blocking even on AsyncHTTPRESTController, whose _post is a
+        # coroutine, for callers running outside the event loop
         if not data:
-            return self.session.post(url)
-        return self.session.post(url, data=data)
+            return self._request('POST', url, headers=headers)
+        return self._request('POST', url, data=data, headers=headers)
+
+    def _request(self, method, url, **kwargs):
+        if self.limiter:
+            return self._limited_request(method, url, **kwargs)
+        with self.metrics.stage('http_request', method=method,
+                                source=self.__class__.__name__) as stage:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            if self.metrics.enabled:
+                data = kwargs.get('data')
+                stage.set(
+                    status=response.status_code,
+                    request_bytes=len(data) if isinstance(data, (bytes, str)) else 0,
+                    response_bytes=int(response.headers.get('Content-Length', 0)))
+        return response
+
+    def _limited_request(self, method, url, **kwargs):
+        for attempt in range(self.retries + 1):
+            with self.metrics.stage('http_request', method=method,
+                                    source=self.__class__.__name__) as stage:
+                waited = self.limiter.acquire()
+                start = time.monotonic()
+                response = None
+                try:
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                finally:
+                    status_code = response.status_code if response is not None else None
+                    retry_after = None
+                    if status_code in THROTTLE_STATUS_CODES:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    throttled = self.limiter.release(
+                        time.monotonic() - start, status_code, retry_after)
+                if self.metrics.enabled:
+                    data = kwargs.get('data')
+                    stage.set(
+                        status=status_code,
+                        request_bytes=len(data) if isinstance(data, (bytes, str)) else 0,
+                        response_bytes=int(response.headers.get('Content-Length', 0)),
+                        wait=waited,
+                        throttled=throttled)
+            if not throttled or attempt == self.retries:
+                return response
+            response.close()
@@ -0,0 +1,67 @@
+import codecs
+import json
+
+JSON_DECODERS = ('auto', 'orjson', 'json')
+
+
+class UnknownJSONDecoderError(Exception):
+    def __init__(self, decoder):
+        message = f"'{decoder}' is not a supported JSON decoder. "
+        message += f'Supported decoders: {list(JSON_DECODERS)} or a callable'
+        super().__init__(message)
+
+
+def json_loads(decoder='auto'):
+    """Return a function decoding JSON from bytes or str. decoder is
+    'json' (the standard library), 'orjson' (raises ImportError if it is
+    not installed), 'auto' (orjson when installed, falling back to json
+    for documents orjson rejects, such as integers over 64 bits), or a
+    callable taking bytes or str.
+    """
+    if callable(decoder):
+        return decoder
+    if decoder == 'json':
+        return json.loads
+    if decoder == 'orjson':
+        import orjson
+        return orjson.loads
+    if decoder != 'auto':
+        raise UnknownJSONDecoderError(decoder)
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+
+    def loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+    return loads
+
+
+def declared_charset(content_type):
+    """Return the charset parameter of a Content-Type header, or None"""
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+    return None
+
+
+def response_json_body(response):
+    """Return the body of a JSON response for a json_loads decoder: the
+    raw bytes when they are UTF-8 (declared, or undeclared as RFC 8259
+    requires), otherwise text decoded with the declared charset. Unlike
+    response.json() this never guesses the encoding.
+    """
+    charset = declared_charset(response.headers.get('Content-Type', ''))
+    if charset:
+        try:
+            codec = codecs.lookup(charset).name
+        except LookupError:
+            codec = 'utf-8'
+        if codec != 'utf-8':
+            return response.content.decode(codec)
+    return response.content
@@ -0,0 +1,107 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+class JSONStream:
+    """Incrementally parse a JSON object from an iterable of str or bytes
+    chunks. Iterating yields the items of the array found at path (a
+    dotted string or sequence of keys); every other value is decoded
+    normally and collected into self.siblings, which mirrors the document
+    with the streamed array left out. Only the current item and unparsed
+    chunk data are held in memory.
+    """
+
+    def __init__(self, chunks, path):
+        self.chunks = iter(chunks)
+        self.path = tuple(path.split('.')) if isinstance(path, str) else tuple(path)
+        self.siblings = {}
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        yield from self._parse_object(self.siblings, 0)
+        if self._peek() is not None:
+            raise json.JSONDecodeError('Extra data', self._buffer, self._pos)
+
+    def _parse_object(self, target, depth):
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode_value()
+            self._expect(':')
+            if depth < len(self.path) and key == self.path[depth]:
+                if depth == len(self.path) - 1:
+                    yield from self._parse_array()
+                else:
+                    target[key] = {}
+                    yield from self._parse_object(target[key], depth + 1)
+            else:
+                target[key] = self._decode_value()
+            if self._expect(',}') == '}':
+                return
+
+    def _parse_array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            if self._expect(',]') == ']':
+                return
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._read()
+                continue
+            # A value ending exactly at the buffer end may be a truncated
+            # number or literal, so only trust it once more data is seen
+            if end == len(self._buffer) and not self._eof:
+                self._read()
+                continue
+            self._pos = end
+            return value
+
+    def _peek(self):
+        """Skip whitespace and return the next character (None at EOF)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                return None
+            self._read()
+
+    def _expect(self, characters):
+        char = self._peek()
+        if char is None or char not in characters:
+            message = f'Expecting one of {characters!r}'
+            raise json.JSONDecodeError(message, self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def _read(self):
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._text_decoder.decode(chunk)
+            if chunk:
+                self._buffer += chunk
+                return
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        self._eof = True
@@ -0,0 +1,140 @@
+import collections
+import threading
+import time
+
+
+class Stage:
+    """Timing context for one pipeline stage. Extra fields (byte counts,
+    record counts, HTTP status...) are added with set(). An exception
+    raised inside the block is recorded as an error field.
+    """
+
+    __slots__ = ('metrics', 'name', 'tags', 'fields', 'timestamp', '_start')
+
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+        self.fields = {}
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.timestamp = time.time_ns()
+        self._start = self.metrics.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        duration = self.metrics.clock() - self._start
+        self.metrics.record(self.name, duration, self.fields, self.timestamp, **self.tags)
+        return False
+
+
+class NullStage:
+    """Stage that records nothing, shared by every NullMetrics.stage call"""
+
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Metrics:
+    """Thread-safe collector of per-stage self-metrics (duration, bytes,
+    records, HTTP status...), kept as line protocol points of measurement
+    tagged with the stage name, the given tags and any per-stage tags. At
+    most max_samples points are buffered; the oldest are dropped first.
+    Use export() to write them to InfluxDB through an exporter.
+    """
+
+    enabled = True
+
+    def __init__(self, measurement='pipeline_stage', tags=None, max_samples=100000,
+                 clock=time.perf_counter):
+        self.measurement = measurement
+        self.tags = tags or {}
+        self.clock = clock
+        self._encoder = None
+        self.dropped = 0
+        self._samples = collections.deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            # Imported on first flush, so importing data_processing.base
+            # does not load the encoders package
+            from data_processing.encoders import LineProtocolEncoder
+            self._encoder = LineProtocolEncoder(self.measurement)
+        return self._encoder
+
+    def stage(self, name, **tags):
+        """Return a context manager timing the stage called name"""
+        return Stage(self, name, tags)
+
+    def record(self, name, duration, fields=None, timestamp=None, **tags):
+        """Record one stage sample. duration is in seconds, timestamp in
+        nanoseconds since the epoch (default now).
+        """
+        point_tags = {**self.tags, 'stage': name, **tags}
+        point_fields = {'duration_ms': duration * 1000.0}
+        if fields:
+            point_fields.update(fields)
+        if timestamp is None:
+            timestamp = time.time_ns()
+        with self._lock:
+            if len(self._samples) == self._samples.maxlen:
+                self.dropped += 1
+            self._samples.append((point_tags, point_fields, timestamp))
+
+    def flush(self):
+        """Remove and return buffered samples as line protocol lines"""
+        with self._lock:
+            samples = list(self._samples)
+            self._samples.clear()
+        lines = (self.encoder.encode(*sample) for sample in samples)
+        return [line for line in lines if line is not None]
+
+    def export(self, exporter):
+        """Write buffered samples with exporter (an InfluxDBAPIv2Exporter,
+        typically for a separate bucket) at nanosecond precision
+        """
+        lines = self.flush()
+        if not lines:
+            return []
+        return exporter.write_batches(lines, precision='ns')
+
+
+class NullMetrics:
+    """Disabled collector: stage() returns a shared no-op context, so
+    instrumented code costs one method call per stage
+    """
+
+    enabled = False
+
+    def stage(self, name, **tags):
+        return NULL_STAGE
+
+    def record(self, name, duration, fields=None, timestamp=None, **tags):
+        pass
+
+    def flush(self):
+        return []
+
+    def export(self, exporter):
+        return []
+
+
+NULL_METRICS = NullMetrics()
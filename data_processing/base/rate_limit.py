@@ -0,0 +1,197 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value, clock=time.time):
+    """Return the seconds to wait from a Retry-After header (delay in
+    seconds or an HTTP date), or None if it is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - clock())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket allowing rate requests per second on average with
+    bursts of up to burst. pause() empties it until a deadline, e.g. for
+    a Retry-After.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.paused_until = 0.0
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available. Returns the
+        seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self.tokens = min(self.burst,
+                                      self.tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    # Tolerate float rounding in the refill, or waiting for
+                    # the next token could end in a spin of tiny sleeps
+                    if self.tokens >= 1 - 1e-9:
+                        self.tokens = max(0.0, self.tokens - 1)
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Hand out no tokens for seconds, and start empty afterwards"""
+        with self._lock:
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self._updated_at = self.paused_until
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent requests. Every limit requests completed
+    without throttling raise the limit by one (additive increase); a
+    throttled response, or a latency above latency_tolerance times the
+    lowest latency seen, multiplies it by backoff (multiplicative
+    decrease). Decreases are applied at most once per latency window, so
+    a burst of throttled responses to requests sent together only counts
+    once.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, backoff=0.5, latency_tolerance=None,
+                 clock=time.monotonic):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.clock = clock
+        self.in_flight = 0
+        self.min_latency = None
+        self._successes = 0
+        self._decreased_at = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            slow = self.latency_tolerance and latency > self.min_latency * self.latency_tolerance
+            if throttled or slow:
+                self._decrease(latency)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self._successes = 0
+                    self.limit = min(self.maximum, self.limit + 1)
+            self._condition.notify_all()
+
+    def _decrease(self, latency):
+        now = self.clock()
+        if self._decreased_at is not None and now - self._decreased_at < latency:
+            return
+        self._decreased_at = now
+        self._successes = 0
+        self.limit = max(self.minimum, int(self.limit * self.backoff))
+
+
+class HostLimiter:
+    """Token bucket (if rate is set) and adaptive concurrency for one
+    host. Throttled responses pause the bucket for their Retry-After, or
+    for throttle_pause seconds without one.
+    """
+
+    def __init__(self, rate=None, burst=None, initial_concurrency=4, max_concurrency=64,
+                 latency_tolerance=None, throttle_pause=1.0, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.bucket = TokenBucket(rate, burst, clock, sleep) if rate else None
+        self.concurrency = AdaptiveConcurrency(
+            initial_concurrency, maximum=max_concurrency,
+            latency_tolerance=latency_tolerance, clock=clock)
+        self.throttle_pause = throttle_pause
+        self.clock = clock
+        self.sleep = sleep
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def acquire(self):
+        """Wait for a token and a concurrency slot. Returns the seconds
+        waited.
+        """
+        start = self.clock()
+        # Without a bucket, a Retry-After still holds every request back
+        while self.clock() < self.paused_until:
+            self.sleep(self.paused_until - self.clock())
+        if self.bucket:
+            self.bucket.acquire()
+        self.concurrency.acquire()
+        return self.clock() - start
+
+    def release(self, latency, status_code=None, retry_after=None):
+        """Release the slot taken by acquire() with the outcome of the
+        request (status_code None for a connection error)
+        """
+        throttled = status_code in THROTTLE_STATUS_CODES
+        if throttled:
+            self.throttled += 1
+            pause = retry_after if retry_after is not None else self.throttle_pause
+            self.paused_until = max(self.paused_until, self.clock() + pause)
+            if self.bucket:
+                self.bucket.pause(pause)
+        self.concurrency.release(latency, throttled)
+        return throttled
+
+
+class HostLimiters:
+    """Registry of HostLimiter objects by host (and port), so every
+    controller targeting a host shares its limits. The settings of the
+    first get() for a host create its limiter.
+    """
+
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **settings):
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = HostLimiter(**settings)
+        return limiter
+
+    def clear(self):
+        with self._lock:
+            self._limiters.clear()
+
+
+HOST_LIMITERS = HostLimiters()
@@ -0,0 +1,144 @@
+import keyword
+import re
+from collections.abc import Mapping
+from operator import attrgetter
+
+NUMBER = re.compile(r'-?\d+(\.\d+)?([eE][-+]?\d+)?\Z')
+
+
+class InvalidRecordKeyError(Exception):
+    def __init__(self, key):
+        message = f"'{key}' cannot be a record key. Record keys must be identifiers "
+        message += 'that do not start with an underscore or shadow a Record method'
+        super().__init__(message)
+
+
+def parse_number(value):
+    """Return value as an int or float if it is a numeric string such as
+    '42' or '-1.5e3', otherwise unchanged
+    """
+    if value.__class__ is not str:
+        return value
+    match = NUMBER.match(value)
+    if match is None:
+        return value
+    if match.group(1) or match.group(2):
+        return float(value)
+    return int(value)
+
+
+class Record(Mapping):
+    """Read-only mapping over the slots of a class made by record_class.
+    Missing (None) values are left out, as if the key were absent, so a
+    record encodes, compares and serializes (dict(record)) like the dict
+    it was built from, minus the ignored keys.
+    """
+
+    __slots__ = ()
+    KEYS = ()
+    TAG_KEYS = frozenset()
+    IGNORED_KEYS = frozenset()
+
+    def __getitem__(self, key):
+        if key in self._key_set:
+            value = getattr(self, key)
+        else:
+            value = self._extra.get(key) if self._extra else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def items(self):
+        # A list rather than a view: encoders iterate it once per record,
+        # and building it in a comprehension is faster than a generator
+        pairs = [(key, value) for key, value in zip(self.KEYS, self._values(self))
+                 if value is not None]
+        if self._extra:
+            pairs += self._extra.items()
+        return pairs
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self.items())!r})'
+
+    def __reduce__(self):
+        return self.__class__, (*self._values(self), self._extra)
+
+    @classmethod
+    def _extras(cls, data):
+        """Keys outside the schema, kept so new upstream fields are not
+        silently dropped
+        """
+        extra = {}
+        for key, value in data.items():
+            if key not in cls._known:
+                extra[key] = parse_number(value)
+        return extra
+
+
+def _values_getter(keys):
+    """Return a function reading the slots of keys as a tuple"""
+    get = attrgetter(*keys)
+    if len(keys) > 1:
+        return get
+    return lambda record: (get(record),)
+
+
+def record_class(name, keys, tag_keys=(), ignored_keys=(), module=None):
+    """Return a Record subclass with one slot per key (in output order).
+    from_dict(data) keeps the keys, dropping ignored_keys, and converts
+    numeric strings in every key except tag_keys to int or float once.
+    Other keys are kept in a small overflow dict. Pass module=__name__
+    and assign the class to a module-level name of the same name, so
+    records can be pickled (e.g. for a ParallelEncoder).
+    """
+    keys = tuple(keys)
+    for key in keys:
+        if (not key.isidentifier() or keyword.iskeyword(key) or key.startswith('_')
+                or hasattr(Record, key)):
+            raise InvalidRecordKeyError(key)
+    tag_keys = frozenset(tag_keys)
+    # Generated like dataclasses do, so building a record is one call
+    # without a per-key loop. Locals start with an underscore, which no
+    # key can.
+    arguments = ''.join(f', {key}=None' for key in keys)
+    init = [f'def __init__(_self{arguments}, _extra=None):']
+    init += [f'    _self.{key} = {key}' for key in keys]
+    init += ['    _self._extra = _extra']
+    from_dict = ['def from_dict(_cls, _data):', '    _get = _data.get']
+    for key in keys:
+        if key in tag_keys:
+            from_dict.append(f'    {key} = _get({key!r})')
+        else:
+            from_dict.append(
+                f'    {key} = _number(_value) if (_value := _get({key!r})).__class__ is str '
+                'else _value')
+    from_dict += [
+        '    _extra = None if _known.issuperset(_data) else _cls._extras(_data)',
+        f'    return _cls({", ".join(keys)}, _extra)',
+    ]
+    namespace = {'_number': parse_number, '_known': frozenset(keys) | frozenset(ignored_keys)}
+    exec('\n'.join(init), namespace)
+    exec('\n'.join(from_dict), namespace)
+    attributes = {
+        '__slots__': keys + ('_extra',),
+        '__init__': namespace['__init__'],
+        'from_dict': classmethod(namespace['from_dict']),
+        'KEYS': keys,
+        'TAG_KEYS': tag_keys,
+        'IGNORED_KEYS': frozenset(ignored_keys),
+        '_key_set': frozenset(keys),
+        '_known': namespace['_known'],
+        '_values': staticmethod(_values_getter(keys)),
+    }
+    if module:
+        attributes['__module__'] = module
+    cls = type(name, (Record,), attributes)
+    cls.__init__.__qualname__ = f'{name}.__init__'
+    return cls
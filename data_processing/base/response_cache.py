@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+class ResponseCache:
+    """On-disk cache of the last response body per URL, along with its
+    validators (ETag, Last-Modified) and SHA-256 content hash.
+
+    New bodies are staged by store() and stage_stream() and only replace
+    the cached ones on commit(), so a response whose data was never
+    exported (e.g. the write failed) is not reported as unchanged next
+    time. discard() drops the staged entries.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.staged = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def validators(self, url):
+        """Return conditional request headers for the cached response"""
+        metadata = self.metadata(url)
+        headers = {}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            headers['If-Modified-Since'] = metadata['last_modified']
+        return headers
+
+    def metadata(self, url):
+        try:
+            with open(self._path(url, 'json'), 'r') as metadata_file:
+                return json.load(metadata_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def body(self, url):
+        """Return the cached response body, or None if nothing is cached"""
+        try:
+            with open(self._path(url, 'body'), 'rb') as body_file:
+                return body_file.read()
+        except FileNotFoundError:
+            return None
+
+    def is_unchanged(self, url, response):
+        """True if response is a 304 or its body hashes the same as the
+        cached body. Validators sent back with an unchanged body are
+        stored so the next request can be answered with a 304.
+        """
+        if response.status_code == 304:
+            return True
+        metadata = self.metadata(url)
+        digest = hashlib.sha256(response.content).hexdigest()
+        if metadata.get('sha256') != digest:
+            return False
+        self._write_metadata(url, response, digest)
+        return True
+
+    def store(self, url, response):
+        """Stage response.content and its validators until commit()"""
+        digest = hashlib.sha256(response.content).hexdigest()
+        staged_path = self._path(url, 'body.staged')
+        self._write_atomic(staged_path, response.content)
+        self.staged[url] = (staged_path, self._metadata(url, response, digest))
+
+    def stage_stream(self, url, response, chunks):
+        """Write chunks to a staged body file while hashing them. Returns
+        False, like is_unchanged(), if the body hashes the same as the
+        cached one (storing the validators sent back with it); otherwise
+        the body and validators are staged (see store()) and True is
+        returned. Read the staged body back with staged_chunks().
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as body_file:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    body_file.write(chunk)
+            digest = digest.hexdigest()
+            if self.metadata(url).get('sha256') == digest:
+                self._write_metadata(url, response, digest)
+                return False
+            staged_path = self._path(url, 'body.staged')
+            os.replace(tmp_path, staged_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.staged[url] = (staged_path, self._metadata(url, response, digest))
+        return True
+
+    def staged_chunks(self, url, chunk_size=65536):
+        """Yield the body staged for url in chunk_size chunks"""
+        staged_path, _ = self.staged[url]
+        with open(staged_path, 'rb') as body_file:
+            while chunk := body_file.read(chunk_size):
+                yield chunk
+
+    def commit(self):
+        """Replace the cached bodies and validators with the staged ones"""
+        for url, (staged_path, metadata) in self.staged.items():
+            os.replace(staged_path, self._path(url, 'body'))
+            self._write_atomic(self._path(url, 'json'), json.dumps(metadata).encode('utf-8'))
+        self.staged = {}
+
+    def discard(self):
+        """Drop the staged bodies, keeping the cached ones"""
+        for staged_path, _ in self.staged.values():
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+        self.staged = {}
+
+    def _write_metadata(self, url, response, digest):
+        self._write_atomic(
+            self._path(url, 'json'),
+            json.dumps(self._metadata(url, response, digest)).encode('utf-8'))
+
+    @staticmethod
+    def _metadata(url, response, digest):
+        return {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest,
+        }
+
+    def _write_atomic(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+
+    def _path(self, url, extension):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.{extension}')
@@ -0,0 +1,12 @@
+from data_processing.lazy import lazy_exports
+
+_EXPORTS = {
+    'RegionColumns': 'data_processing.encoders.columns',
+    'DeltaFilter': 'data_processing.encoders.delta',
+    'LineProtocolEncoder': 'data_processing.encoders.line_protocol',
+    'ParallelEncoder': 'data_processing.encoders.parallel',
+    'encode_parallel': 'data_processing.encoders.parallel',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,217 @@
+from itertools import chain
+from operator import methodcaller
+from data_processing.encoders.line_protocol import (
+    KEY_ESCAPES,
+    STRING_FIELD_ESCAPES,
+    InvalidFieldValueError,
+    escape_measurement
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class MissingDependencyError(Exception):
+    def __init__(self, package, feature):
+        super().__init__(f'{package} is required for {feature} (pip install {package})')
+
+
+class Column:
+    """One column of values with a null mask. kind is 'int', 'float',
+    'bool' or 'str' (tags are always 'str').
+    """
+
+    def __init__(self, values, null, kind):
+        self.values = values
+        self.null = null
+        self.kind = kind
+
+    def take(self, rows):
+        return Column(self.values[rows], self.null[rows], self.kind)
+
+    def formatted(self):
+        """Return a string array of line protocol field values"""
+        if self.kind == 'int':
+            return numpy.char.add(self.values.astype(str), 'i')
+        if self.kind == 'float':
+            return self.values.astype(str)
+        if self.kind == 'bool':
+            return numpy.where(self.values, 'true', 'false')
+        values = _replace(self._strings(), STRING_FIELD_ESCAPES)
+        return numpy.char.add(numpy.char.add('"', values), '"')
+
+    def escaped(self):
+        """Return a string array of values escaped as tag values"""
+        return _replace(self._strings(), KEY_ESCAPES)
+
+    def _strings(self):
+        return numpy.where(self.null, '', self.values.astype(str))
+
+
+class RegionColumns:
+    """Columnar (NumPy) form of a list of region records, built once with
+    the schema of a LineProtocolEncoder: one Column per tag and field key,
+    keyed by the original record key. Nulls (None, '', NaN, infinities)
+    are tracked in masks, field_types from the encoder coerce columns, and
+    integer columns mixed with floats become float.
+
+    encode() formats lines column by column instead of record by record,
+    and column() returns masked arrays for aggregates, e.g.
+    columns.column('tot_cases').sum(). Requires numpy.
+    """
+
+    def __init__(self, encoder, tags, fields, length):
+        self.encoder = encoder
+        self.tags = tags
+        self.fields = fields
+        self.length = length
+
+    @classmethod
+    def from_records(cls, records, encoder):
+        if numpy is None:
+            raise MissingDependencyError('numpy', 'columnar region data')
+        records = list(records)
+        tags = {}
+        fields = {}
+        for key in dict.fromkeys(chain.from_iterable(records)):
+            entry = encoder.plan_entry(key)
+            if not entry:
+                continue
+            is_tag, _, convert = entry
+            values = list(map(methodcaller('get', key), records))
+            if is_tag:
+                tags[key] = cls._tag_column(values)
+            else:
+                fields[key] = cls._field_column(key, values, convert)
+        return cls(encoder, tags, fields, len(records))
+
+    def __len__(self):
+        return self.length
+
+    def column(self, key):
+        """Return a field or tag column as a numpy masked array"""
+        column = self._column(key)
+        return numpy.ma.array(column.values, mask=column.null)
+
+    def total(self, key):
+        """Sum of the non-null values of a field"""
+        return self.column(key).sum()
+
+    def per_100k(self, key, population):
+        """Return key per 100k people as a masked float array. population
+        is a field key or an array aligned with the rows.
+        """
+        if isinstance(population, str):
+            population = self.column(population)
+        return self.column(key).astype(float) / population * 100000
+
+    def dropna(self, keys=None):
+        """Return the rows where none of keys (default every field) is
+        null
+        """
+        keys = self.fields if keys is None else keys
+        keep = numpy.ones(self.length, dtype=bool)
+        for key in keys:
+            keep &= ~self._column(key).null
+        return self.take(numpy.flatnonzero(keep))
+
+    def take(self, rows):
+        return RegionColumns(
+            self.encoder,
+            {key: column.take(rows) for key, column in self.tags.items()},
+            {key: column.take(rows) for key, column in self.fields.items()},
+            len(rows))
+
+    def encode(self, timestamp=None):
+        """Return line protocol lines, one per row with at least one non
+        null field. timestamp may be one value for every row or a
+        sequence aligned with the rows.
+        """
+        plan_entry = self.encoder.plan_entry
+        add = numpy.char.add
+        parts = []
+        for key, column in self.tags.items():
+            part = add(f',{plan_entry(key)[1]}', column.escaped())
+            parts.append(numpy.where(column.null, '', part).tolist())
+        has_fields = numpy.zeros(self.length, dtype=bool)
+        field_parts = []
+        for key, column in self.fields.items():
+            # The first field of each row is written without a comma
+            prefix = plan_entry(key)[1]
+            part = numpy.where(has_fields, f',{prefix}', f' {prefix}')
+            part = add(part, column.formatted())
+            field_parts.append(numpy.where(column.null, '', part).tolist())
+            has_fields |= ~column.null
+        parts += field_parts
+        if timestamp is not None:
+            if numpy.ndim(timestamp):
+                timestamps = numpy.asarray(timestamp, dtype='int64').astype(str)
+                parts.append(add(' ', timestamps).tolist())
+            else:
+                parts.append([f' {int(timestamp)}'] * self.length)
+        measurement = escape_measurement(self.encoder.measurement)
+        lines = [measurement + ''.join(row) for row in zip(*parts)]
+        return [line for line, keep in zip(lines, has_fields.tolist()) if keep]
+
+    def _column(self, key):
+        if key in self.fields:
+            return self.fields[key]
+        return self.tags[key]
+
+    @staticmethod
+    def _tag_column(values):
+        array = numpy.array(values, dtype=object)
+        null = numpy.equal(array, None) | numpy.equal(array, '')
+        return Column(array, null, 'str')
+
+    @staticmethod
+    def _field_column(key, values, convert):
+        array = numpy.array(values, dtype=object)
+        null = numpy.equal(array, None) | numpy.equal(array, '')
+        types = set(map(type, array[~null]))
+        if convert is int or convert is float:
+            kind = convert.__name__
+        elif types <= {bool}:
+            kind = 'bool'
+        elif types <= {int}:
+            kind = 'int'
+        elif types <= {int, float}:
+            kind = 'float'
+        else:
+            kind = 'str'
+        filled = numpy.where(null, 0, array)
+        if kind == 'str':
+            return Column(filled.astype(str), null, kind)
+        dtype = {'int': 'int64', 'float': 'float64', 'bool': bool}[kind]
+        try:
+            if kind == 'int' and types - {int}:
+                # Coerce through float so numeric strings like '1.0' convert
+                values = filled.astype('float64').astype(dtype)
+            else:
+                values = filled.astype(dtype)
+        except (TypeError, ValueError):
+            bad = next(value for value in array[~null] if not _converts(value, dtype))
+            raise InvalidFieldValueError(key, bad)
+        if kind == 'float':
+            null = null | ~numpy.isfinite(values)
+        return Column(values, null, kind)
+
+
+def _converts(value, dtype):
+    try:
+        numpy.array([value]).astype(dtype)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _replace(values, escapes):
+    """Apply a str.translate table to a string array, vectorized"""
+    # Escape backslashes first so added backslashes are not escaped again
+    for char, replacement in sorted(escapes.items(), key=lambda item: item[0] != ord('\\')):
+        char = chr(char)
+        if numpy.char.find(values, char).max(initial=-1) >= 0:
+            values = numpy.char.replace(values, char, replacement)
+    return values
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+SERIES_SEPARATOR = re.compile(r'(?<!\\) ')
+
+
+def split_line(line):
+    """Split a line protocol line into (series, fields, timestamp). series
+    is the measurement and tag set, timestamp is None if the line has none.
+    """
+    series, fields = SERIES_SEPARATOR.split(line, 1)
+    timestamp = None
+    head, _, tail = fields.rpartition(' ')
+    # String field values always end in a quote, so an all-digit tail
+    # can only be the timestamp
+    if head and tail.lstrip('-').isdigit():
+        fields, timestamp = head, int(tail)
+    return series, fields, timestamp
+
+
+def fingerprint(fields):
+    return hashlib.blake2b(fields.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class DeltaFilter:
+    """Drop line protocol lines whose fields have not changed since the
+    last exported line of the same series (measurement and tag set). A
+    64-bit fingerprint of the field set is kept per series and persisted
+    to state_path between runs. Timestamps are not part of the
+    fingerprint.
+
+    filter() only stages fingerprints; call commit() once the lines have
+    been exported so a failed export is sent again on the next run. With
+    full_refresh_interval (seconds), every line is emitted once that long
+    has passed since the last full refresh.
+    """
+
+    def __init__(self, state_path=None, full_refresh_interval=None, clock=time.time):
+        self.state_path = state_path
+        self.full_refresh_interval = full_refresh_interval
+        self.clock = clock
+        self.fingerprints = {}
+        self.refreshed_at = None
+        self.emitted = 0
+        self.suppressed = 0
+        self._pending = {}
+        self._pending_refresh = None
+        if self.state_path:
+            self.load()
+
+    @property
+    def refresh_due(self):
+        if self.full_refresh_interval is None:
+            return False
+        if self.refreshed_at is None:
+            return True
+        return self.clock() - self.refreshed_at >= self.full_refresh_interval
+
+    def filter(self, lines):
+        """Yield lines whose fields changed, or every line when a full
+        refresh is due
+        """
+        self._pending = {}
+        self._pending_refresh = None
+        refresh = self.refresh_due
+        if refresh:
+            self._pending_refresh = self.clock()
+        for line in lines:
+            series, fields, _ = split_line(line)
+            digest = fingerprint(fields)
+            if not refresh and self.fingerprints.get(series) == digest:
+                self.suppressed += 1
+                continue
+            self._pending[series] = digest
+            self.emitted += 1
+            yield line
+
+    def commit(self):
+        """Record the lines emitted by the last filter() as exported and
+        persist the state
+        """
+        self.fingerprints.update(self._pending)
+        if self._pending_refresh is not None:
+            self.refreshed_at = self._pending_refresh
+        self._pending = {}
+        self._pending_refresh = None
+        if self.state_path:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.state_path, 'r') as state_file:
+                state = json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            return
+        self.fingerprints = state.get('fingerprints', {})
+        self.refreshed_at = state.get('refreshed_at')
+
+    def save(self):
+        state = {
+            'fingerprints': self.fingerprints,
+            'refreshed_at': self.refreshed_at,
+        }
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as state_file:
+                json.dump(state, state_file, separators=(',', ':'))
+            os.replace(tmp_path, self.state_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def reset(self):
+        """Forget every fingerprint so the next filter() emits all lines"""
+        self.fingerprints = {}
+        self.refreshed_at = None
+        self._pending = {}
+        self._pending_refresh = None
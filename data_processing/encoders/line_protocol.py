@@ -0,0 +1,204 @@
+import math
+import numbers
+
+MEASUREMENT_ESCAPES = str.maketrans({
+    ',': '\\,',
+    ' ': '\\ ',
+    '\n': '\\n',
+})
+KEY_ESCAPES = str.maketrans({
+    ',': '\\,',
+    '=': '\\=',
+    ' ': '\\ ',
+    '\n': '\\n',
+})
+STRING_FIELD_ESCAPES = str.maketrans({
+    '"': '\\"',
+    '\\': '\\\\',
+    # Payloads are split into lines on newlines (see batch_lines)
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+
+class InvalidFieldValueError(Exception):
+    def __init__(self, key, value):
+        message = f"Field '{key}' has a value line protocol cannot represent: {value!r}"
+        super().__init__(message)
+
+
+def escape_measurement(measurement):
+    """Escape commas, spaces and newlines in a measurement name"""
+    return str(measurement).translate(MEASUREMENT_ESCAPES)
+
+
+def escape_key(key):
+    """Escape commas, equals signs, spaces and newlines in a tag key, tag
+    value or field key
+    """
+    return str(key).translate(KEY_ESCAPES)
+
+
+def format_field_value(value):
+    """Format a field value with its line protocol type: booleans as
+    true/false, integers with the i suffix, floats as decimals and strings
+    double quoted. Any numbers.Integral or numbers.Real (e.g. numpy
+    scalars) is written as an integer or float. Returns None for values
+    that cannot be written (None, NaN and infinities).
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, numbers.Integral):
+        return f'{int(value)}i'
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if math.isnan(value) or math.isinf(value):
+            return None
+        return repr(value)
+    if value is None:
+        return None
+    return f'"{str(value).translate(STRING_FIELD_ESCAPES)}"'
+
+
+class LineProtocolEncoder:
+    """Encode points as InfluxDB line protocol.
+    https://docs.influxdata.com/influxdb/v2.6/reference/syntax/line-protocol/
+
+    Record keys listed in tag_keys become tags and every other key becomes
+    a field, unless it is in ignored_keys or field_keys is given and does
+    not list it. key_map renames keys on output and field_types coerces
+    field values (e.g. {'incidence': float}) so a field keeps one type
+    across points. The per-key work is compiled once into a plan, so
+    encoding a record costs one dict lookup per key. None and empty values
+    are skipped, and points without any field are dropped.
+    """
+
+    IGNORE = ()
+
+    def __init__(self, measurement, tag_keys=(), key_map=None, ignored_keys=(),
+                 field_keys=None, field_types=None):
+        self.measurement = measurement
+        self.tag_keys = frozenset(tag_keys)
+        self.key_map = key_map or {}
+        self.ignored_keys = frozenset(ignored_keys)
+        self.field_keys = frozenset(field_keys) if field_keys is not None else None
+        self.field_types = field_types or {}
+        self._prefix = f'{escape_measurement(measurement)},'
+        self._plan = {}
+        for key in set(self.key_map) | self.tag_keys | self.ignored_keys:
+            self._plan[key] = self._compile(key)
+
+    def encode(self, tags, fields, timestamp=None):
+        """Encode one point from tag and field dicts. Returns None if no
+        field has a writable value.
+        """
+        tag_str = ','.join(
+            f'{escape_key(key)}={escape_key(value)}'
+            for key, value in tags.items()
+            if value is not None and value != '')
+        field_parts = []
+        for key, value in fields.items():
+            formatted = format_field_value(value)
+            if formatted is not None:
+                field_parts.append(f'{escape_key(key)}={formatted}')
+        return self._line(tag_str, field_parts, timestamp)
+
+    def encode_record(self, record, timestamp=None):
+        """Encode one record dict using the compiled key plan. Returns None
+        if the record has no field with a writable value.
+        """
+        plan = self._plan
+        tags = []
+        fields = []
+
+        for key, value in record.items():
+            if value is None or value == '':
+                continue
+            entry = plan.get(key)
+            if entry is None:
+                # Keys outside the schema are compiled on first sight
+                entry = plan[key] = self._compile(key)
+            if not entry:
+                continue
+            is_tag, prefix, convert = entry
+            if is_tag:
+                tags.append(prefix + str(value).translate(KEY_ESCAPES))
+                continue
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    raise InvalidFieldValueError(key, value)
+            # Inline the common exact int/float cases of format_field_value;
+            # x - x is 0.0 only for finite floats
+            value_type = value.__class__
+            if value_type is int:
+                fields.append(f'{prefix}{value}i')
+            elif value_type is float:
+                if value - value == 0.0:
+                    fields.append(prefix + repr(value))
+            else:
+                formatted = format_field_value(value)
+                if formatted is not None:
+                    fields.append(prefix + formatted)
+
+        return self._line(','.join(tags), fields, timestamp)
+
+    def encode_records(self, records, timestamp=None):
+        """Yield encoded lines for records, skipping records without fields"""
+        for record in records:
+            line = self.encode_record(record, timestamp)
+            if line is not None:
+                yield line
+
+    def encode_batch(self, records, timestamp=None):
+        """Encode records into a newline separated UTF-8 bytes payload"""
+        return '\n'.join(self.encode_records(records, timestamp)).encode('utf-8')
+
+    def encode_columns(self, tags, fields, timestamps=None):
+        """Yield lines from column dicts mapping key to a sequence of
+        values. timestamps may be a sequence, a single value for every row,
+        or None.
+        """
+        tag_keys = list(tags)
+        field_keys = list(fields)
+        columns = [tags[key] for key in tag_keys] + [fields[key] for key in field_keys]
+        if timestamps is None or isinstance(timestamps, (int, float)):
+            timestamps = [timestamps] * len(columns[0]) if columns else []
+        tag_count = len(tag_keys)
+        for row, timestamp in zip(zip(*columns), timestamps):
+            record = dict(zip(tag_keys, row[:tag_count]))
+            point_fields = dict(zip(field_keys, row[tag_count:]))
+            line = self.encode(record, point_fields, timestamp)
+            if line is not None:
+                yield line
+
+    def plan_entry(self, key):
+        """Return how key is encoded: IGNORE (empty) for keys left out,
+        otherwise an (is_tag, 'escaped_name=', converter) tuple, where
+        converter is the field_types entry or None. Entries are compiled
+        once per key.
+        """
+        entry = self._plan.get(key)
+        if entry is None:
+            entry = self._plan[key] = self._compile(key)
+        return entry
+
+    def _line(self, tag_str, fields, timestamp):
+        if not fields:
+            return None
+        line = f'{self._prefix}{tag_str}' if tag_str else self._prefix[:-1]
+        line = f'{line} {",".join(fields)}'
+        if timestamp is not None:
+            line = f'{line} {int(timestamp)}'
+        return line
+
+    def _compile(self, key):
+        """Returns IGNORE or an (is_tag, 'escaped_name=', converter) entry"""
+        if key in self.ignored_keys:
+            return self.IGNORE
+        is_tag = key in self.tag_keys
+        if not is_tag and self.field_keys is not None and key not in self.field_keys:
+            return self.IGNORE
+        prefix = f'{escape_key(self.key_map.get(key, key))}='
+        return (is_tag, prefix, self.field_types.get(key))
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+# Set in each worker process by _init_worker, so the encoder is pickled
+# once per worker instead of once per chunk
+_worker_encoder = None
+
+
+def _init_worker(encoder):
+    global _worker_encoder
+    _worker_encoder = encoder
+
+
+def _encode_chunk(records, timestamp):
+    return _worker_encoder.encode_batch(records, timestamp)
+
+
+def default_context():
+    """Return the forkserver start method context where available, else
+    spawn. Forking (the Linux default) copies a process whose other
+    threads, e.g. HTTP sessions or the job scheduler, may hold locks, and
+    can deadlock the workers.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def chunked(records, chunk_size):
+    """Yield lists of at most chunk_size records"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelEncoder:
+    """Encode records with a LineProtocolEncoder in a pool of worker
+    processes. Records are split into chunks of chunk_size, and each
+    worker returns a chunk as one newline-joined UTF-8 payload (bytes),
+    which is much cheaper to send back than a list of str lines.
+    Payloads with fewer than min_records records are encoded in this
+    process, since below that the IPC costs more than it saves (see
+    benchmarks/bench_parallel_encoding.py). workers defaults to the CPU
+    count; a pool gains nothing on a single CPU.
+
+    The pool is started on first use and kept until close(), with the
+    mp_context start method (default: see default_context). The encoder
+    (including any field_types callables) must be picklable.
+    """
+
+    def __init__(self, encoder, workers=None, chunk_size=5000, min_records=20000,
+                 mp_context=None):
+        self.encoder = encoder
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_records = min_records
+        self.mp_context = mp_context
+        self._executor = None
+
+    def encode(self, records, timestamp=None, ordered=True):
+        """Yield one payload per chunk of records. With ordered=False,
+        payloads are yielded as soon as they are ready.
+        """
+        if not isinstance(records, list):
+            records = list(records)
+        if len(records) < self.min_records:
+            payload = self.encoder.encode_batch(records, timestamp)
+            if payload:
+                yield payload
+            return
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_encode_chunk, chunk, timestamp)
+            for chunk in chunked(records, self.chunk_size)
+        ]
+        if not ordered:
+            futures = as_completed(futures)
+        for future in futures:
+            payload = future.result()
+            if payload:
+                yield payload
+
+    def encode_lines(self, records, timestamp=None, ordered=True):
+        """Yield the encoded lines as str"""
+        for payload in self.encode(records, timestamp, ordered):
+            yield from payload.decode('utf-8').split('\n')
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_executor(self):
+        if not self._executor:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self.mp_context or default_context(),
+                initializer=_init_worker,
+                initargs=(self.encoder,))
+        return self._executor
+
+
+def encode_parallel(encoder, records, timestamp=None, workers=None, chunk_size=5000,
+                    ordered=True):
+    """Encode records in a one-off process pool. Returns a list of bytes
+    payloads (see ParallelEncoder).
+    """
+    with ParallelEncoder(encoder, workers, chunk_size, min_records=0) as parallel_encoder:
+        return list(parallel_encoder.encode(records, timestamp, ordered))
@@ -1 +1,14 @@
-from data_processing.exporters.influxdb import InfluxDBAPIv2Exporter
+from data_processing.lazy import lazy_exports
+
+_EXPORTS = {
+    'InfluxDBAPIv2Exporter': 'data_processing.exporters.influxdb',
+    'AsyncInfluxDBAPIv2Exporter': 'data_processing.exporters.async_influxdb',
+    'WriteSpool': 'data_processing.exporters.spool',
+    'LineProtocolFileExporter': 'data_processing.exporters.file',
+    'ShardedExporter': 'data_processing.exporters.sharded',
+    'Snapshot': 'data_processing.exporters.snapshot',
+    'write_snapshot': 'data_processing.exporters.snapshot',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,124 @@
+import asyncio
+from requests import RequestException
+from data_processing.base import AsyncHTTPRESTController
+from data_processing.exporters.influxdb import (
+    BatchResult,
+    BucketAuthenticationError,
+    InfluxDBAPIv2Exporter,
+    batch_lines
+)
+
+
+class AsyncInfluxDBAPIv2Exporter(AsyncHTTPRESTController, InfluxDBAPIv2Exporter):
+    """asyncio counterpart of InfluxDBAPIv2Exporter. write_to_bucket and
+    write_batches are coroutines, and bucket_exists / is_authenticated
+    return awaitables (e.g. `assert await exporter.is_authenticated`).
+    Accepts the InfluxDBAPIv2Exporter arguments plus max_concurrency.
+    Spool replay (replay_spool, start_spool_replay) stays synchronous and
+    runs off the event loop.
+    """
+
+    async def write_to_bucket(self, line_protocol_data, precision='ms', compression=None):
+        """Write line protocol format data to influx bucket at provided
+        precision. See InfluxDBAPIv2Exporter.write_to_bucket.
+        """
+        params = self._write_params(precision)
+        compression = self._validate_compression(compression)
+        if await self.bucket_exists:
+            return await self._write(line_protocol_data, params, compression)
+
+    async def write_batches(self, line_protocol_data, precision='ms', compression=None,
+                            max_lines=None, max_bytes=None, max_in_flight=None):
+        """Split line protocol data into batches and write them with up to
+        max_in_flight (default self.max_concurrency) concurrent requests.
+        See InfluxDBAPIv2Exporter.write_batches.
+        """
+        max_lines = max_lines or self.MAX_BATCH_LINES
+        max_bytes = max_bytes or self.MAX_BATCH_BYTES
+        max_in_flight = max_in_flight or self.max_concurrency
+        params = self._write_params(precision)
+        compression = self._validate_compression(compression)
+        results = []
+        batches = batch_lines(line_protocol_data, max_lines, max_bytes)
+        try:
+            await self.bucket_exists
+        except RequestException as error:
+            if not self.spool or not self._is_retryable_error(error):
+                raise
+            return self._spool_unsent(batches, error, precision, compression)
+        pending = set()
+        for index, (lines, data) in enumerate(batches):
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED)
+                results.extend(task.result() for task in done)
+            pending.add(asyncio.ensure_future(
+                self._write_batch(index, lines, data, params, compression)))
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            results.extend(task.result() for task in done)
+        results.sort(key=lambda result: result.index)
+        if self.spool:
+            self._spool_failed(results, precision, compression)
+        self._drop_sent_data(results)
+        return results
+
+    @property
+    def bucket_exists(self):
+        """Awaitable check that InfluxDB bucket exists. See
+        InfluxDBAPIv2Exporter.bucket_exists.
+        """
+        return self._bucket_exists()
+
+    @property
+    def is_authenticated(self):
+        """Awaitable check that InfluxDB authentication is successful. See
+        InfluxDBAPIv2Exporter.is_authenticated.
+        """
+        return self._is_authenticated()
+
+    async def _bucket_exists(self):
+        if self._is_check_cached('bucket_exists'):
+            return True
+        response = await self.get('/buckets', {'name': self.bucket})
+        self._check_buckets_response(response)
+        self._cache_check('bucket_exists')
+        self._cache_check('is_authenticated')
+        return True
+
+    async def _is_authenticated(self):
+        if self._is_check_cached('is_authenticated'):
+            return True
+        response = await self.get('/buckets')
+        if response.status_code != 200:
+            raise BucketAuthenticationError(self.bucket)
+        self._cache_check('is_authenticated')
+        return True
+
+    async def _write(self, line_protocol_data, params, compression=None):
+        data, headers = await self._run(
+            self._prepare_write,
+            line_protocol_data,
+            compression)
+        response = await self.post('/write', params=params, data=data, headers=headers)
+        return self._check_write_response(response)
+
+    async def _write_batch(self, index, lines, data, params, compression=None):
+        try:
+            response = await self._write(data, params, compression)
+        except RequestException as error:
+            return BatchResult(index, lines, data, error=error)
+        return BatchResult(index, lines, data, response=response)
+
+    def _send_spooled(self, data, metadata):
+        # Called from spool replay outside the event loop
+        params = self._write_params(metadata.get('precision', 'ms'))
+        body, headers = self._prepare_write(data, metadata.get('compression'))
+        url = self.build_url('/write', params)
+        try:
+            response = self._post_sync(url, data=body, headers=headers)
+        except RequestException as error:
+            return self._spooled_batch_done(BatchResult(0, None, data, error=error))
+        response = self._check_write_response(response)
+        return self._spooled_batch_done(BatchResult(0, None, data, response=response))
@@ -0,0 +1,201 @@
+import glob
+import gzip
+import io
+import os
+import threading
+import time
+from data_processing.base import NULL_METRICS
+from data_processing.exporters.influxdb import BatchResult, UnsupportedCompressionError, batch_lines
+
+FILE_COMPRESSIONS = (None, 'gzip')
+
+
+class FileWrite:
+    """Stands in for the HTTP response of a batch appended to a file"""
+
+    status_code = 204
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+class LineProtocolFileExporter:
+    """Exporter with the InfluxDBAPIv2Exporter write interface that appends
+    line protocol to local files instead, e.g. to archive raw scrapes.
+
+    Files are named '<prefix>-<UTC time>-<sequence>.<precision>.lp' (plus
+    '.gz' with compression='gzip') so they sort in write order and record
+    the timestamp precision. A new file is started once max_bytes of
+    uncompressed data were written to the current one, after
+    rotate_interval seconds, or when the precision changes. Writes go
+    through a buffer_size buffer and are flushed at the end of every
+    write_to_bucket/write_batches call; a gzip file is only complete once
+    it has been rotated or closed. Use read_line_protocol_files to read
+    them back.
+    """
+
+    REQUIRED_CONFIG_KEYS = ('directory',)
+
+    def __init__(self, directory, prefix='lines', max_bytes=67108864, rotate_interval=None,
+                 compression=None, compression_level=6, buffer_size=1048576, metrics=None,
+                 clock=time.time):
+        if compression not in FILE_COMPRESSIONS:
+            raise UnsupportedCompressionError(compression)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compression = compression
+        self.compression_level = compression_level
+        self.buffer_size = buffer_size
+        self.metrics = metrics or NULL_METRICS
+        self.clock = clock
+        self.paths = []
+        self._file = None
+        self._raw = None
+        self._path = None
+        self._precision = None
+        self._size = 0
+        self._opened_at = None
+        self._sequence = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Create an exporter from a config dict with a directory and
+        optional options (extra keyword arguments)
+        """
+        return cls(config['directory'], **kwargs, **config.get('options', {}))
+
+    @property
+    def bucket_exists(self):
+        return True
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    def write_to_bucket(self, line_protocol_data, precision='ms', compression=None):
+        """Append line protocol data (str, bytes, or iterable of lines).
+        compression is accepted for interface compatibility; files use the
+        exporter's compression.
+        """
+        results = self.write_batches(line_protocol_data, precision)
+        return results[-1].response if results else None
+
+    def write_batches(self, line_protocol_data, precision='ms', compression=None,
+                      max_lines=5000, max_bytes=4194304, max_in_flight=None):
+        """Append line protocol data in batches of at most max_lines lines /
+        max_bytes bytes. Returns a list of BatchResult objects whose
+        response is a FileWrite; only failed ones keep their data.
+        """
+        results = []
+        with self._lock, self.metrics.stage('file_write', source=self.__class__.__name__) as stage:
+            for index, (lines, data) in enumerate(batch_lines(line_protocol_data, max_lines, max_bytes)):
+                try:
+                    path = self._append(data + b'\n', precision)
+                except OSError as error:
+                    results.append(BatchResult(index, lines, data, error=error))
+                    continue
+                results.append(BatchResult(index, lines, data, response=FileWrite(path, len(data) + 1)))
+            if self._file:
+                self._file.flush()
+            stage.set(batches=len(results), bytes=sum(len(result.data) + 1 for result in results))
+        # Only failed batches may still need their body
+        for result in results:
+            if result.ok:
+                result.data = None
+        return results
+
+    def rotate(self):
+        """Close the current file; the next write starts a new one"""
+        with self._lock:
+            self._close_file()
+
+    def close(self):
+        self.rotate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _append(self, data, precision):
+        if self._file is not None and self._should_rotate(len(data), precision):
+            self._close_file()
+        if self._file is None:
+            self._open_file(precision)
+        self._file.write(data)
+        self._size += len(data)
+        return self._path
+
+    def _should_rotate(self, size, precision):
+        if precision != self._precision:
+            return True
+        if self._size and self._size + size > self.max_bytes:
+            return True
+        if self.rotate_interval is not None:
+            return self.clock() - self._opened_at >= self.rotate_interval
+        return False
+
+    def _open_file(self, precision):
+        self._opened_at = self.clock()
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(self._opened_at))
+        suffix = '.gz' if self.compression == 'gzip' else ''
+        while True:
+            self._sequence += 1
+            name = f'{self.prefix}-{stamp}-{self._sequence:06d}.{precision}.lp{suffix}'
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                break
+        self._raw = raw = open(path, 'xb', buffering=0)
+        if self.compression == 'gzip':
+            raw = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=self.compression_level)
+        self._file = io.BufferedWriter(raw, self.buffer_size)
+        self._path = path
+        self._precision = precision
+        self._size = 0
+        self.paths.append(path)
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        # Closing the GzipFile writes its trailer but leaves the file open
+        self._file.close()
+        self._raw.close()
+        self._file = None
+        self._raw = None
+        self._path = None
+        self._precision = None
+
+
+def line_protocol_files(directory, prefix='lines'):
+    """Return the line protocol files written to directory, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, f'{prefix}-*.lp*')))
+
+
+def file_precision(path):
+    """Return the timestamp precision recorded in a file name"""
+    name = os.path.basename(path)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return name[:-len('.lp')].rsplit('.', 1)[1]
+
+
+def read_line_protocol_files(paths, chunk_size=1048576):
+    """Yield the lines (str) of line protocol files, decompressing .gz
+    files, reading chunk_size bytes at a time
+    """
+    for path in paths:
+        if path.endswith('.gz'):
+            line_file = gzip.open(path, 'rt', encoding='utf-8', newline='\n')
+        else:
+            line_file = open(path, 'r', buffering=chunk_size, encoding='utf-8', newline='\n')
+        with line_file:
+            for line in line_file:
+                line = line.rstrip('\n')
+                if line:
+                    yield line
@@ -1,5 +1,19 @@
+import logging
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests import RequestException
 from data_processing.base import HTTPRESTController, TokenAuth
 
+logger = logging.getLogger(__name__)
+
+COMPRESSION_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
 
 class BucketDoesNotExistError(Exception):
     def __init__(self, bucket):
@@ -11,56 +25,396 @@ class BucketAuthenticationError(Exception):
         super().__init__(f'Error authenticating to bucket: {bucket}')
 
 
+class UnsupportedCompressionError(Exception):
+    def __init__(self, compression):
+        message = f"'{compression}' is not a supported compression. "
+        message += f"Supported compressions: {list(COMPRESSION_WBITS)}"
+        super().__init__(message)
+
+
+def compress(data, compression='gzip', level=6, chunk_size=65536):
+    """Compress str or bytes data with gzip or deflate. Input is encoded
+    and fed to the compressor chunk_size characters at a time, so only the
+    compressed output is held alongside the original payload.
+    """
+    if compression not in COMPRESSION_WBITS:
+        raise UnsupportedCompressionError(compression)
+    compressor = zlib.compressobj(
+        level,
+        zlib.DEFLATED,
+        COMPRESSION_WBITS[compression])
+    chunks = []
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        chunks.append(compressor.compress(chunk))
+    chunks.append(compressor.flush())
+    return b''.join(chunks)
+
+
+def iter_lines(line_protocol_data):
+    """Yield non-empty lines from a str/bytes payload or any iterable of
+    lines without splitting the whole payload into a list first
+    """
+    if isinstance(line_protocol_data, (str, bytes)):
+        newline = '\n' if isinstance(line_protocol_data, str) else b'\n'
+        start = 0
+        while start < len(line_protocol_data):
+            end = line_protocol_data.find(newline, start)
+            if end == -1:
+                end = len(line_protocol_data)
+            line = line_protocol_data[start:end].rstrip()
+            if line:
+                yield line
+            start = end + 1
+    else:
+        for line in line_protocol_data:
+            line = line.rstrip()
+            if line:
+                yield line
+
+
+def batch_lines(line_protocol_data, max_lines=5000, max_bytes=4194304):
+    """Split line protocol data (str, bytes, or iterable of lines) into
+    newline-joined UTF-8 batches holding at most max_lines lines and
+    max_bytes bytes. A single line larger than max_bytes is yielded as a
+    batch of its own. Yields (line_count, batch_bytes) tuples.
+    """
+    lines = []
+    size = 0
+    for line in iter_lines(line_protocol_data):
+        if isinstance(line, str):
+            line = line.encode('utf-8')
+        line_size = len(line) + 1
+        if lines and (len(lines) >= max_lines or size + line_size > max_bytes + 1):
+            yield len(lines), b'\n'.join(lines)
+            lines = []
+            size = 0
+        lines.append(line)
+        size += line_size
+    if lines:
+        yield len(lines), b'\n'.join(lines)
+
+
+class BatchResult:
+    """Outcome of writing one batch. response is the HTTP response, or
+    error the exception raised while sending the batch. data (the batch
+    body) is only kept for failed batches once write_batches returns.
+    """
+
+    def __init__(self, index, lines, data, response=None, error=None):
+        self.index = index
+        self.lines = lines
+        self.data = data
+        self.response = response
+        self.error = error
+        self.spooled = False
+
+    @property
+    def ok(self):
+        return self.error is None and self.response is not None \
+            and self.response.status_code < 300
+
+
 class InfluxDBAPIv2Exporter(HTTPRESTController):
     API_ROOT = '/api/v2'
     HEADERS = {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
     }
+    MAX_BATCH_LINES = 5000
+    MAX_BATCH_BYTES = 4194304
+    MAX_IN_FLIGHT = 4
+    INVALIDATING_STATUS_CODES = (401, 404)
+    REQUIRED_CONFIG_KEYS = ('influx_url', 'influx_org', 'influx_bucket', 'influx_token')
 
-    def __init__(self, influxdb_url, org, bucket, token, verify=True):
+    def __init__(self, influxdb_url, org, bucket, token, verify=True,
+                 compression_level=6, compression_threshold=1024, check_ttl=300,
+                 spool=None, **kwargs):
+        """Extra keyword arguments (pool_connections, pool_maxsize, timeout,
+        retries, backoff_factor, backoff_jitter) configure the underlying
+        HTTPRESTController session. spool is an optional WriteSpool that
+        keeps batches write_batches could not deliver.
+        """
         self.influxdb_url = influxdb_url
+        self.spool = spool
+        self._replay_thread = None
+        self._replay_stopped = threading.Event()
         self.org = org
         self.bucket = bucket
+        self.compression_level = compression_level
+        self.compression_threshold = compression_threshold
+        self.check_ttl = check_ttl
+        self._checks = {}
         base_url = f'{self.influxdb_url}{self.API_ROOT}'
         super().__init__(
             base_url,
             self.HEADERS,
             auth=TokenAuth(token),
-            verify=verify)
+            verify=verify,
+            **kwargs)
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Create an exporter from a config dict with the
+        REQUIRED_CONFIG_KEYS, optional https_verify and optional options
+        (extra keyword arguments, e.g. rate_limit: {rate: 50,
+        max_concurrency: 16})
+        """
+        return cls(
+            config['influx_url'],
+            config['influx_org'],
+            config['influx_bucket'],
+            config['influx_token'],
+            verify=config.get('https_verify', True),
+            **kwargs,
+            **config.get('options', {}))
 
     def write_to_bucket(self, line_protocol_data, precision='ms', compression=None):
         """Write line protocol format data to influx bucket at provided
-        precision. Future: Specify compression (scaffolded, not implemented).
+        precision. Compression may be 'gzip' or 'deflate' (True selects
+        gzip); payloads shorter than self.compression_threshold are sent
+        uncompressed.
         https://docs.influxdata.com/influxdb/v2.6/api/#operation/PostWrite
         """
-        endpoint = '/write'
-        params = {
+        params = self._write_params(precision)
+        compression = self._validate_compression(compression)
+        if self.bucket_exists:
+            return self._write(line_protocol_data, params, compression)
+
+    def write_batches(self, line_protocol_data, precision='ms', compression=None,
+                      max_lines=None, max_bytes=None, max_in_flight=None):
+        """Split line protocol data (str, bytes, or any iterable of lines)
+        into batches of at most max_lines lines / max_bytes bytes and write
+        them with up to max_in_flight concurrent requests. Input is consumed
+        lazily, so at most max_in_flight batches are held at once. Returns a
+        list of BatchResult objects in batch order.
+
+        With a spool, batches that fail with a connection error, 429 or 5xx
+        are appended to it (result.spooled is True), and if InfluxDB cannot
+        be reached at all (or the bucket check answers 429 or 5xx) every
+        batch is spooled for later replay.
+        """
+        max_lines = max_lines or self.MAX_BATCH_LINES
+        max_bytes = max_bytes or self.MAX_BATCH_BYTES
+        max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        params = self._write_params(precision)
+        compression = self._validate_compression(compression)
+        results = []
+        batches = batch_lines(line_protocol_data, max_lines, max_bytes)
+        try:
+            self.bucket_exists
+        except RequestException as error:
+            if not self.spool or not self._is_retryable_error(error):
+                raise
+            return self._spool_unsent(batches, error, precision, compression)
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            pending = deque()
+            for index, (lines, data) in enumerate(batches):
+                if len(pending) >= max_in_flight:
+                    results.append(pending.popleft().result())
+                pending.append(executor.submit(
+                    self._write_batch, index, lines, data, params, compression))
+            while pending:
+                results.append(pending.popleft().result())
+        if self.spool:
+            self._spool_failed(results, precision, compression)
+        self._drop_sent_data(results)
+        return results
+
+    def replay_spool(self, max_batches=None):
+        """Send spooled batches to InfluxDB oldest first, stopping at the
+        first one that still fails. Returns the number of batches sent.
+        """
+        return self.spool.drain(self._send_spooled, max_batches)
+
+    def start_spool_replay(self, interval=5):
+        """Replay the spool from a background thread every interval
+        seconds, so draining never blocks new writes
+        """
+        if self._replay_thread and self._replay_thread.is_alive():
+            return
+        self._replay_stopped.clear()
+        self._replay_thread = threading.Thread(
+            target=self._replay_loop,
+            args=(interval,),
+            daemon=True)
+        self._replay_thread.start()
+
+    def stop_spool_replay(self):
+        self._replay_stopped.set()
+        if self._replay_thread:
+            self._replay_thread.join()
+            self._replay_thread = None
+
+    def _write_params(self, precision):
+        return {
             'bucket': self.bucket,
             'org': self.org,
             'precision': precision,
         }
-        if compression:
-            # Doesn't exist yet - modify Content-Encoding header
-            raise NotImplementedError
-        if self.bucket_exists:
-            return self.post(endpoint, params=params, data=line_protocol_data)
+
+    @staticmethod
+    def _validate_compression(compression):
+        if compression is True:
+            compression = 'gzip'
+        if compression and compression not in COMPRESSION_WBITS:
+            raise UnsupportedCompressionError(compression)
+        return compression
+
+    def _write(self, line_protocol_data, params, compression=None):
+        endpoint = '/write'
+        data, headers = self._prepare_write(line_protocol_data, compression)
+        if headers:
+            response = self.post(endpoint, params=params, data=data, headers=headers)
+        else:
+            response = self.post(endpoint, params=params, data=data)
+        return self._check_write_response(response)
+
+    def _prepare_write(self, line_protocol_data, compression=None):
+        """Returns the request body and any extra headers for a write"""
+        if compression and len(line_protocol_data) >= self.compression_threshold:
+            data = compress(
+                line_protocol_data,
+                compression,
+                self.compression_level)
+            return data, {'Content-Encoding': compression}
+        return line_protocol_data, None
+
+    def _check_write_response(self, response):
+        if response.status_code in self.INVALIDATING_STATUS_CODES:
+            self.invalidate_checks()
+        return response
+
+    @classmethod
+    def _is_retryable(cls, result):
+        if result.error is not None:
+            return cls._is_retryable_error(result.error)
+        return cls._is_retryable_status(result.response.status_code)
+
+    @classmethod
+    def _is_retryable_error(cls, error):
+        # Connection errors and timeouts carry no response
+        if error.response is None:
+            return True
+        return cls._is_retryable_status(error.response.status_code)
+
+    @staticmethod
+    def _is_retryable_status(status_code):
+        return status_code == 429 or status_code >= 500
+
+    def _spool_failed(self, results, precision, compression=None):
+        metadata = {'precision': precision, 'compression': compression}
+        for result in results:
+            if not result.ok and self._is_retryable(result):
+                self.spool.append(result.data, metadata)
+                result.spooled = True
+
+    @staticmethod
+    def _drop_sent_data(results):
+        # Only failed batches may still need their body, so the results
+        # do not hold on to the whole payload
+        for result in results:
+            if result.ok:
+                result.data = None
+
+    def _spool_unsent(self, batches, error, precision, compression=None):
+        """Spool every batch after the bucket check failed with a retryable
+        error, returning a failed BatchResult for each
+        """
+        results = [
+            BatchResult(index, lines, data, error=error)
+            for index, (lines, data) in enumerate(batches)
+        ]
+        self._spool_failed(results, precision, compression)
+        return results
+
+    def _send_spooled(self, data, metadata):
+        params = self._write_params(metadata.get('precision', 'ms'))
+        result = self._write_batch(0, None, data, params, metadata.get('compression'))
+        return self._spooled_batch_done(result)
+
+    def _spooled_batch_done(self, result):
+        if result.ok:
+            return True
+        if self._is_retryable(result):
+            return False
+        # Rejected outright (e.g. malformed data): replaying it cannot succeed
+        logger.warning(
+            'Dropping spooled batch rejected with status %s',
+            result.response.status_code)
+        return True
+
+    def _replay_loop(self, interval):
+        while not self._replay_stopped.wait(interval):
+            if not self.spool.empty:
+                self.replay_spool()
+
+    def _write_batch(self, index, lines, data, params, compression=None):
+        try:
+            response = self._write(data, params, compression)
+        except RequestException as error:
+            return BatchResult(index, lines, data, error=error)
+        return BatchResult(index, lines, data, response=response)
+
+    def invalidate_checks(self):
+        """Forget cached bucket_exists and is_authenticated results"""
+        self._checks.clear()
+
+    def _check_key(self, check):
+        return (check, self.org, self.bucket, self.auth.token)
+
+    def _is_check_cached(self, check):
+        expires_at = self._checks.get(self._check_key(check))
+        return expires_at is not None and time.monotonic() < expires_at
+
+    def _cache_check(self, check):
+        if self.check_ttl:
+            expires_at = time.monotonic() + self.check_ttl
+            self._checks[self._check_key(check)] = expires_at
 
     @property
     def bucket_exists(self):
         """Check if InfluxDB bucket exists. Returns True if self.bucket
-        exists. Raises BucketDoesNotExistError if it does not.
+        exists. Raises BucketDoesNotExistError if it does not. Successful
+        checks are cached per (org, bucket, token) for self.check_ttl
+        seconds.
         """
+        if self._is_check_cached('bucket_exists'):
+            return True
         response = self.get('/buckets', {'name': self.bucket})
+        self._check_buckets_response(response)
+        self._cache_check('bucket_exists')
+        # Listing the bucket succeeded, so the token is valid as well
+        self._cache_check('is_authenticated')
+        return True
+
+    def _check_buckets_response(self, response):
+        """Raise unless response lists self.bucket. Error statuses raise
+        requests.HTTPError (retryable for 429 and 5xx), rejected tokens
+        BucketAuthenticationError, and only a successful listing without
+        the bucket BucketDoesNotExistError.
+        """
+        if response.status_code in (401, 403):
+            self.invalidate_checks()
+            raise BucketAuthenticationError(self.bucket)
+        if response.status_code >= 400:
+            response.raise_for_status()
         buckets = response.json().get('buckets', None)
         if not buckets:
             raise BucketDoesNotExistError(self.bucket)
-        return True
 
     @property
     def is_authenticated(self):
-        """Check if InfluxDB authentication is successful."""
+        """Check if InfluxDB authentication is successful. Successful
+        checks are cached per (org, bucket, token) for self.check_ttl
+        seconds.
+        """
+        if self._is_check_cached('is_authenticated'):
+            return True
         success = self.get('/buckets').status_code == 200
         if not success:
             raise BucketAuthenticationError(self.bucket)
+        self._cache_check('is_authenticated')
         return True
@@ -0,0 +1,257 @@
+import bisect
+import hashlib
+import logging
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from data_processing.base import NULL_METRICS
+from data_processing.exporters.influxdb import BatchResult, iter_lines
+
+logger = logging.getLogger(__name__)
+
+SERIES_END = re.compile(rb'(?<!\\) ')
+
+
+class UnknownShardError(Exception):
+    def __init__(self, name):
+        super().__init__(f'No shard named {name!r}')
+
+
+def series_key(line):
+    """Return the series key (measurement and tag set) of a line protocol
+    line as bytes: everything before the first unescaped space
+    """
+    if isinstance(line, str):
+        line = line.encode('utf-8')
+    end = line.find(b' ')
+    if end == -1:
+        return line
+    if line[end - 1] != 0x5c:
+        return line[:end]
+    # The first space is escaped (a backslash precedes it)
+    match = SERIES_END.search(line)
+    return line[:match.start()] if match else line
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring of named nodes. Each node is placed at vnodes
+    points, so keys spread evenly and adding or removing a node only
+    moves the keys between it and its neighbours (about 1/n of them).
+    """
+
+    def __init__(self, nodes=(), vnodes=160):
+        self.vnodes = vnodes
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._nodes))
+
+    def add(self, node):
+        for i in range(self.vnodes):
+            point = _hash(f'{node}#{i}'.encode('utf-8'))
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        kept = [(point, name) for point, name in zip(self._points, self._nodes) if name != node]
+        self._points = [point for point, _ in kept]
+        self._nodes = [name for _, name in kept]
+
+    def node(self, key):
+        """Return the node owning key (bytes)"""
+        index = bisect.bisect(self._points, _hash(key))
+        if index == len(self._points):
+            index = 0
+        return self._nodes[index]
+
+
+class ShardedExporter:
+    """Exporter with the InfluxDBAPIv2Exporter write interface that spreads
+    lines over several exporters (shards), e.g. one InfluxDBAPIv2Exporter
+    per InfluxDB node. Each line goes to a shard chosen by consistent
+    hashing of its series key (measurement and tag set), so every point
+    of a series lands on the same node and adding a shard only moves
+    about 1/n of the series.
+
+    Lines are buffered per shard and each full buffer is written as one
+    batch, with up to max_in_flight batches per shard written
+    concurrently. With a replica exporter, every batch is also written to
+    it; replica failures are logged and kept in replica_results rather
+    than returned. An exporter raising from write_batches yields a failed
+    BatchResult (result.error) for its lines instead of aborting the
+    write. There is no spool: the shards would mix their batches in one
+    spool directory, so a job config with spool_dir is rejected.
+    """
+
+    MAX_BATCH_LINES = 5000
+    MAX_BATCH_BYTES = 4194304
+    MAX_IN_FLIGHT = 4
+    MAX_CACHED_SERIES = 100000
+    REQUIRED_CONFIG_KEYS = ('shards',)
+
+    def __init__(self, shards, replica=None, vnodes=160, metrics=None):
+        self.shards = dict(shards)
+        self.replica = replica
+        self.metrics = metrics or NULL_METRICS
+        self.ring = HashRing(self.shards, vnodes)
+        self.replica_results = []
+        self._routes = {}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Create an exporter from a config dict whose shards maps shard
+        names to exporter configs (with an optional type, see
+        data_processing.registry), with an optional replica exporter
+        config and vnodes. Shard names place shards on the ring, so keep
+        them stable. kwargs (e.g. metrics) are passed to every exporter.
+        """
+        from data_processing import registry
+
+        def build(exporter_config):
+            exporter_class = registry.exporters.resolve(exporter_config.get('type', 'influxdb'))
+            return exporter_class.from_config(exporter_config, **kwargs)
+
+        shards = {name: build(shard_config) for name, shard_config in config['shards'].items()}
+        replica = build(config['replica']) if config.get('replica') else None
+        return cls(shards, replica, config.get('vnodes', 160), kwargs.get('metrics'))
+
+    def add_shard(self, name, exporter):
+        self.shards[name] = exporter
+        self.ring.add(name)
+        self._routes.clear()
+
+    def remove_shard(self, name):
+        if name not in self.shards:
+            raise UnknownShardError(name)
+        self.ring.remove(name)
+        self._routes.clear()
+        return self.shards.pop(name)
+
+    def shard_for(self, line):
+        """Return the name of the shard that line is written to"""
+        series = series_key(line)
+        name = self._routes.get(series)
+        if name is None:
+            if len(self._routes) >= self.MAX_CACHED_SERIES:
+                self._routes.clear()
+            name = self._routes[series] = self.ring.node(series)
+        return name
+
+    @property
+    def bucket_exists(self):
+        return all(exporter.bucket_exists for exporter in self._exporters())
+
+    @property
+    def is_authenticated(self):
+        return all(exporter.is_authenticated for exporter in self._exporters())
+
+    def write_to_bucket(self, line_protocol_data, precision='ms', compression=None):
+        """Write line protocol data. Returns the response of the last
+        batch sent.
+        """
+        results = self.write_batches(line_protocol_data, precision, compression)
+        return results[-1].response if results else None
+
+    def write_batches(self, line_protocol_data, precision='ms', compression=None,
+                      max_lines=None, max_bytes=None, max_in_flight=None):
+        """Route lines (str, bytes, or any iterable of lines) to their
+        shards and write them in batches of at most max_lines lines /
+        max_bytes bytes per shard. Returns a list of BatchResult objects,
+        each with the name of its shard in result.shard, in the order the
+        batches were sent.
+        """
+        max_lines = max_lines or self.MAX_BATCH_LINES
+        max_bytes = max_bytes or self.MAX_BATCH_BYTES
+        max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        targets = len(self.shards) + (1 if self.replica else 0)
+        buffers = {name: [] for name in self.shards}
+        sizes = dict.fromkeys(self.shards, 0)
+        pending = {name: deque() for name in self.shards}
+        replica_pending = deque()
+        results = []
+        self.replica_results = []
+
+        def collect(futures):
+            shard_results = futures.popleft().result()
+            if futures is replica_pending:
+                self.replica_results += shard_results
+            else:
+                results.extend(shard_results)
+
+        def flush(name):
+            lines = buffers[name]
+            buffers[name] = []
+            sizes[name] = 0
+            if len(pending[name]) >= max_in_flight:
+                collect(pending[name])
+            pending[name].append(executor.submit(
+                self._write_shard, name, self.shards[name], lines, precision, compression,
+                max_lines, max_bytes))
+            if self.replica:
+                if len(replica_pending) >= max_in_flight:
+                    collect(replica_pending)
+                replica_pending.append(executor.submit(
+                    self._write_shard, 'replica', self.replica, lines, precision,
+                    compression, max_lines, max_bytes))
+
+        with self.metrics.stage('sharded_write', source=self.__class__.__name__) as stage, \
+                ThreadPoolExecutor(max_workers=max_in_flight * targets) as executor:
+            for line in iter_lines(line_protocol_data):
+                if isinstance(line, str):
+                    line = line.encode('utf-8')
+                name = self.shard_for(line)
+                buffers[name].append(line)
+                sizes[name] += len(line) + 1
+                if len(buffers[name]) >= max_lines or sizes[name] >= max_bytes:
+                    flush(name)
+            for name, lines in buffers.items():
+                if lines:
+                    flush(name)
+            for futures in [*pending.values(), replica_pending]:
+                while futures:
+                    collect(futures)
+            stage.set(shards=len(self.shards), batches=len(results),
+                      lines=sum(result.lines for result in results))
+        for index, result in enumerate(results):
+            result.index = index
+        failed = [result for result in self.replica_results if not result.ok]
+        if failed:
+            logger.warning('%d of %d replica batches failed', len(failed), len(self.replica_results))
+        return results
+
+    def close(self):
+        for exporter in self._exporters():
+            close = getattr(exporter, 'close', None)
+            if close:
+                close()
+
+    def _exporters(self):
+        exporters = list(self.shards.values())
+        if self.replica:
+            exporters.append(self.replica)
+        return exporters
+
+    @staticmethod
+    def _write_shard(name, exporter, lines, precision, compression, max_lines, max_bytes):
+        try:
+            results = exporter.write_batches(
+                lines, precision, compression, max_lines=max_lines, max_bytes=max_bytes,
+                max_in_flight=1)
+        except Exception as error:
+            # One failing shard (e.g. its bucket check raised) must not
+            # discard the results of the others
+            logger.exception('Writing %d lines to shard %s failed', len(lines), name)
+            results = [BatchResult(0, len(lines), b'\n'.join(lines), error=error)]
+        for result in results:
+            result.shard = name
+            if result.ok:
+                result.data = None
+        return results
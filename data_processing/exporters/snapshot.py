@@ -0,0 +1,210 @@
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from itertools import chain
+
+MAGIC = b'DPSNAP01'
+ALIGNMENT = 8
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+TYPECODES = {
+    'int64': 'q',
+    'float64': 'd',
+    'bool': '?',
+}
+
+
+class SnapshotFormatError(Exception):
+    def __init__(self, path, message):
+        super().__init__(f'Invalid snapshot {path}: {message}')
+
+
+def _column_kind(values):
+    types = set(map(type, values))
+    if types <= {bool}:
+        return 'bool'
+    if types <= {int}:
+        if not values or INT64_MIN <= min(values) and max(values) <= INT64_MAX:
+            return 'int64'
+        return 'float64'
+    if types <= {int, float}:
+        return 'float64'
+    return 'str'
+
+
+def _encode_column(values, null):
+    """Return (kind, [buffers]) for a column's values and null flags"""
+    kind = _column_kind([value for value, is_null in zip(values, null) if not is_null])
+    if kind == 'str':
+        encoded = [b'' if is_null else str(value).encode('utf-8')
+                   for value, is_null in zip(values, null)]
+        offsets = array('q', [0])
+        position = 0
+        for item in encoded:
+            position += len(item)
+            offsets.append(position)
+        return kind, [offsets.tobytes(), b''.join(encoded)]
+    if kind == 'bool':
+        return kind, [bytes(value is True for value in values)]
+    filled = [0 if is_null else value for value, is_null in zip(values, null)]
+    return kind, [array(TYPECODES[kind], filled).tobytes()]
+
+
+def write_snapshot(path, records, tag_keys=(), ignored_keys=(), metadata=None):
+    """Write records (dicts) as a columnar snapshot that Snapshot can
+    memory-map. Each key becomes a column of int64, float64, bool or
+    UTF-8 strings (mixed types fall back to strings) with a null mask
+    for missing, None and '' values. metadata is stored as JSON. The
+    file is replaced atomically. Returns the number of rows written.
+    """
+    records = list(records)
+    tag_keys = frozenset(tag_keys)
+    ignored_keys = frozenset(ignored_keys)
+    keys = [key for key in dict.fromkeys(chain.from_iterable(records))
+            if key not in ignored_keys]
+    columns = []
+    blocks = []
+    for key in keys:
+        values = [record.get(key) for record in records]
+        null = [value is None or value == '' for value in values]
+        kind, buffers = _encode_column(values, null)
+        columns.append({'name': key, 'kind': kind, 'tag': key in tag_keys})
+        blocks.append([bytes(null)] + buffers)
+    header = {
+        'rows': len(records),
+        'byteorder': sys.byteorder,
+        'metadata': metadata or {},
+        'columns': columns,
+    }
+    # Block offsets depend on the header length, which depends on the
+    # offsets, so lay out with placeholders until the length settles
+    header_size = 0
+    while True:
+        position = _align(len(MAGIC) + 8 + header_size)
+        for column, buffers in zip(columns, blocks):
+            column['blocks'] = []
+            for buffer in buffers:
+                column['blocks'].append([position, len(buffer)])
+                position = _align(position + len(buffer))
+        encoded_header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        if len(encoded_header) == header_size:
+            break
+        header_size = len(encoded_header)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as snapshot_file:
+            snapshot_file.write(MAGIC)
+            snapshot_file.write(header_size.to_bytes(8, 'little'))
+            snapshot_file.write(encoded_header)
+            for column, buffers in zip(columns, blocks):
+                for (offset, _), buffer in zip(column['blocks'], buffers):
+                    snapshot_file.write(b'\0' * (offset - snapshot_file.tell()))
+                    snapshot_file.write(buffer)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(records)
+
+
+def _align(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+class StringColumn:
+    """Sequence view of a UTF-8 string column; values are decoded on
+    access
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return str(self.blob[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+    def tolist(self):
+        blob = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [str(blob[start:end], 'utf-8') for start, end in zip(offsets, offsets[1:])]
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot written by
+    write_snapshot. Columns are returned without parsing or copying:
+    numeric and bool columns as memoryviews (usable with numpy.asarray),
+    string columns as StringColumn. Release views before close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise SnapshotFormatError(path, 'bad magic number')
+        header_size = int.from_bytes(self._view[len(MAGIC):len(MAGIC) + 8], 'little')
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self._view[start:start + header_size]))
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise SnapshotFormatError(path, f"written on a {header['byteorder']} endian host")
+        self.rows = header['rows']
+        self.metadata = header['metadata']
+        self._columns = {column['name']: column for column in header['columns']}
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def tag_keys(self):
+        return [name for name, column in self._columns.items() if column['tag']]
+
+    def kind(self, name):
+        return self._columns[name]['kind']
+
+    def null(self, name):
+        """Return the null mask of a column (1 where the value is null)"""
+        return self._block(name, 0)
+
+    def column(self, name):
+        kind = self._columns[name]['kind']
+        if kind == 'str':
+            return StringColumn(self._block(name, 1).cast('q'), self._block(name, 2))
+        return self._block(name, 1).cast(TYPECODES[kind])
+
+    def iter_records(self):
+        """Yield each row as a dict, without its null values"""
+        names = self.columns
+        columns = [self.column(name).tolist() for name in names]
+        nulls = [self.null(name).tolist() for name in names]
+        for row in range(self.rows):
+            yield {
+                name: column[row]
+                for name, column, null in zip(names, columns, nulls)
+                if not null[row]
+            }
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _block(self, name, index):
+        offset, size = self._columns[name]['blocks'][index]
+        return self._view[offset:offset + size]
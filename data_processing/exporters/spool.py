@@ -0,0 +1,221 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+RECORD_HEADER = struct.Struct('>III')
+
+
+class SpoolFullError(Exception):
+    def __init__(self, directory, max_bytes):
+        super().__init__(f'Spool {directory} is full ({max_bytes} bytes)')
+
+
+class InvalidSpoolOptionError(Exception):
+    def __init__(self, option, value, valid_values):
+        message = f"'{value}' is not a valid {option}. "
+        message += f'Valid values: {valid_values}'
+        super().__init__(message)
+
+
+class WriteSpool:
+    """Durable, append-only spool of line protocol batches, stored as
+    numbered segment files in directory. Each record is a header (metadata
+    length, data length, CRC32) followed by JSON metadata and the data, so
+    a torn write at the tail of a segment is detected and ignored.
+
+    fsync: 'always' syncs every append, 'segment' syncs when a segment is
+    closed, 'never' leaves it to the OS. When max_bytes would be exceeded,
+    on_full='evict' drops the oldest segments and on_full='block' waits up
+    to block_timeout seconds for replay to free space (backpressure) before
+    raising SpoolFullError.
+    """
+
+    SEGMENT_SUFFIX = '.spool'
+    OFFSET_SUFFIX = '.offset'
+    FSYNC_POLICIES = ('always', 'segment', 'never')
+    FULL_POLICIES = ('evict', 'block')
+
+    def __init__(self, directory, max_bytes=1073741824, segment_bytes=16777216,
+                 fsync='segment', on_full='evict', block_timeout=30):
+        if fsync not in self.FSYNC_POLICIES:
+            raise InvalidSpoolOptionError('fsync policy', fsync, self.FSYNC_POLICIES)
+        if on_full not in self.FULL_POLICIES:
+            raise InvalidSpoolOptionError('on_full policy', on_full, self.FULL_POLICIES)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+        self.evicted = 0
+        self._condition = threading.Condition()
+        self._drain_lock = threading.Lock()
+        self._active = None
+        self._active_file = None
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._segment_numbers()
+        self._next_segment = segments[-1] + 1 if segments else 1
+        self.size = sum(
+            os.path.getsize(self._segment_path(number))
+            for number in segments)
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    def append(self, data, metadata=None):
+        """Durably append one batch (bytes) with optional JSON-serializable
+        metadata
+        """
+        encoded_metadata = json.dumps(metadata or {}).encode('utf-8')
+        crc = zlib.crc32(data, zlib.crc32(encoded_metadata))
+        header = RECORD_HEADER.pack(len(encoded_metadata), len(data), crc)
+        record_size = len(header) + len(encoded_metadata) + len(data)
+        with self._condition:
+            self._make_room(record_size)
+            if self._active_file is None or self._active_file.tell() >= self.segment_bytes:
+                self._roll()
+            self._active_file.write(header + encoded_metadata + data)
+            self._active_file.flush()
+            self.size += record_size
+            if self.fsync == 'always':
+                os.fsync(self._active_file.fileno())
+
+    def drain(self, send, max_records=None):
+        """Replay spooled batches oldest first through send(data, metadata),
+        which returns True once a batch is delivered. Stops at the first
+        failure so ordering is kept and the batch is retried next time.
+        Appends are not blocked while batches are being sent. Returns the
+        number of batches delivered.
+        """
+        with self._drain_lock:
+            return self._drain(send, max_records)
+
+    def read_segment(self, path, offset=0):
+        """Yield (next_offset, metadata, data) for each intact record in a
+        segment starting at offset
+        """
+        try:
+            segment_file = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with segment_file:
+            segment_file.seek(offset)
+            while True:
+                header = segment_file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                metadata_length, data_length, crc = RECORD_HEADER.unpack(header)
+                encoded_metadata = segment_file.read(metadata_length)
+                data = segment_file.read(data_length)
+                if len(data) < data_length or \
+                        zlib.crc32(data, zlib.crc32(encoded_metadata)) != crc:
+                    return
+                offset = segment_file.tell()
+                yield offset, json.loads(encoded_metadata), data
+
+    def close(self):
+        with self._condition:
+            if self._active_file is not None:
+                self._close_active()
+
+    def _drain(self, send, max_records):
+        delivered = 0
+        with self._condition:
+            # Close the active segment so everything spooled so far is
+            # replayable; new appends go to a fresh segment
+            if self._active_file is not None and self._active_file.tell():
+                self._close_active()
+        for number in self._segment_numbers():
+            if number == self._active:
+                break
+            path = self._segment_path(number)
+            offset = self._read_offset(number)
+            for next_offset, metadata, data in self.read_segment(path, offset):
+                if max_records is not None and delivered >= max_records:
+                    return delivered
+                if not send(data, metadata):
+                    return delivered
+                delivered += 1
+                if not os.path.exists(path):
+                    # Evicted while being replayed
+                    break
+                self._write_offset(number, next_offset)
+            with self._condition:
+                self._remove_segment(number)
+                self._condition.notify_all()
+        return delivered
+
+    def _make_room(self, record_size):
+        if record_size > self.max_bytes:
+            raise SpoolFullError(self.directory, self.max_bytes)
+        deadline = time.monotonic() + self.block_timeout
+        while self.size + record_size > self.max_bytes:
+            if self.on_full == 'evict':
+                self._evict_oldest()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SpoolFullError(self.directory, self.max_bytes)
+            self._condition.wait(remaining)
+
+    def _evict_oldest(self):
+        numbers = self._segment_numbers()
+        if numbers and numbers[0] == self._active:
+            self._close_active()
+        self._remove_segment(numbers[0])
+        self.evicted += 1
+
+    def _roll(self):
+        if self._active_file is not None:
+            self._close_active()
+        self._active = self._next_segment
+        self._next_segment += 1
+        self._active_file = open(self._segment_path(self._active), 'ab')
+
+    def _close_active(self):
+        self._active_file.flush()
+        if self.fsync != 'never':
+            os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        self._active_file = None
+        self._active = None
+
+    def _remove_segment(self, number):
+        segment_path = self._segment_path(number)
+        if os.path.exists(segment_path):
+            self.size -= os.path.getsize(segment_path)
+            os.remove(segment_path)
+        if os.path.exists(self._offset_path(number)):
+            os.remove(self._offset_path(number))
+
+    def _read_offset(self, number):
+        try:
+            with open(self._offset_path(number), 'r') as offset_file:
+                return int(offset_file.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, number, offset):
+        tmp_path = f'{self._offset_path(number)}.tmp'
+        with open(tmp_path, 'w') as offset_file:
+            offset_file.write(str(offset))
+            if self.fsync == 'always':
+                offset_file.flush()
+                os.fsync(offset_file.fileno())
+        os.replace(tmp_path, self._offset_path(number))
+
+    def _segment_numbers(self):
+        return sorted(
+            int(name[:-len(self.SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(self.SEGMENT_SUFFIX))
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'{number:020d}{self.SEGMENT_SUFFIX}')
+
+    def _offset_path(self, number):
+        return os.path.join(self.directory, f'{number:020d}{self.OFFSET_SUFFIX}')
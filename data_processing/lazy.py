@@ -0,0 +1,22 @@
+import importlib
+import sys
+
+
+def lazy_exports(package_name, exports):
+    """Return PEP 562 module __getattr__ and __dir__ functions for a
+    package that re-exports names (mapping name -> defining module)
+    without importing the defining modules until a name is first used
+    """
+    def __getattr__(name):
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f'module {package_name!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(module_name), name)
+        # Cache on the package so later lookups skip __getattr__
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package_name])) | set(exports))
+
+    return __getattr__, __dir__
@@ -0,0 +1,80 @@
+"""Registry of scraper and exporter plugins by name. Entries are
+'module:attribute' strings imported on first use, so resolving one
+plugin does not import the others (or their dependencies). Third party
+packages can add plugins through the 'data_processing.scrapers' and
+'data_processing.exporters' entry point groups.
+"""
+import importlib
+
+
+class UnknownPluginError(Exception):
+    def __init__(self, kind, name, known):
+        message = f"Unknown {kind} '{name}'. Known {kind}s: {sorted(known)}"
+        super().__init__(message)
+
+
+class Registry:
+    """Name -> plugin class mapping. resolve() also accepts dotted
+    ('package.module.Class') and 'package.module:Class' paths.
+    """
+
+    def __init__(self, kind, entry_point_group, entries=None):
+        self.kind = kind
+        self.entry_point_group = entry_point_group
+        self._entries = dict(entries or {})
+        self._entry_points_loaded = False
+
+    def register(self, name, target):
+        """Register a class, or a 'module:attribute' string to import
+        lazily, under name
+        """
+        self._entries[name] = target
+
+    def names(self):
+        self._load_entry_points()
+        return sorted(self._entries)
+
+    def resolve(self, name):
+        target = self._entries.get(name)
+        if target is None and not self._entry_points_loaded:
+            self._load_entry_points()
+            target = self._entries.get(name)
+        if target is None:
+            if '.' not in name and ':' not in name:
+                raise UnknownPluginError(self.kind, name, self._entries)
+            target = name
+        if isinstance(target, str):
+            target = self._import(target)
+            if name in self._entries:
+                self._entries[name] = target
+        return target
+
+    def _load_entry_points(self):
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        # importlib.metadata is slow to import, so only load it on a miss
+        from importlib.metadata import entry_points
+        for entry_point in entry_points(group=self.entry_point_group):
+            self._entries.setdefault(entry_point.name, entry_point.value)
+
+    @staticmethod
+    def _import(path):
+        if ':' in path:
+            module_name, _, attribute = path.partition(':')
+        else:
+            module_name, _, attribute = path.rpartition('.')
+        return getattr(importlib.import_module(module_name), attribute)
+
+
+scrapers = Registry('scraper', 'data_processing.scrapers', {
+    'CDCCovidCasesScraper': 'data_processing.scrapers.cdc_covid_cases:CDCCovidCasesScraper',
+    'CDCCovidCasesFanOutScraper':
+        'data_processing.scrapers.cdc_covid_cases_fan_out:CDCCovidCasesFanOutScraper',
+})
+
+exporters = Registry('exporter', 'data_processing.exporters', {
+    'influxdb': 'data_processing.exporters.influxdb:InfluxDBAPIv2Exporter',
+    'file': 'data_processing.exporters.file:LineProtocolFileExporter',
+    'sharded': 'data_processing.exporters.sharded:ShardedExporter',
+})
@@ -1 +1,9 @@
-from data_processing.scrapers.cdc_covid_cases import CDCCovidCasesScraper
+from data_processing.lazy import lazy_exports
+
+_EXPORTS = {
+    'CDCCovidCasesScraper': 'data_processing.scrapers.cdc_covid_cases',
+    'CDCCovidCasesFanOutScraper': 'data_processing.scrapers.cdc_covid_cases_fan_out',
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
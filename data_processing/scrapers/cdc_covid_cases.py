@@ -1,9 +1,26 @@
 from datetime import datetime
 from data_processing.base import HTTPEndpointScraper
+from data_processing.base.records import record_class
+from data_processing.encoders import DeltaFilter, LineProtocolEncoder
 
 
 class CDCCovidCasesScraper(HTTPEndpointScraper):
-    """Scraper for CDC covid case data"""
+    """Scraper for CDC covid case data. update() keeps each region as a
+    compact CDCRegionRecord (slots for RECORD_KEYS, numeric strings
+    converted) rather than the decoded dict with its ignored keys.
+    Call commit() after a successful export: it commits the response
+    cache and, with delta_state_path, the DeltaFilter, so that only
+    lines whose values changed since the last committed export are
+    produced.
+    With columnar=True (requires numpy), update() also builds
+    self.region_columns (see RegionColumns) and encodes lines from it.
+    Otherwise, with encode_workers, update() encodes large payloads in a
+    pool of that many processes (see ParallelEncoder); call close() to
+    stop it.
+    With page_url_template, e.g. the URL of an archive of daily
+    US_MAP_DATA bodies with a '{page}' placeholder for the date, past
+    days can be backfilled (see Backfill).
+    """
 
     URL = 'https://covid.cdc.gov/covid-data-tracker/COVIDData/getAjaxData?id=US_MAP_DATA'
 
@@ -47,31 +64,195 @@ class CDCCovidCasesScraper(HTTPEndpointScraper):
         'collection_date',
     ]
 
-    def __init__(self, measurement):
+    # Keeps each field one type across regions (a rate of 0 must still be
+    # written as a float), as InfluxDB rejects conflicting field types
+    FIELD_TYPES = {
+        'tot_cases': int,
+        'tot_death': int,
+        'new_cases07': int,
+        'new_deaths07': int,
+        'prob_death': int,
+        'conf_death': int,
+        'prob_cases': int,
+        'conf_cases': int,
+        'tot_cases_last_24_hours': int,
+        'tot_death_last_24_hours': int,
+        'id': int,
+        'death_100k': float,
+        'incidence': float,
+        'Seven_day_avg_new_cases_per_100k': float,
+        'Seven_day_avg_new_deaths_per_100k': float,
+        'Seven_day_cum_new_cases_per_100k': float,
+        'Seven_day_cum_new_deaths_per_100k': float,
+    }
+
+    # Schema of CDCRegionRecord, in the order the endpoint sends the
+    # fields (which is the order they are encoded in)
+    RECORD_KEYS = [
+        'abbr',
+        'tot_cases',
+        'new_cases07',
+        'new_deaths07',
+        'Seven_day_avg_new_cases_per_100k',
+        'Seven_day_avg_new_deaths_per_100k',
+        'Seven_day_cum_new_cases_per_100k',
+        'Seven_day_cum_new_deaths_per_100k',
+        'tot_death',
+        'death_100k',
+        'incidence',
+        'prob_death',
+        'conf_death',
+        'prob_cases',
+        'conf_cases',
+        'tot_cases_last_24_hours',
+        'tot_death_last_24_hours',
+        'id',
+        'fips',
+        'name',
+    ]
+
+    STREAM_PATH = 'US_MAP_DATA'
+
+    def __init__(self, measurement, stream=False, cache_dir=None,
+                 delta_state_path=None, full_refresh_interval=None, metrics=None,
+                 columnar=False, page_url_template=None, encode_workers=None,
+                 encode_chunk_size=5000, json_decoder='auto'):
         self.measurement = measurement
-        super().__init__(self.URL)
+        self.columnar = columnar
+        self.delta = None
+        if delta_state_path:
+            self.delta = DeltaFilter(delta_state_path, full_refresh_interval)
+        self.encoder = LineProtocolEncoder(
+            measurement,
+            tag_keys=self.TAG_KEYS,
+            key_map=self.KEY_MAP,
+            ignored_keys=self.IGNORED_KEYS,
+            field_types=self.FIELD_TYPES)
+        self.parallel_encoder = None
+        if encode_workers:
+            # Imported here so only scrapers that encode in parallel load
+            # the process pool machinery
+            from data_processing.encoders import ParallelEncoder
+            self.parallel_encoder = ParallelEncoder(
+                self.encoder, encode_workers, encode_chunk_size)
+        stream_path = self.STREAM_PATH if stream else None
+        super().__init__(self.URL, stream_path=stream_path, cache_dir=cache_dir,
+                         metrics=metrics, page_url_template=page_url_template,
+                         json_decoder=json_decoder)
 
     def reset(self):
         """Resets all data attributes to default values"""
         super().reset()
         self.metadata = {}
         self.region_data = {}
+        self.region_columns = None
         self.updated_at = float()
         self.line_protocol_lines = []
 
     def update(self):
         """Updates self.metadata, self.region_data, self.updated_at, and
-        self.line_protocol_lines attributes.
+        self.line_protocol_lines attributes. Leaves them empty if the scrape
+        found the upstream data unchanged (self.changed is False). The
+        records in self.region_data also replace the decoded dicts in
+        self.data, so those can be freed.
         """
         if not self.data:
             self.scrape()
-        self.metadata = self.data['CSVInfo']
-        self.region_data = self.data['US_MAP_DATA']
-        self.updated_at = datetime.strptime(
-            self.metadata['update'],
-            '%b %d %Y %I:%M%p'
-        ).timestamp()
-        self._parse_region_data_to_line_protocol_lines()
+            if not self.changed:
+                return
+        with self.metrics.stage('encode', source=self.__class__.__name__) as stage:
+            self._update_metadata()
+            self.region_data = list(map(CDCRegionRecord.from_dict, self.data['US_MAP_DATA']))
+            self.data = {**self.data, 'US_MAP_DATA': self.region_data}
+            self._parse_region_data_to_line_protocol_lines()
+            stage.set(records=len(self.region_data), lines=len(self.line_protocol_lines))
+
+    def iter_line_protocol_lines(self):
+        """Yield line protocol lines. When the scraper was created with
+        stream=True, records are encoded as they are read from the
+        response and neither region_data nor line_protocol_lines is
+        populated, so memory stays bounded by record size. Otherwise
+        update() runs first and its lines are yielded.
+        """
+        if not self.stream_path:
+            if not self.line_protocol_lines:
+                self.update()
+            yield from self.line_protocol_lines
+            return
+        lines = self._iter_stream_lines()
+        if self.delta:
+            lines = self.delta.filter(lines)
+        yield from lines
+
+    def page_lines(self, page, data):
+        """Yield the lines of a backfill page timestamped with its own
+        CSVInfo update time. Regions go through CDCRegionRecord as in
+        update(), so backfilled fields get the same types as live ones.
+        The delta filter is not applied, since a backfill rewrites every
+        value.
+        """
+        updated_at = self._parse_update_time(data['CSVInfo'])
+        records = map(CDCRegionRecord.from_dict, data['US_MAP_DATA'])
+        return self.encoder.encode_records(records, int(updated_at))
+
+    def save_snapshot(self, path):
+        """Write self.region_data and self.metadata to a columnar snapshot
+        (see write_snapshot) for offline reprocessing
+        """
+        from data_processing.exporters.snapshot import write_snapshot
+        return write_snapshot(
+            path,
+            self.region_data,
+            tag_keys=self.TAG_KEYS,
+            ignored_keys=self.IGNORED_KEYS,
+            metadata={'CSVInfo': self.metadata})
+
+    def load_snapshot(self, path):
+        """Set self.data from a snapshot written by save_snapshot, so
+        update() reprocesses it without an HTTP request
+        """
+        from data_processing.exporters.snapshot import Snapshot
+        self.reset()
+        with Snapshot(path) as snapshot:
+            self.data = {
+                'CSVInfo': snapshot.metadata['CSVInfo'],
+                'US_MAP_DATA': list(snapshot.iter_records()),
+            }
+
+    def close(self):
+        if self.parallel_encoder:
+            self.parallel_encoder.close()
+        super().close()
+
+    def commit(self):
+        """Mark the response and the lines produced since the last reset()
+        as exported
+        """
+        super().commit()
+        self.commit_delta()
+
+    def commit_delta(self):
+        """Mark the lines produced since the last reset() as exported"""
+        if self.delta:
+            self.delta.commit()
+
+    def _iter_stream_lines(self):
+        pending = []
+        for record in map(CDCRegionRecord.from_dict, self.iter_records()):
+            if not self.updated_at:
+                # Records may precede CSVInfo, whose timestamp every line needs
+                if 'CSVInfo' not in self.data:
+                    pending.append(record)
+                    continue
+                self._update_metadata()
+                yield from self.encoder.encode_records(pending, int(self.updated_at))
+                pending = []
+            line = self.encoder.encode_record(record, int(self.updated_at))
+            if line is not None:
+                yield line
+        if pending:
+            self._update_metadata()
+            yield from self.encoder.encode_records(pending, int(self.updated_at))
 
     @property
     def line_protocol_data(self):
@@ -79,30 +260,36 @@ class CDCCovidCasesScraper(HTTPEndpointScraper):
         data += '\n'.join(self.line_protocol_lines)
         return data
 
+    def _update_metadata(self):
+        self.metadata = self.data['CSVInfo']
+        self.updated_at = self._parse_update_time(self.metadata)
+
+    @staticmethod
+    def _parse_update_time(metadata):
+        return datetime.strptime(
+            metadata['update'],
+            '%b %d %Y %I:%M%p'
+        ).timestamp()
+
     def _parse_region_data_to_line_protocol_lines(self):
         if not self.line_protocol_lines:
-            for record in self.region_data:
-                tag_str = ''
-                field_str = ''
-
-                for key in record:
-                    if record[key] and key not in self.IGNORED_KEYS:
-                        value = record[key]
-
-                        if isinstance(value, str):
-                            value = value.replace(' ', '\\ ')
-
-                        if key in self.TAG_KEYS:
-                            tag_str += f'{self.KEY_MAP[key]}={value},'
-                        else:
-                            if key in self.KEY_MAP:
-                                field_str += f'{self.KEY_MAP[key]}={value},'
-                            else:
-                                field_str += f'{key}={value},'
-
-                line_protocol_str = f'{self.measurement},'
-                line_protocol_str += f'{tag_str[:-1]} '
-                line_protocol_str += f'{field_str[:-1]} '
-                line_protocol_str += f'{int(self.updated_at)}'
-
-                self.line_protocol_lines.append(line_protocol_str)
+            if self.columnar:
+                # Imported here so numpy is only loaded for columnar output
+                from data_processing.encoders import RegionColumns
+                self.region_columns = RegionColumns.from_records(self.region_data, self.encoder)
+                lines = self.region_columns.encode(int(self.updated_at))
+            elif self.parallel_encoder:
+                lines = self.parallel_encoder.encode_lines(self.region_data, int(self.updated_at))
+            else:
+                lines = self.encoder.encode_records(self.region_data, int(self.updated_at))
+            if self.delta:
+                lines = self.delta.filter(lines)
+            self.line_protocol_lines = list(lines)
+
+
+CDCRegionRecord = record_class(
+    'CDCRegionRecord',
+    CDCCovidCasesScraper.RECORD_KEYS,
+    tag_keys=CDCCovidCasesScraper.TAG_KEYS,
+    ignored_keys=CDCCovidCasesScraper.IGNORED_KEYS,
+    module=__name__)
@@ -0,0 +1,57 @@
+from data_processing.base import FanOutHTTPEndpointScraper
+from data_processing.scrapers.cdc_covid_cases import CDCCovidCasesScraper
+
+
+class CDCCovidCasesFanOutScraper(FanOutHTTPEndpointScraper, CDCCovidCasesScraper):
+    """CDCCovidCasesScraper that fetches several CDC bodies concurrently
+    (see FanOutHTTPEndpointScraper) and merges them into one update.
+    targets are CDC data ids (e.g. 'US_MAP_DATA'), dicts of query
+    parameters for url, or URLs; every body must have the CSVInfo and
+    US_MAP_DATA keys. Regions are kept in target order, the first body
+    listing a region (by abbr) wins, and lines are timestamped with the
+    most recent CSVInfo update time.
+
+    Streaming and the response cache are not supported; the other
+    CDCCovidCasesScraper options are.
+    """
+
+    DATA_URL = 'https://covid.cdc.gov/covid-data-tracker/COVIDData/getAjaxData'
+
+    def __init__(self, measurement, targets, url=None, max_workers=16, max_per_host=4,
+                 allow_partial=False, delta_state_path=None, full_refresh_interval=None,
+                 metrics=None, columnar=False, page_url_template=None, encode_workers=None,
+                 encode_chunk_size=5000, json_decoder='auto'):
+        if not isinstance(targets, dict):
+            targets = dict(enumerate(targets))
+        targets = {key: self._target(target) for key, target in targets.items()}
+        self.set_targets(targets, max_workers, max_per_host, allow_partial)
+        CDCCovidCasesScraper.__init__(
+            self, measurement, delta_state_path=delta_state_path,
+            full_refresh_interval=full_refresh_interval, metrics=metrics, columnar=columnar,
+            page_url_template=page_url_template, encode_workers=encode_workers,
+            encode_chunk_size=encode_chunk_size, json_decoder=json_decoder)
+        self.url = url or self.DATA_URL
+
+    def scrape(self):
+        super().scrape()
+        if not self.data:
+            # Every target failed (with allow_partial): nothing to update
+            self.changed = False
+
+    def merge(self, results):
+        """Combine the bodies into one CSVInfo / US_MAP_DATA body"""
+        if not results:
+            return {}
+        bodies = list(results.values())
+        latest = max(bodies, key=lambda body: self._parse_update_time(body['CSVInfo']))
+        regions = {}
+        for body in bodies:
+            for region in body['US_MAP_DATA']:
+                regions.setdefault(region.get('abbr'), region)
+        return {'CSVInfo': latest['CSVInfo'], 'US_MAP_DATA': list(regions.values())}
+
+    @staticmethod
+    def _target(target):
+        if isinstance(target, str) and '://' not in target:
+            return {'id': target}
+        return target
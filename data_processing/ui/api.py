@@ -1 +1,248 @@
-# whimsical scaffolding, may not be used
+#!/usr/bin/env python3
+"""Read-only HTTP API serving the latest CDCCovidCasesScraper results
+from memory. Every response body is serialized (and gzip compressed)
+once per update with an ETag, so requests are a dict lookup.
+
+    GET /regions              all region records (JSON)
+    GET /regions/<abbr|fips>  one region record (JSON), e.g. /regions/AK
+    GET /regions.lp           all regions as line protocol
+    GET /metadata             CSVInfo and updated_at (JSON)
+    GET /health               200 once results are loaded
+
+Run from the project root directory like so:
+
+    python -m data_processing.ui.api --port 8080 --interval 3600
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPE = 'application/json'
+LINE_PROTOCOL_TYPE = 'text/plain; charset=utf-8'
+
+
+class Resource:
+    """Pre-serialized response body with its ETag and, for bodies of at
+    least gzip_threshold bytes, a gzip compressed copy
+    """
+
+    def __init__(self, body, content_type=JSON_TYPE, gzip_threshold=1024):
+        self.body = body
+        self.content_type = content_type
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.gzip_body = None
+        if len(body) >= gzip_threshold:
+            self.gzip_body = gzip.compress(body, mtime=0)
+
+    @classmethod
+    def json(cls, value):
+        return cls(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+class LatestResults:
+    """Immutable set of resources built from one scrape. Regions are
+    indexed by upper-cased abbr and by fips.
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    @classmethod
+    def from_scraper(cls, scraper):
+        region_data = [dict(record) for record in scraper.region_data]
+        timestamp = int(scraper.updated_at)
+        lines = scraper.encoder.encode_records(region_data, timestamp)
+        resources = {
+            '/health': Resource.json({'status': 'ok', 'updated_at': timestamp}),
+            '/regions': Resource.json(region_data),
+            '/regions.lp': Resource(
+                '\n'.join(lines).encode('utf-8'),
+                LINE_PROTOCOL_TYPE),
+            '/metadata': Resource.json({
+                'updated_at': timestamp,
+                'CSVInfo': scraper.metadata,
+            }),
+        }
+        for record in region_data:
+            resource = Resource.json(record)
+            for key in ('abbr', 'fips'):
+                value = record.get(key)
+                if value:
+                    resources[f'/regions/{str(value).upper()}'] = resource
+        return cls(resources)
+
+    def get(self, path):
+        return self.resources.get(path)
+
+
+class ResultsServer:
+    """Threaded HTTP server for the latest results of scraper. update()
+    scrapes once and swaps in new results if the data changed; with
+    interval it runs every interval seconds from a background thread.
+    """
+
+    NOT_FOUND = Resource.json({'error': 'not found'})
+    NOT_READY = Resource.json({'error': 'no results yet'})
+
+    def __init__(self, scraper, host='127.0.0.1', port=8080, interval=None):
+        self.scraper = scraper
+        self.interval = interval
+        self.results = None
+        self.updates = 0
+        self.stopped = threading.Event()
+        self._update_lock = threading.Lock()
+        self._update_thread = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._serve_thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def update(self):
+        """Scrape and rebuild the results. Returns True if they changed."""
+        with self._update_lock:
+            self.scraper.reset()
+            self.scraper.update()
+            if not self.scraper.changed and self.results:
+                return False
+            if not self.scraper.changed:
+                # Unchanged since a previous process; serve the cached body
+                if not self.scraper.load_cache():
+                    return False
+                self.scraper.update()
+            self.results = LatestResults.from_scraper(self.scraper)
+            self.scraper.commit()
+            self.updates += 1
+            return True
+
+    def start(self):
+        """Serve requests (and refresh results) from background threads"""
+        self.stopped.clear()
+        if self.interval:
+            self._update_thread = threading.Thread(target=self._update_loop, daemon=True)
+            self._update_thread.start()
+        self._serve_thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.1},
+            daemon=True)
+        self._serve_thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        if self._serve_thread:
+            self._serve_thread.join()
+        if self._update_thread:
+            self._update_thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve(self):
+        """Refresh and serve in the foreground until interrupted"""
+        self.start()
+        try:
+            self.stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _update_loop(self):
+        while not self.stopped.is_set():
+            try:
+                self.update()
+            except Exception:
+                logger.exception('Results update failed')
+            self.stopped.wait(self.interval)
+
+    def _respond(self, handler):
+        path = handler.path.split('?', 1)[0].rstrip('/')
+        if path.startswith('/regions/'):
+            path = path.upper().replace('/REGIONS/', '/regions/', 1)
+        results = self.results
+        status = 200
+        if results is None:
+            resource, status = self.NOT_READY, 503
+        else:
+            resource = results.get(path)
+            if resource is None:
+                resource, status = self.NOT_FOUND, 404
+        if status == 200 and resource.etag in handler.headers.get('If-None-Match', ''):
+            handler.send_response(304)
+            handler.send_header('ETag', resource.etag)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        body = resource.body
+        handler.send_response(status)
+        handler.send_header('Content-Type', resource.content_type)
+        handler.send_header('ETag', resource.etag)
+        if resource.gzip_body:
+            handler.send_header('Vary', 'Accept-Encoding')
+        if resource.gzip_body and 'gzip' in handler.headers.get('Accept-Encoding', ''):
+            body = resource.gzip_body
+            handler.send_header('Content-Encoding', 'gzip')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; don't let Nagle hold
+            # the body back waiting for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server._respond(self)
+
+            def do_HEAD(self):
+                server._respond(self)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the latest CDC covid case data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--interval', type=float, default=3600,
+                        help='Seconds between scrapes (default 3600)')
+    parser.add_argument('--measurement', default='covid_cases')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from data_processing.scrapers import CDCCovidCasesScraper
+    scraper = CDCCovidCasesScraper(args.measurement, cache_dir=args.cache_dir)
+    server = ResultsServer(scraper, args.host, args.port, args.interval)
+    logger.info('Serving on %s', server.url)
+    server.serve()
+
+
+if __name__ == '__main__':
+    main()
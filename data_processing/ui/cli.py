@@ -1 +1,369 @@
-# whimsical scaffolding, may not be used
+#!/usr/bin/env python3
+"""Scheduler daemon that runs many scraper -> exporter jobs from one YAML
+config file. Scrapers and exporters are created once per job and reused
+between runs, so HTTP sessions (and their TLS connections) stay open.
+
+Example config:
+
+    workers: 4
+    jobs:
+      - name: cdc_cases
+        scraper: CDCCovidCasesScraper
+        scraper_options:
+          measurement: covid_cases
+          cache_dir: /var/cache/data_processing
+          # Optional: only export values that changed, with a full
+          # refresh once a day
+          delta_state_path: /var/lib/data_processing/cdc_cases.json
+          full_refresh_interval: 86400
+        interval: 3600
+        precision: s
+        exporter:
+          influx_url: https://localhost:8086
+          influx_org: my_org
+          influx_bucket: covid
+          influx_token: my_token
+          # Optional: spool failed batches to disk and replay them
+          # (influxdb exporters only; shards of a sharded exporter
+          # cannot share one spool)
+          spool_dir: /var/spool/data_processing/cdc_cases
+          spool_options:
+            max_bytes: 1073741824
+
+scraper and exporter type are names from data_processing.registry
+(exporter types: influxdb, the default, and file) or dotted import paths
+such as mypackage.scrapers:MyScraper. Plugins are only imported when a
+job uses them.
+
+To fetch several CDC bodies (e.g. one per data id) concurrently and
+export them as one update, use the CDCCovidCasesFanOutScraper with a
+list of targets (see FanOutHTTPEndpointScraper for the limits):
+
+    scraper: CDCCovidCasesFanOutScraper
+    scraper_options:
+      measurement: covid_cases
+      targets: [US_MAP_DATA, another_data_id]
+      max_per_host: 4
+
+With exporter type: sharded, lines are spread over several exporters
+by consistent hashing of their series key, optionally mirrored to a
+replica (see ShardedExporter):
+
+    exporter:
+      type: sharded
+      shards:
+        node_a: {influx_url: https://influx-a:8086, influx_org: ..., ...}
+        node_b: {influx_url: https://influx-b:8086, influx_org: ..., ...}
+      replica: {type: file, directory: /var/lib/data_processing/mirror}
+
+With exporter type: file, lines are archived to rotated local files
+instead (see LineProtocolFileExporter):
+
+    exporter:
+      type: file
+      directory: /var/lib/data_processing/archive
+      options:
+        compression: gzip
+
+A top-level metrics section (same influx_* keys, plus an optional
+measurement) records per-stage timings of every job and writes them to
+that bucket after each run:
+
+    metrics:
+      influx_url: https://localhost:8086
+      influx_org: my_org
+      influx_bucket: pipeline_metrics
+      influx_token: my_token
+
+Run from the project root directory like so:
+
+    python -m data_processing.ui.cli config.yaml
+
+To backfill one job over a range of days instead (its scraper needs a
+page_url_template in scraper_options; see Backfill), resuming from the
+checkpoint file if the backfill was interrupted:
+
+    python -m data_processing.ui.cli config.yaml --backfill cdc_cases \
+        --start 2022-01-01 --end 2022-12-31 --checkpoint backfill.json
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from data_processing import registry
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_JOB_KEYS = ['name', 'scraper', 'interval', 'exporter']
+
+
+class InvalidJobConfigError(Exception):
+    def __init__(self, job_name, message):
+        super().__init__(f'Invalid config for job {job_name}: {message}')
+
+
+def build_exporter(config, job_name, **kwargs):
+    """Create the exporter registered as config's type (default influxdb)
+    from its from_config(), checking its REQUIRED_CONFIG_KEYS first
+    """
+    exporter_class = registry.exporters.resolve(config.get('type', 'influxdb'))
+    for key in getattr(exporter_class, 'REQUIRED_CONFIG_KEYS', ()):
+        if key not in config:
+            raise InvalidJobConfigError(job_name, f'exporter missing required key: {key}')
+    return exporter_class.from_config(config, **kwargs)
+
+
+class Job:
+    """Scraper -> exporter job run every interval seconds. The scraper must
+    provide iter_line_protocol_lines() (see CDCCovidCasesScraper).
+    """
+
+    def __init__(self, name, scraper, exporter, interval, precision='s',
+                 metrics_exporter=None):
+        self.name = name
+        self.scraper = scraper
+        self.exporter = exporter
+        self.interval = interval
+        self.precision = precision
+        self.metrics_exporter = metrics_exporter
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls, config, metrics_exporter=None, metrics_measurement='pipeline_stage'):
+        name = config.get('name', '<unnamed>')
+        for key in REQUIRED_JOB_KEYS:
+            if key not in config:
+                raise InvalidJobConfigError(name, f'missing required key: {key}')
+        exporter_config = config['exporter']
+        scraper_class = registry.scrapers.resolve(config['scraper'])
+        scraper = scraper_class(**config.get('scraper_options', {}))
+        kwargs = {}
+        if metrics_exporter:
+            from data_processing.base import Metrics
+            kwargs['metrics'] = scraper.metrics = Metrics(metrics_measurement, tags={'job': name})
+        spool = None
+        if 'spool_dir' in exporter_config:
+            exporter_type = exporter_config.get('type', 'influxdb')
+            if not hasattr(registry.exporters.resolve(exporter_type), 'start_spool_replay'):
+                raise InvalidJobConfigError(
+                    name, f'exporter type {exporter_type} does not support spool_dir')
+            from data_processing.exporters import WriteSpool
+            kwargs['spool'] = spool = WriteSpool(
+                exporter_config['spool_dir'],
+                **exporter_config.get('spool_options', {}))
+        exporter = build_exporter(exporter_config, name, **kwargs)
+        if spool:
+            exporter.start_spool_replay(exporter_config.get('spool_replay_interval', 5))
+        return cls(
+            name,
+            scraper,
+            exporter,
+            float(config['interval']),
+            config.get('precision', 's'),
+            metrics_exporter)
+
+    def run(self):
+        """Scrape and export once. Returns the exporter's batch results."""
+        try:
+            results = self._run()
+        finally:
+            if self.metrics_exporter:
+                self.export_metrics()
+        return results
+
+    def export_metrics(self):
+        try:
+            self.exporter.metrics.export(self.metrics_exporter)
+        except Exception:
+            logger.exception('%s: metrics export failed', self.name)
+
+    def _run(self):
+        self.scraper.reset()
+        lines = self.scraper.iter_line_protocol_lines()
+        results = self.exporter.write_batches(lines, precision=self.precision)
+        self.runs += 1
+        failed = [result for result in results if not result.ok]
+        if all(result.ok or result.spooled for result in results) \
+                and hasattr(self.scraper, 'commit'):
+            self.scraper.commit()
+        if failed:
+            logger.warning('%s: %d of %d batches failed', self.name, len(failed), len(results))
+        else:
+            logger.info('%s: wrote %d lines', self.name, sum(result.lines for result in results))
+        return results
+
+    def close(self):
+        """Close the scraper, stop spool replay and flush the exporter's
+        spool or files
+        """
+        if getattr(self.exporter, 'spool', None):
+            self.exporter.stop_spool_replay()
+            self.exporter.spool.close()
+        for component in (self.scraper, self.exporter):
+            close = getattr(component, 'close', None)
+            if close:
+                close()
+
+
+class Scheduler:
+    """Heap-based scheduler running jobs on a worker pool. A job whose
+    previous run is still going when it comes due is skipped for that tick
+    rather than run twice at once.
+    """
+
+    def __init__(self, jobs, workers=4, clock=time.monotonic):
+        self.jobs = jobs
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.stopped = threading.Event()
+        self._counter = itertools.count()
+        self._heap = []
+        self._lock = threading.Lock()
+        now = self.clock()
+        for job in jobs:
+            self._schedule(job, now)
+
+    def run_pending(self):
+        """Start every job that is due. Returns seconds until the next one."""
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now:
+            due, _, job = heapq.heappop(self._heap)
+            with self._lock:
+                if job.running:
+                    job.skipped += 1
+                    logger.warning('%s: previous run still in progress, skipping', job.name)
+                else:
+                    job.running = True
+                    self.executor.submit(self._run_job, job)
+            # Keep a fixed cadence, but don't try to catch up missed ticks
+            next_run = due + job.interval
+            if next_run <= now:
+                next_run = now + job.interval
+            self._schedule(job, next_run)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+    def serve(self):
+        """Run jobs until stop() is called"""
+        while not self.stopped.is_set():
+            delay = self.run_pending()
+            self.stopped.wait(delay)
+
+    def stop(self, wait=True):
+        self.stopped.set()
+        self.executor.shutdown(wait=wait)
+        for job in self.jobs:
+            job.close()
+
+    def _schedule(self, job, when):
+        heapq.heappush(self._heap, (when, next(self._counter), job))
+
+    def _run_job(self, job):
+        try:
+            job.run()
+        except Exception:
+            logger.exception('%s: run failed', job.name)
+        finally:
+            with self._lock:
+                job.running = False
+
+
+def load_config(config_file_path):
+    import yaml
+    with open(config_file_path, 'r') as config_file:
+        return yaml.safe_load(config_file)
+
+
+def build_scheduler(config):
+    metrics_exporter = None
+    metrics_measurement = 'pipeline_stage'
+    metrics_config = config.get('metrics')
+    if metrics_config:
+        metrics_exporter = build_exporter(metrics_config, 'metrics')
+        metrics_measurement = metrics_config.get('measurement', metrics_measurement)
+    jobs = [
+        Job.from_config(job_config, metrics_exporter, metrics_measurement)
+        for job_config in config.get('jobs', [])
+    ]
+    return Scheduler(jobs, workers=config.get('workers', 4))
+
+
+def run_backfill(config, job_name, start, end, checkpoint_path=None, workers=4):
+    """Backfill the days from start to end (ISO dates) of a job's scraper
+    into its exporter. Returns the Backfill.
+    """
+    from data_processing.base import Backfill, date_pages
+    job_configs = {job_config.get('name'): job_config for job_config in config.get('jobs', [])}
+    if job_name not in job_configs:
+        raise InvalidJobConfigError(job_name, 'no job with this name')
+    job = Job.from_config(job_configs[job_name])
+    backfill = Backfill(
+        job.scraper,
+        job.exporter,
+        date_pages(start, end),
+        checkpoint_path,
+        workers=workers,
+        precision=job.precision)
+
+    def handle_signal(signum, frame):
+        logger.info('Received signal %s, stopping backfill', signum)
+        backfill.stop()
+
+    previous_handler = signal.signal(signal.SIGTERM, handle_signal)
+    try:
+        backfill.run()
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        job.close()
+    logger.info('%s: backfilled %d pages (%d lines, %d skipped, %d failed)', job_name,
+                backfill.exported, backfill.lines, backfill.skipped, len(backfill.failed))
+    return backfill
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run scraper/exporter jobs on a schedule')
+    parser.add_argument('config', help='Path to YAML jobs config file')
+    parser.add_argument('--once', action='store_true', help='Run every job once and exit')
+    parser.add_argument('--log-level', default='INFO')
+    parser.add_argument('--backfill', metavar='JOB', help='Backfill JOB and exit')
+    parser.add_argument('--start', help='First day to backfill (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last day to backfill (YYYY-MM-DD)')
+    parser.add_argument('--checkpoint', help='Backfill checkpoint file to resume from')
+    parser.add_argument('--workers', type=int, default=4, help='Pages fetched concurrently')
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    if args.backfill:
+        if not args.start or not args.end:
+            parser.error('--backfill requires --start and --end')
+        run_backfill(load_config(args.config), args.backfill, args.start, args.end,
+                     args.checkpoint, args.workers)
+        return
+
+    scheduler = build_scheduler(load_config(args.config))
+    if args.once:
+        scheduler.run_pending()
+        scheduler.stop()
+        return
+
+    def handle_signal(signum, frame):
+        logger.info('Received signal %s, stopping', signum)
+        scheduler.stopped.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    scheduler.serve()
+    scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 import sys
 import yaml
 from data_processing.exporters import InfluxDBAPIv2Exporter
-from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.scrapers import CDCCovidCasesFanOutScraper, CDCCovidCasesScraper
 
 REQUIRED_KEYS = [
     'measurement',
@@ -19,6 +19,11 @@ KEY_DESCRIPTIONS = {
     'influx_bucket': 'Name of bucket to write line protocol data points to',
     'influx_token': 'API token to use for authorization of GET and POST calls',
     'https_verify': 'Boolean value that controls whether TLS certs will be verified (default True)',
+    'cache_dir': 'Directory for caching CDC responses; unchanged data is not re-exported (optional)',
+    'delta_state_path': 'File tracking exported values; only changed values are exported (optional)',
+    'full_refresh_interval': 'Seconds between exports of every value when using delta_state_path (optional)',
+    'encode_workers': 'Processes used to encode large payloads to line protocol (optional)',
+    'targets': 'CDC data ids fetched concurrently and merged into one export (optional)',
 }
 
 
@@ -43,17 +48,43 @@ def main(config_file_path):
     bucket = config['influx_bucket']
     token = config['influx_token']
     verify = config.get('https_verify', True)
+    cache_dir = config.get('cache_dir', None)
+    delta_state_path = config.get('delta_state_path', None)
+    full_refresh_interval = config.get('full_refresh_interval', None)
+    encode_workers = config.get('encode_workers', None)
+    targets = config.get('targets', None)
 
     # Init objects
-    scraper = CDCCovidCasesScraper(measurement)
+    if targets:
+        scraper = CDCCovidCasesFanOutScraper(
+            measurement,
+            targets,
+            delta_state_path=delta_state_path,
+            full_refresh_interval=full_refresh_interval,
+            encode_workers=encode_workers)
+    else:
+        scraper = CDCCovidCasesScraper(
+            measurement,
+            cache_dir=cache_dir,
+            delta_state_path=delta_state_path,
+            full_refresh_interval=full_refresh_interval,
+            encode_workers=encode_workers)
     exporter = InfluxDBAPIv2Exporter(base_url, org, bucket, token, verify=verify)
 
     # Scrape data from CDC API
-    scraper.update()
+    try:
+        scraper.update()
+    finally:
+        scraper.close()
+    if not scraper.changed:
+        print('CDC data unchanged since last run, nothing to export')
+        return
 
     # Export data to InfluxDB
     assert exporter.is_authenticated
-    exporter.write_to_bucket(scraper.line_protocol_data, precision='s')
+    results = exporter.write_batches(scraper.line_protocol_lines, precision='s')
+    if all(result.ok for result in results):
+        scraper.commit()
 
 
 if __name__ == '__main__':
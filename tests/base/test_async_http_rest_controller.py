@@ -0,0 +1,78 @@
+import asyncio
+import time
+import pytest
+from data_processing.base import AsyncHTTPRESTController
+
+
+@pytest.fixture()
+def controller(stub_server):
+    controller = AsyncHTTPRESTController(
+        stub_server.url,
+        {'Accept': 'application/json'},
+        max_concurrency=4)
+    yield controller
+    controller.close()
+
+
+def test_init(controller):
+    assert controller.max_concurrency == 4
+    assert controller.executor._max_workers == 4
+    assert controller.session.get_adapter('http://localhost')._pool_maxsize == 4
+    assert controller.session.headers == {'Accept': 'application/json'}
+
+
+def test_build_url(controller, stub_server):
+    assert controller.build_url('/foo', {'bar': 'baz'}) == f'{stub_server.url}/foo?bar=baz'
+
+
+def test_get(controller, stub_server):
+    stub_server.set_response('GET', '/foo', body=b'{"foo": 1}')
+    response = asyncio.run(controller.get('/foo', {'bar': 'baz'}))
+    assert response.json() == {'foo': 1}
+    assert stub_server.requests[0].method == 'GET'
+    assert stub_server.requests[0].path == '/foo?bar=baz'
+
+
+def test_put(controller, stub_server):
+    response = asyncio.run(controller.put('/foo', data=b'payload'))
+    assert response.status_code == 200
+    assert stub_server.requests[0].method == 'PUT'
+    assert stub_server.requests[0].body == b'payload'
+
+
+def test_post_with_headers(controller, stub_server):
+    response = asyncio.run(controller.post('/foo', data=b'payload', headers={'X-Foo': 'bar'}))
+    assert response.status_code == 200
+    assert stub_server.requests[0].body == b'payload'
+    assert stub_server.requests[0].headers['X-Foo'] == 'bar'
+    assert stub_server.requests[0].headers['Accept'] == 'application/json'
+
+
+def test_post_sync(controller, stub_server):
+    response = controller._post_sync(controller.build_url('/foo'), data=b'payload')
+    assert response.status_code == 200
+    assert stub_server.requests[0].body == b'payload'
+
+
+def test_concurrency_limit(controller, stub_server):
+    stub_server.latency = 0.2
+
+    async def get_many(count):
+        return await asyncio.gather(*(controller.get('/foo') for _ in range(count)))
+
+    start = time.perf_counter()
+    responses = asyncio.run(get_many(8))
+    elapsed = time.perf_counter() - start
+    assert [response.status_code for response in responses] == [200] * 8
+    # 8 requests, 4 at a time: two rounds, not one and not eight
+    assert 0.4 <= elapsed < 1.2
+
+
+def test_async_context_manager(stub_server):
+    async def get():
+        async with AsyncHTTPRESTController(stub_server.url, {}) as controller:
+            return await controller.get('/foo'), controller
+
+    response, controller = asyncio.run(get())
+    assert response.status_code == 200
+    assert controller.executor._shutdown
@@ -0,0 +1,165 @@
+import json
+import threading
+from datetime import date
+import pytest
+from data_processing.base.backfill import Backfill, BackfillNotSupportedError, date_pages, offset_pages
+from data_processing.exporters.influxdb import BatchResult
+from data_processing.scrapers import CDCCovidCasesScraper
+
+DAYS = ['2022-01-01', '2022-01-02', '2022-01-03', '2022-01-04', '2022-01-05']
+
+
+class Accepted:
+    status_code = 204
+
+
+class FakeExporter:
+    """Collects written lines and tracks how many writes overlap"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lines = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def write_batches(self, lines, precision='ms', max_lines=5000, max_bytes=4194304):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        threading.Event().wait(self.delay)
+        lines = list(lines)
+        with self._lock:
+            self.lines += lines
+            self.active -= 1
+        return [BatchResult(0, len(lines), b'', response=Accepted())]
+
+
+def page_body(day):
+    month_day = date.fromisoformat(day).strftime('%b %d %Y')
+    return json.dumps({
+        'CSVInfo': {'update': f'{month_day}  3:08PM'},
+        'US_MAP_DATA': [
+            {'abbr': 'AK', 'fips': '02', 'name': 'Alaska', 'tot_cases': int(day[-2:])},
+            {'abbr': 'AL', 'fips': '01', 'name': 'Alabama', 'tot_cases': 10 + int(day[-2:])},
+        ],
+    }).encode('utf-8')
+
+
+@pytest.fixture()
+def archive(stub_server):
+    for day in DAYS:
+        stub_server.set_response('GET', f'/archive/{day}', body=page_body(day))
+    return stub_server
+
+
+@pytest.fixture()
+def scraper(archive):
+    return CDCCovidCasesScraper('cases', page_url_template=f'{archive.url}/archive/{{page}}')
+
+
+def requested_days(stub_server):
+    return sorted(request.path.rsplit('/', 1)[1] for request in stub_server.requests)
+
+
+def test_date_pages():
+    assert list(date_pages('2022-01-30', '2022-02-02')) == \
+        ['2022-01-30', '2022-01-31', '2022-02-01', '2022-02-02']
+    assert list(date_pages(date(2022, 1, 1), date(2022, 1, 1), date_format='%Y%m%d')) == ['20220101']
+    assert list(date_pages('2022-01-02', '2022-01-01')) == []
+
+
+def test_offset_pages():
+    assert list(offset_pages(0, 2500, 1000)) == [0, 1000, 2000]
+
+
+def test_backfill(scraper, archive, tmp_path):
+    exporter = FakeExporter()
+    checkpoint_path = tmp_path / 'backfill.json'
+    backfill = Backfill(scraper, exporter, date_pages(DAYS[0], DAYS[-1]), str(checkpoint_path), workers=2)
+    assert backfill.run() == []
+    assert backfill.exported == 5
+    assert backfill.lines == 10
+    assert requested_days(archive) == DAYS
+    timestamp = int(CDCCovidCasesScraper._parse_update_time({'update': 'Jan 03 2022  3:08PM'}))
+    assert f'cases,abbr=AK,fips=02,jurisdiction=Alaska total_cases=3i {timestamp}' in exporter.lines
+    assert json.loads(checkpoint_path.read_text()) == {'next': 5, 'done': [], 'failed': []}
+
+
+def test_backfill_resume(scraper, archive, tmp_path):
+    checkpoint_path = str(tmp_path / 'backfill.json')
+    Backfill(scraper, FakeExporter(), DAYS[:3], checkpoint_path).run()
+    archive.requests.clear()
+    exporter = FakeExporter()
+    backfill = Backfill(scraper, exporter, DAYS, checkpoint_path)
+    backfill.run()
+    assert backfill.skipped == 3
+    assert requested_days(archive) == DAYS[3:]
+    assert len(exporter.lines) == 4
+
+
+def test_backfill_retries_failed_pages(scraper, archive, tmp_path):
+    checkpoint_path = tmp_path / 'backfill.json'
+    archive.set_response('GET', f'/archive/{DAYS[1]}', status=503)
+    backfill = Backfill(scraper, FakeExporter(), DAYS, str(checkpoint_path))
+    assert backfill.run() == [DAYS[1]]
+    assert backfill.exported == 4
+    assert json.loads(checkpoint_path.read_text()) == {'next': 5, 'done': [], 'failed': [1]}
+
+    archive.set_response('GET', f'/archive/{DAYS[1]}', body=page_body(DAYS[1]))
+    archive.requests.clear()
+    exporter = FakeExporter()
+    backfill = Backfill(scraper, exporter, DAYS, str(checkpoint_path))
+    assert backfill.run() == []
+    assert requested_days(archive) == [DAYS[1]]
+    assert len(exporter.lines) == 2
+    assert json.loads(checkpoint_path.read_text()) == {'next': 5, 'done': [], 'failed': []}
+
+
+def test_backfill_failed_write(scraper):
+    class FailingExporter(FakeExporter):
+        def write_batches(self, lines, **kwargs):
+            return [BatchResult(0, 2, b'', error=ConnectionError('refused'))]
+
+    backfill = Backfill(scraper, FailingExporter(), DAYS[:2])
+    # Pages finish in any order
+    assert sorted(backfill.run()) == DAYS[:2]
+    assert backfill.exported == 0
+
+
+def test_backfill_bounded(scraper):
+    pulled = []
+    exporter = FakeExporter(delay=0.01)
+    backfill = Backfill(scraper, exporter, [], workers=2)
+
+    def pages():
+        for day in DAYS:
+            # Pages are only pulled once a worker is free
+            assert len(pulled) - backfill.exported < 2
+            pulled.append(day)
+            yield day
+
+    backfill.pages = pages()
+    backfill.run()
+    assert backfill.exported == 5
+    assert exporter.max_active <= 2
+
+
+def test_backfill_stop(scraper, archive):
+    backfill = Backfill(scraper, FakeExporter(), DAYS, workers=1)
+
+    def pages():
+        yield DAYS[0]
+        backfill.stop()
+        yield from DAYS[1:]
+
+    backfill.pages = pages()
+    backfill.run()
+    assert backfill.exported == 2
+    assert requested_days(archive) == DAYS[:2]
+
+
+def test_backfill_not_supported():
+    scraper = CDCCovidCasesScraper('cases')
+    with pytest.raises(BackfillNotSupportedError):
+        scraper.page_url('2022-01-01')
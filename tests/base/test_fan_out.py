@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+import pytest
+from data_processing.base import FanOutHTTPEndpointScraper
+from data_processing.base.fan_out import FanOutError
+
+
+class ConcurrencyTracker:
+    """Stub server response that sleeps and records peak concurrency"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, headers, body):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'path': path}).encode()
+
+
+class StateTotals(FanOutHTTPEndpointScraper):
+    def merge(self, results):
+        return {key: body['total'] for key, body in results.items()}
+
+
+def test_scrape_urls(stub_server):
+    for state in ('AK', 'AL'):
+        stub_server.set_response('GET', f'/states/{state}', body=json.dumps({'state': state}).encode())
+    scraper = FanOutHTTPEndpointScraper({
+        'AK': f'{stub_server.url}/states/AK',
+        'AL': f'{stub_server.url}/states/AL',
+    })
+    scraper.scrape()
+    assert scraper.data == {'AK': {'state': 'AK'}, 'AL': {'state': 'AL'}}
+    assert scraper.errors == {}
+
+
+def test_scrape_params_and_merge(stub_server):
+    def respond(method, path, headers, body):
+        total = 10 if 'state=AK' in path else 20
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'total': total}).encode()
+
+    stub_server.responses[('GET', '/data')] = respond
+    scraper = StateTotals([{'state': 'AK'}, {'state': 'AL'}], url=f'{stub_server.url}/data')
+    scraper.scrape()
+    assert scraper.data == {0: 10, 1: 20}
+    assert sorted(request.path for request in stub_server.requests) == \
+        ['/data?state=AK', '/data?state=AL']
+
+
+def test_scrape_concurrent_with_host_limit(stub_server):
+    tracker = ConcurrencyTracker(delay=0.05)
+    stub_server.responses[('GET', '/slow')] = tracker
+    scraper = FanOutHTTPEndpointScraper(
+        [f'{stub_server.url}/slow?n={i}' for i in range(12)], max_workers=12, max_per_host=3)
+    start = time.perf_counter()
+    scraper.scrape()
+    elapsed = time.perf_counter() - start
+    assert len(scraper.data) == 12
+    assert tracker.peak == 3
+    # 4 rounds of 3 requests instead of 12 sequential ones
+    assert elapsed < 12 * 0.05
+
+
+def test_slow_host_does_not_hold_workers(stub_server):
+    stub_server.responses[('GET', '/slow')] = ConcurrencyTracker(delay=0.1)
+    stub_server.set_response('GET', '/fast')
+    # The same server under a second host name
+    fast_url = stub_server.url.replace('127.0.0.1', 'localhost')
+    targets = {f'slow{i}': f'{stub_server.url}/slow?n={i}' for i in range(3)}
+    targets.update({f'fast{i}': f'{fast_url}/fast?n={i}' for i in range(3)})
+    scraper = FanOutHTTPEndpointScraper(targets, max_workers=2, max_per_host=1)
+    scraper.scrape()
+    assert list(scraper.results) == list(targets)
+    paths = [request.path.split('?')[0] for request in stub_server.requests]
+    # Every fast request is served while the first slow one is running
+    assert paths[:4].count('/fast') == 3
+
+
+def test_scrape_errors(stub_server):
+    stub_server.set_response('GET', '/ok', body=b'{"ok": true}')
+    stub_server.set_response('GET', '/missing', status=404)
+    targets = {'ok': f'{stub_server.url}/ok', 'missing': f'{stub_server.url}/missing'}
+    with pytest.raises(FanOutError, match='1 of the fan-out requests failed'):
+        FanOutHTTPEndpointScraper(targets).scrape()
+    scraper = FanOutHTTPEndpointScraper(targets, allow_partial=True)
+    scraper.scrape()
+    assert scraper.data == {'ok': {'ok': True}}
+    assert list(scraper.errors) == ['missing']
@@ -31,3 +31,152 @@ def test_reset(scraper):
     scraper.reset()
     assert not scraper.response
     assert not scraper.data
+
+
+@pytest.fixture()
+def streaming_scraper(stub_server):
+    stub_server.set_response(
+        'GET', '/endpoint',
+        body=b'{"info": {"update": 1}, "records": [{"a": 1}, {"a": 2}, {"a": 3}], "tail": true}')
+    return HTTPEndpointScraper(
+        f'{stub_server.url}/endpoint',
+        stream_path='records',
+        chunk_size=4)
+
+
+def test_iter_records(streaming_scraper):
+    records = streaming_scraper.iter_records()
+    assert next(records) == {'a': 1}
+    assert streaming_scraper.data == {'info': {'update': 1}}
+    assert list(records) == [{'a': 2}, {'a': 3}]
+    assert streaming_scraper.data == {'info': {'update': 1}, 'tail': True}
+
+
+def test_scrape_streaming(streaming_scraper):
+    streaming_scraper.scrape()
+    assert streaming_scraper.response
+    assert streaming_scraper.data == {
+        'info': {'update': 1},
+        'records': [{'a': 1}, {'a': 2}, {'a': 3}],
+        'tail': True,
+    }
+
+
+@pytest.fixture()
+def cached_scraper(stub_server, tmp_path):
+    return HTTPEndpointScraper(f'{stub_server.url}/endpoint', cache_dir=str(tmp_path))
+
+
+def test_scrape_conditional_get_not_modified(cached_scraper, stub_server):
+    def respond(method, path, headers, body):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, {}, b''
+        return 200, {'ETag': '"v1"', 'Last-Modified': 'Tue, 07 Mar 2023 23:08:00 GMT'}, b'{"a": 1}'
+
+    stub_server.responses[('GET', '/endpoint')] = respond
+    cached_scraper.scrape()
+    assert cached_scraper.changed
+    assert cached_scraper.data == {'a': 1}
+    cached_scraper.commit()
+    cached_scraper.scrape()
+    assert not cached_scraper.changed
+    assert not cached_scraper.data
+    assert stub_server.requests[1].headers['If-None-Match'] == '"v1"'
+    assert stub_server.requests[1].headers['If-Modified-Since'] == 'Tue, 07 Mar 2023 23:08:00 GMT'
+    assert cached_scraper.load_cache()
+    assert cached_scraper.data == {'a': 1}
+
+
+def test_scrape_unchanged_content_hash(cached_scraper, stub_server):
+    stub_server.set_response('GET', '/endpoint', body=b'{"a": 1}')
+    cached_scraper.scrape()
+    assert cached_scraper.changed
+    cached_scraper.commit()
+    cached_scraper.scrape()
+    assert not cached_scraper.changed
+    assert not cached_scraper.data
+    stub_server.set_response('GET', '/endpoint', body=b'{"a": 2}')
+    cached_scraper.scrape()
+    assert cached_scraper.changed
+    assert cached_scraper.data == {'a': 2}
+
+
+def test_scrape_cache_persists_between_instances(cached_scraper, stub_server, tmp_path):
+    stub_server.set_response('GET', '/endpoint', headers={'ETag': '"v2"'}, body=b'{"a": 1}')
+    cached_scraper.scrape()
+    cached_scraper.commit()
+    scraper = HTTPEndpointScraper(cached_scraper.url, cache_dir=str(tmp_path))
+    assert scraper._request_headers()['If-None-Match'] == '"v2"'
+    assert scraper.load_cache()
+    assert scraper.data == {'a': 1}
+
+
+def test_iter_records_not_modified(stub_server, tmp_path):
+    stub_server.set_response('GET', '/endpoint', headers={'ETag': '"v1"'}, body=b'{"records": [1, 2]}')
+    scraper = HTTPEndpointScraper(
+        f'{stub_server.url}/endpoint', stream_path='records', cache_dir=str(tmp_path))
+    assert list(scraper.iter_records()) == [1, 2]
+    scraper.commit()
+    assert scraper.load_cache()
+    stub_server.set_response('GET', '/endpoint', status=304, body=b'')
+    scraper.scrape()
+    assert not scraper.changed
+    assert not scraper.data
+
+
+def test_iter_records_unchanged_content_hash(stub_server, tmp_path):
+    # The server ignores If-None-Match and sends the same body again
+    stub_server.set_response('GET', '/endpoint', headers={'ETag': '"v1"'}, body=b'{"records": [1, 2]}')
+    scraper = HTTPEndpointScraper(
+        f'{stub_server.url}/endpoint', stream_path='records', cache_dir=str(tmp_path),
+        chunk_size=4)
+    assert list(scraper.iter_records()) == [1, 2]
+    scraper.commit()
+    assert list(scraper.iter_records()) == []
+    assert not scraper.changed
+    assert stub_server.requests[1].headers['If-None-Match'] == '"v1"'
+    stub_server.set_response('GET', '/endpoint', body=b'{"records": [3]}')
+    assert list(scraper.iter_records()) == [3]
+    assert scraper.changed
+
+
+def test_scrape_uncommitted_is_changed(cached_scraper, stub_server):
+    # The export of the first scrape failed, so it was never committed
+    stub_server.set_response('GET', '/endpoint', headers={'ETag': '"v1"'}, body=b'{"a": 1}')
+    cached_scraper.scrape()
+    cached_scraper.scrape()
+    assert cached_scraper.changed
+    assert cached_scraper.data == {'a': 1}
+    assert 'If-None-Match' not in stub_server.requests[1].headers
+    assert not cached_scraper.load_cache()
+
+
+def test_load_cache_without_cache(scraper):
+    assert not scraper.load_cache()
+
+
+@pytest.mark.parametrize('json_decoder', ['auto', 'json'])
+def test_scrape_json_decoder(response_object, json_decoder):
+    scraper = HTTPEndpointScraper('http://example.com/endpoint', json_decoder=json_decoder)
+    scraper._get_url = MagicMock(return_value=response_object)
+    scraper.scrape()
+    assert scraper.data == {'just': 1, 'some': 2, 'json': 3}
+
+
+def test_scrape_json_decoder_callable(response_object):
+    decoded = []
+    scraper = HTTPEndpointScraper('http://example.com/endpoint', json_decoder=decoded.append)
+    scraper._get_url = MagicMock(return_value=response_object)
+    scraper.scrape()
+    # The decoder gets the raw body bytes
+    assert decoded == [b'{"just": 1, "some": 2, "json": 3}']
+
+
+def test_scrape_declared_charset(stub_server):
+    stub_server.set_response(
+        'GET', '/endpoint',
+        headers={'Content-Type': 'application/json; charset=iso-8859-1'},
+        body='{"name": "Espa\xf1a"}'.encode('latin-1'))
+    scraper = HTTPEndpointScraper(f'{stub_server.url}/endpoint')
+    scraper.scrape()
+    assert scraper.data == {'name': 'Espa\xf1a'}
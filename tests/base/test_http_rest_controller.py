@@ -1,6 +1,9 @@
+import time
 import pytest
+import requests
 from unittest.mock import patch
 from data_processing.base import HTTPRESTController
+from data_processing.base.http_rest_controller import JitteredRetry
 
 
 @pytest.fixture()
@@ -126,3 +129,92 @@ def test_post_with_data_and_params(exporter, response_object, endpoint, params,
     with patch.object(exporter, '_post', return_value=response_object) as mock:
         exporter.post(endpoint, params=params, data=mock_dict)
         mock.assert_called_once_with('http://example.com/foo?bar=baz', data=mock_dict)
+
+
+@pytest.fixture()
+def server_controller(stub_server):
+    controller = HTTPRESTController(
+        stub_server.url,
+        {'Accept': 'application/json'},
+        timeout=(1, 0.2),
+        retries=3,
+        backoff_factor=0.01,
+        backoff_jitter=0.01)
+    return controller
+
+
+def flaky_response(failures, status=503, headers=None):
+    calls = []
+
+    def respond(method, path, request_headers, body):
+        calls.append(body)
+        if len(calls) <= failures:
+            return status, headers or {}, b''
+        return 200, {'Content-Type': 'application/json'}, b'{"ok": true}'
+    return respond
+
+
+def test_session_adapter(exporter):
+    adapter = exporter.session.get_adapter('https://example.com')
+    assert adapter._pool_connections == 10
+    assert adapter._pool_maxsize == 10
+    assert isinstance(adapter.max_retries, JitteredRetry)
+    assert adapter.max_retries.total == 3
+    assert 'POST' in adapter.max_retries.allowed_methods
+    assert exporter.session.get_adapter('http://example.com') is adapter
+
+
+def test_session_options():
+    controller = HTTPRESTController(
+        'http://example.com', {}, pool_connections=2, pool_maxsize=20, retries=0)
+    adapter = controller.session.get_adapter('http://example.com')
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 20
+    assert adapter.max_retries.total == 0
+
+
+def test_retry_transient_errors(server_controller, stub_server):
+    stub_server.responses[('POST', '/write')] = flaky_response(2)
+    response = server_controller.post('/write', data=b'payload')
+    assert response.status_code == 200
+    assert [request.body for request in stub_server.requests] == [b'payload'] * 3
+
+
+def test_retry_exhausted_returns_last_response(server_controller, stub_server):
+    stub_server.responses[('GET', '/foo')] = flaky_response(10, status=500)
+    response = server_controller.get('/foo')
+    assert response.status_code == 500
+    assert len(stub_server.requests) == 4
+
+
+def test_retry_honours_retry_after(server_controller, stub_server):
+    stub_server.responses[('GET', '/foo')] = flaky_response(1, status=429, headers={'Retry-After': '1'})
+    start = time.perf_counter()
+    response = server_controller.get('/foo')
+    assert response.status_code == 200
+    assert time.perf_counter() - start >= 1
+
+
+def test_no_retry_on_client_error(server_controller, stub_server):
+    stub_server.set_response('GET', '/foo', status=404)
+    assert server_controller.get('/foo').status_code == 404
+    assert len(stub_server.requests) == 1
+
+
+def test_read_timeout(server_controller, stub_server):
+    server_controller.retries = 0
+    server_controller.setup_session()
+    stub_server.latency = 0.5
+    with pytest.raises(requests.RequestException):
+        server_controller.get('/foo')
+
+
+def test_jittered_backoff():
+    retry = JitteredRetry(total=5, backoff_factor=1, backoff_jitter=0.5)
+    assert retry.get_backoff_time() == 0
+    for _ in range(3):
+        retry = retry.increment(method='GET', url='/foo')
+    assert retry.backoff_jitter == 0.5
+    backoffs = {retry.get_backoff_time() for _ in range(20)}
+    assert all(4 <= backoff <= 4.5 for backoff in backoffs)
+    assert len(backoffs) > 1
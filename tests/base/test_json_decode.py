@@ -0,0 +1,68 @@
+import json
+import pytest
+import requests
+from data_processing.base.json_decode import (
+    UnknownJSONDecoderError,
+    declared_charset,
+    json_loads,
+    response_json_body
+)
+
+
+def make_response(content, content_type=None):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    if content_type:
+        response.headers['Content-Type'] = content_type
+    return response
+
+
+def test_json_loads_json():
+    assert json_loads('json') is json.loads
+
+
+def test_json_loads_orjson():
+    orjson = pytest.importorskip('orjson')
+    assert json_loads('orjson') is orjson.loads
+
+
+def test_json_loads_auto():
+    loads = json_loads('auto')
+    assert loads(b'{"a": [1, 2.5, "\xc3\xa9"]}') == {'a': [1, 2.5, '\xe9']}
+    assert loads('{"a": 1}') == {'a': 1}
+    # Beyond orjson's 64 bit integers, auto falls back to json
+    assert loads(b'[18446744073709551616]') == [18446744073709551616]
+    with pytest.raises(ValueError):
+        loads(b'{')
+
+
+def test_json_loads_callable():
+    def loads(data):
+        return {'decoded': data}
+
+    assert json_loads(loads) is loads
+
+
+def test_json_loads_unknown():
+    with pytest.raises(UnknownJSONDecoderError):
+        json_loads('simplejson')
+
+
+def test_declared_charset():
+    assert declared_charset('application/json; charset=UTF-8') == 'UTF-8'
+    assert declared_charset('text/plain;charset="iso-8859-1"') == 'iso-8859-1'
+    assert declared_charset('application/json') is None
+    assert declared_charset('') is None
+
+
+def test_response_json_body():
+    body = '{"name": "Espa\xf1a"}'
+    utf8 = make_response(body.encode('utf-8'), 'application/json; charset=utf-8')
+    assert response_json_body(utf8) is utf8.content
+    undeclared = make_response(body.encode('utf-8'), 'text/plain')
+    assert response_json_body(undeclared) is undeclared.content
+    latin1 = make_response(body.encode('latin-1'), 'application/json; charset=ISO-8859-1')
+    assert response_json_body(latin1) == body
+    unknown = make_response(body.encode('utf-8'), 'application/json; charset=bogus')
+    assert response_json_body(unknown) is unknown.content
@@ -0,0 +1,69 @@
+import json
+import pytest
+from data_processing.base.json_stream import JSONStream
+
+
+@pytest.fixture()
+def document():
+    return {
+        'CSVInfo': {'filename': 'US_MAP_DATA', 'update': 'Mar  7 2023  3:08PM'},
+        'US_MAP_DATA': [
+            {'abbr': 'AK', 'tot_cases': 293766, 'incidence': 40157.5, 'name': 'Alaska'},
+            {'abbr': 'AL', 'tot_cases': 1642062, 'flag': True, 'name': 'Alábama "x"'},
+            {'abbr': 'AR', 'tot_cases': None, 'nested': {'a': [1, 2, {'b': []}]}},
+        ],
+        'trailer': 12345,
+    }
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 100000])
+def test_stream_bytes_chunks(document, chunk_size):
+    data = json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
+    stream = JSONStream(chunked(data, chunk_size), 'US_MAP_DATA')
+    assert list(stream) == document['US_MAP_DATA']
+    assert stream.siblings == {
+        'CSVInfo': document['CSVInfo'],
+        'trailer': 12345,
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5])
+def test_stream_str_chunks(document, chunk_size):
+    data = json.dumps(document, separators=(',', ':'))
+    stream = JSONStream(chunked(data, chunk_size), ['US_MAP_DATA'])
+    assert list(stream) == document['US_MAP_DATA']
+    assert stream.siblings['trailer'] == 12345
+
+
+def test_stream_nested_path():
+    data = json.dumps({'meta': 1, 'outer': {'before': 'x', 'inner': [1, 2, 3], 'after': [4]}})
+    stream = JSONStream(chunked(data, 3), 'outer.inner')
+    assert list(stream) == [1, 2, 3]
+    assert stream.siblings == {'meta': 1, 'outer': {'before': 'x', 'after': [4]}}
+
+
+def test_stream_empty_array_and_object():
+    stream = JSONStream(['{"US_MAP_DATA": [ ], "CSVInfo": {}}'], 'US_MAP_DATA')
+    assert list(stream) == []
+    assert stream.siblings == {'CSVInfo': {}}
+
+
+def test_stream_path_missing():
+    stream = JSONStream(['{"foo": [1, 2]}'], 'US_MAP_DATA')
+    assert list(stream) == []
+    assert stream.siblings == {'foo': [1, 2]}
+
+
+@pytest.mark.parametrize('data', [
+    '{"US_MAP_DATA": [1, 2',
+    '{"US_MAP_DATA": [1 2]}',
+    '{"US_MAP_DATA": [1]} extra',
+    '[1, 2]',
+])
+def test_stream_invalid_json(data):
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONStream(chunked(data, 4), 'US_MAP_DATA'))
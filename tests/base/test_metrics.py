@@ -0,0 +1,107 @@
+import json
+import pytest
+from data_processing.base import HTTPEndpointScraper, HTTPRESTController, Metrics, NULL_METRICS
+from data_processing.base.metrics import NULL_STAGE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.25
+        return self.now
+
+
+class FakeExporter:
+    def __init__(self):
+        self.writes = []
+
+    def write_batches(self, lines, precision='ms'):
+        self.writes.append((lines, precision))
+        return []
+
+
+@pytest.fixture()
+def metrics():
+    return Metrics('pipeline', tags={'job': 'cdc'}, clock=FakeClock())
+
+
+def test_stage_records_duration_and_fields(metrics):
+    with metrics.stage('fetch', source='test') as stage:
+        stage.set(status=200, bytes=512)
+    [line] = metrics.flush()
+    series, fields, timestamp = line.split(' ')
+    assert series == 'pipeline,job=cdc,stage=fetch,source=test'
+    assert fields == 'duration_ms=250.0,status=200i,bytes=512i'
+    assert len(timestamp) >= 19
+    assert metrics.flush() == []
+
+
+def test_stage_records_error(metrics):
+    with pytest.raises(ValueError):
+        with metrics.stage('decode'):
+            raise ValueError
+    [line] = metrics.flush()
+    assert 'error="ValueError"' in line
+
+
+def test_max_samples():
+    metrics = Metrics(max_samples=2)
+    for _ in range(3):
+        metrics.record('fetch', 0.1)
+    assert len(metrics.flush()) == 2
+    assert metrics.dropped == 1
+
+
+def test_export(metrics):
+    exporter = FakeExporter()
+    assert metrics.export(exporter) == []
+    assert not exporter.writes
+    metrics.record('fetch', 0.1, timestamp=1)
+    metrics.export(exporter)
+    assert exporter.writes == [
+        (['pipeline,job=cdc,stage=fetch duration_ms=100.0 1'], 'ns')]
+
+
+def test_null_metrics():
+    assert not NULL_METRICS.enabled
+    assert NULL_METRICS.stage('fetch') is NULL_STAGE
+    with NULL_METRICS.stage('fetch') as stage:
+        stage.set(status=200)
+    NULL_METRICS.record('fetch', 0.1)
+    assert NULL_METRICS.flush() == []
+
+
+def test_controller_records_requests(stub_server, metrics):
+    stub_server.set_response('POST', '/write', status=204, body=b'')
+    controller = HTTPRESTController(stub_server.url, {}, metrics=metrics)
+    controller.post('/write', data=b'm f=1i')
+    [line] = metrics.flush()
+    assert line.startswith(
+        'pipeline,job=cdc,stage=http_request,method=POST,source=HTTPRESTController ')
+    assert 'status=204i,request_bytes=6i,response_bytes=0i' in line
+
+
+def test_scraper_records_fetch_and_decode(stub_server, metrics):
+    body = json.dumps({'records': [{'a': 1}, {'a': 2}]}).encode()
+    stub_server.set_response('GET', '/data', body=body)
+    scraper = HTTPEndpointScraper(f'{stub_server.url}/data', metrics=metrics)
+    scraper.scrape()
+    lines = metrics.flush()
+    assert [line.split(',')[2] for line in lines] == ['stage=fetch', 'stage=decode']
+    assert f'status=200i,bytes={len(body)}i' in lines[0]
+
+
+def test_scraper_records_stream(stub_server, metrics):
+    body = json.dumps({'records': [{'a': 1}, {'a': 2}]}).encode()
+    stub_server.set_response('GET', '/data', body=body)
+    scraper = HTTPEndpointScraper(
+        f'{stub_server.url}/data',
+        stream_path='records',
+        chunk_size=8,
+        metrics=metrics)
+    assert len(list(scraper.iter_records())) == 2
+    [line] = metrics.flush()
+    assert 'stage=stream' in line
+    assert f'status=200i,bytes={len(body)}i,records=2i' in line
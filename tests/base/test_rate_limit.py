@@ -0,0 +1,181 @@
+import threading
+import requests
+import pytest
+from email.utils import formatdate
+from data_processing.base import HTTPRESTController, Metrics
+from data_processing.base.rate_limit import (
+    HOST_LIMITERS, AdaptiveConcurrency, HostLimiter, HostLimiters, TokenBucket, parse_retry_after)
+
+
+class FakeTime:
+    """Clock whose sleep() advances it instead of blocking"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture()
+def fake_time():
+    return FakeTime()
+
+
+@pytest.fixture(autouse=True)
+def clear_limiters():
+    HOST_LIMITERS.clear()
+    yield
+    HOST_LIMITERS.clear()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after(formatdate(1030, usegmt=True), clock=lambda: 1000) == 30.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+
+
+def test_token_bucket(fake_time):
+    bucket = TokenBucket(10, burst=2, clock=fake_time, sleep=fake_time.sleep)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.1)
+    fake_time.now += 1
+    # Tokens refill up to burst only
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.1)]
+
+
+def test_token_bucket_pause(fake_time):
+    bucket = TokenBucket(10, burst=5, clock=fake_time, sleep=fake_time.sleep)
+    bucket.pause(2)
+    assert bucket.acquire() == pytest.approx(2.1)
+
+
+def test_concurrency_additive_increase():
+    concurrency = AdaptiveConcurrency(initial=2, maximum=3)
+    for _ in range(2):
+        concurrency.acquire()
+        concurrency.release(0.01)
+    assert concurrency.limit == 3
+    for _ in range(10):
+        concurrency.acquire()
+        concurrency.release(0.01)
+    assert concurrency.limit == 3
+
+
+def test_concurrency_multiplicative_decrease(fake_time):
+    concurrency = AdaptiveConcurrency(initial=16, clock=fake_time)
+    for _ in range(3):
+        concurrency.acquire()
+    # Responses to requests sent together only back off once
+    concurrency.release(0.5, throttled=True)
+    concurrency.release(0.5, throttled=True)
+    assert concurrency.limit == 8
+    fake_time.now += 1
+    concurrency.release(0.5, throttled=True)
+    assert concurrency.limit == 4
+
+
+def test_concurrency_latency_tolerance(fake_time):
+    concurrency = AdaptiveConcurrency(initial=8, latency_tolerance=2, clock=fake_time)
+    concurrency.acquire()
+    concurrency.release(0.1)
+    concurrency.acquire()
+    concurrency.release(0.3)
+    assert concurrency.limit == 4
+
+
+def test_concurrency_blocks_at_limit():
+    concurrency = AdaptiveConcurrency(initial=1)
+    concurrency.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (concurrency.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.05)
+    concurrency.release(0.01)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_host_limiter_pauses_on_throttle(fake_time):
+    limiter = HostLimiter(clock=fake_time, sleep=fake_time.sleep)
+    limiter.acquire()
+    assert limiter.release(0.1, 429, retry_after=3) is True
+    assert limiter.acquire() == pytest.approx(3)
+    assert limiter.release(0.1, 503) is True
+    assert limiter.acquire() == pytest.approx(1)
+    assert limiter.release(0.1, 200) is False
+    assert limiter.throttled == 2
+
+
+def test_host_limiters_shared_by_host():
+    limiters = HostLimiters()
+    limiter = limiters.get('http://influx:8086/api/v2', rate=5)
+    assert limiters.get('http://influx:8086/other') is limiter
+    assert limiters.get('http://influx:8087') is not limiter
+    assert limiter.bucket.rate == 5
+
+
+def test_controllers_share_limiter():
+    first = HTTPRESTController('http://influx:8086', {}, rate_limit={'rate': 5})
+    second = HTTPRESTController('http://influx:8086', {}, rate_limit=True)
+    assert first.limiter is second.limiter
+    assert HTTPRESTController('http://influx:8086', {}).limiter is None
+
+
+def test_rate_limit_leaves_throttling_to_limiter():
+    controller = HTTPRESTController('http://influx:8086', {}, rate_limit=True)
+    retry = controller.session.get_adapter('http://influx:8086').max_retries
+    assert 429 not in retry.status_forcelist
+    assert not retry.respect_retry_after_header
+    assert 500 in retry.status_forcelist
+
+
+def throttling_response(failures, retry_after='0.2'):
+    calls = []
+
+    def respond(method, path, request_headers, body):
+        calls.append(body)
+        if len(calls) <= failures:
+            return 429, {'Retry-After': retry_after}, b''
+        return 200, {'Content-Type': 'application/json'}, b'{"ok": true}'
+    return respond
+
+
+def test_throttled_request_retried_after_pause(stub_server):
+    metrics = Metrics()
+    controller = HTTPRESTController(stub_server.url, {}, rate_limit={'initial_concurrency': 8},
+                                    metrics=metrics)
+    stub_server.responses[('POST', '/write')] = throttling_response(1)
+    response = controller.post('/write', data=b'payload')
+    assert response.status_code == 200
+    assert len(stub_server.requests) == 2
+    assert controller.limiter.throttled == 1
+    assert controller.limiter.concurrency.limit == 4
+    first, second = metrics.flush()
+    assert 'status=429i' in first and 'throttled=true' in first
+    wait = float(second.split('wait=')[1].split(',')[0])
+    assert wait >= 0.2
+
+
+def test_throttled_retries_exhausted(stub_server):
+    controller = HTTPRESTController(stub_server.url, {}, retries=1,
+                                    rate_limit={'throttle_pause': 0.01})
+    stub_server.responses[('GET', '/foo')] = throttling_response(10, retry_after='')
+    assert controller.get('/foo').status_code == 429
+    assert len(stub_server.requests) == 2
+
+
+def test_connection_error_releases_slot():
+    controller = HTTPRESTController('http://127.0.0.1:9', {}, retries=0,
+                                    rate_limit={'initial_concurrency': 1})
+    with pytest.raises(requests.ConnectionError):
+        controller.get('/foo')
+    assert controller.limiter.concurrency.in_flight == 0
@@ -0,0 +1,66 @@
+import pickle
+import pytest
+from data_processing.base import record_class
+from data_processing.base.records import InvalidRecordKeyError, parse_number
+from data_processing.encoders import LineProtocolEncoder
+
+Region = record_class(
+    'Region', ['abbr', 'cases', 'rate', 'fips'], tag_keys=['abbr', 'fips'],
+    ignored_keys=['burden_text'], module=__name__)
+
+
+def test_parse_number():
+    assert parse_number('42') == 42
+    assert parse_number('-1.5') == -1.5
+    assert parse_number('2e3') == 2000.0
+    assert parse_number('N/A') == 'N/A'
+    assert parse_number('nan') == 'nan'
+    assert parse_number(' 4') == ' 4'
+    assert parse_number(7) == 7
+    assert parse_number(None) is None
+
+
+def test_from_dict():
+    record = Region.from_dict(
+        {'cases': '12', 'abbr': 'AK', 'fips': '02', 'burden_text': 'Low', 'rate': '1.5'})
+    assert record.cases == 12
+    assert record.rate == 1.5
+    assert record.fips == '02'
+    assert dict(record) == {'abbr': 'AK', 'cases': 12, 'rate': 1.5, 'fips': '02'}
+    assert list(record) == ['abbr', 'cases', 'rate', 'fips']
+    assert not hasattr(record, '__dict__')
+
+
+def test_mapping():
+    record = Region(abbr='AK', cases=3)
+    assert record['cases'] == 3
+    assert record.get('rate') is None
+    assert 'rate' not in record
+    assert len(record) == 2
+    assert record == {'abbr': 'AK', 'cases': 3}
+    assert repr(record) == "Region({'abbr': 'AK', 'cases': 3})"
+    with pytest.raises(KeyError):
+        record['burden_text']
+
+
+def test_unknown_keys_kept():
+    record = Region.from_dict({'abbr': 'AK', 'new_metric': '5'})
+    assert record['new_metric'] == 5
+    assert dict(record) == {'abbr': 'AK', 'new_metric': 5}
+
+
+def test_encodes_like_dict():
+    encoder = LineProtocolEncoder('cases', tag_keys=['abbr', 'fips'], key_map={'rate': 'rate_per_100k'})
+    data = {'abbr': 'AK', 'cases': 12, 'rate': 1.5, 'fips': '02'}
+    assert encoder.encode_record(Region.from_dict(data), 10) == encoder.encode_record(data, 10)
+
+
+def test_pickle():
+    record = Region.from_dict({'abbr': 'AK', 'cases': 3, 'extra': 'x'})
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+@pytest.mark.parametrize('key', ['not-an-identifier', 'class', '_private', 'items'])
+def test_invalid_key(key):
+    with pytest.raises(InvalidRecordKeyError):
+        record_class('Bad', ['abbr', key])
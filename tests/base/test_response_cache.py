@@ -0,0 +1,88 @@
+import os
+import pytest
+from data_processing.base.response_cache import ResponseCache
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture()
+def url():
+    return 'http://example.com/endpoint'
+
+
+def test_empty_cache(cache, url):
+    assert cache.metadata(url) == {}
+    assert cache.body(url) is None
+    assert cache.validators(url) == {}
+
+
+def test_store(cache, url, response_object):
+    response_object.headers['ETag'] = '"abc"'
+    response_object.headers['Last-Modified'] = 'Tue, 07 Mar 2023 23:08:00 GMT'
+    cache.store(url, response_object)
+    assert cache.body(url) is None
+    assert cache.validators(url) == {}
+    cache.commit()
+    assert cache.body(url) == response_object.content
+    assert cache.validators(url) == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': 'Tue, 07 Mar 2023 23:08:00 GMT',
+    }
+
+
+def test_is_unchanged(cache, url, response_object):
+    assert not cache.is_unchanged(url, response_object)
+    cache.store(url, response_object)
+    assert not cache.is_unchanged(url, response_object)
+    cache.commit()
+    assert cache.is_unchanged(url, response_object)
+    response_object._content = b'{"other": 1}'
+    assert not cache.is_unchanged(url, response_object)
+    response_object.status_code = 304
+    assert cache.is_unchanged(url, response_object)
+
+
+def test_stage_stream(cache, url, response_object):
+    chunks = [b'{"just"', b': 1}']
+    assert cache.stage_stream(url, response_object, iter(chunks))
+    assert cache.body(url) is None
+    assert list(cache.staged_chunks(url, chunk_size=4)) == [b'{"ju', b'st":', b' 1}']
+    cache.commit()
+    assert cache.body(url) == b'{"just": 1}'
+    response_object._content = b'{"just": 1}'
+    assert cache.is_unchanged(url, response_object)
+
+
+def test_stage_stream_unchanged(cache, url, response_object):
+    assert cache.stage_stream(url, response_object, iter([b'{', b'}']))
+    cache.commit()
+    response_object.headers['ETag'] = '"v2"'
+    assert not cache.stage_stream(url, response_object, iter([b'{}']))
+    assert url not in cache.staged
+    assert cache.validators(url) == {'If-None-Match': '"v2"'}
+    assert not any(name.endswith('.staged') for name in os.listdir(cache.cache_dir))
+
+
+def test_stage_stream_abandoned(cache, url, response_object):
+    def chunks():
+        yield b'{'
+        raise ConnectionError('reset')
+
+    with pytest.raises(ConnectionError):
+        cache.stage_stream(url, response_object, chunks())
+    assert cache.body(url) is None
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_discard(cache, url, response_object):
+    cache.store(url, response_object)
+    cache.commit()
+    response_object._content = b'{"other": 1}'
+    cache.store(url, response_object)
+    cache.discard()
+    cache.commit()
+    assert cache.body(url) == b'{"just": 1, "some": 2, "json": 3}'
+    assert not any(name.endswith('.staged') for name in os.listdir(cache.cache_dir))
@@ -1,5 +1,6 @@
 import pytest
 import requests
+from tests.stub_server import StubHTTPServer
 
 
 @pytest.fixture()
@@ -17,3 +18,100 @@ def response_object(
 @pytest.fixture()
 def request_object():
     return requests.Request()
+
+
+@pytest.fixture()
+def stub_server():
+    with StubHTTPServer() as server:
+        yield server
+
+
+@pytest.fixture()
+def mock_data():
+    """Mock data returned from CDC Covid Data API"""
+    data = {}
+    data['CSVInfo'] = {
+        'filename': 'US_MAP_DATA',
+        'update': 'Mar  7 2023  3:08PM',
+        'disclaimer': 'Case and Death data updated as of Mar  7 2023  3:08PM.  Testing data updated as of Mar  7 2023  3:11PM',
+        'fieldpropertymap': [
+            {'abbr': 'abbr'},
+            {'fips': 'fips'},
+            {'name': 'jurisdiction'},
+            {'tot_cases': 'Total Cases'},
+            {'tot_death': 'Total Death'},
+            {'death_100k': 'Death_100k'},
+            {'new_cases07': 'CasesInLast7Days'},
+            {'new_deaths07': 'DeathsInLast7Days'},
+            {'Seven_day_avg_new_cases_per_100k': 'Seven_day_avg_new_cases_per_100k'},
+            {'Seven_day_avg_new_deaths_per_100k': 'Seven_day_avg_new_deaths_per_100k'},
+            {'Seven_day_cum_new_cases_per_100k': 'Seven_day_cum_new_cases_per_100k'},
+            {'Seven_day_cum_new_deaths_per_100k': 'Seven_day_cum_new_deaths_per_100k'},
+            {'incidence': 'RatePer100000'},
+            {'us_trend_new_case': 'us_trend_new_case'},
+            {'us_trend_new_death': 'us_trend_new_death'}
+        ]
+    }
+    data['US_MAP_DATA'] = [
+        {
+            'abbr': 'AK',
+            'tot_cases': 293766,
+            'new_cases07': 451,
+            'new_deaths07': 0,
+            'Seven_day_cum_new_cases_per_100k': 61.7,
+            'Seven_day_cum_new_deaths_per_100k': 0.0,
+            'tot_death': 1449,
+            'death_100k': 198,
+            'incidence': 40157,
+            'id': 2,
+            'fips': '02',
+            'name': 'Alaska',
+            'us_trend_maxdate': '2023-03-01',
+        },
+        {
+            'abbr': 'AL',
+            'tot_cases': 1642062,
+            'new_cases07': 3714,
+            'new_deaths07': 69,
+            'Seven_day_cum_new_cases_per_100k': 75.7,
+            'Seven_day_cum_new_deaths_per_100k': 1.4,
+            'tot_death': 21001,
+            'death_100k': 428,
+            'incidence': 33490,
+            'id': 1,
+            'fips': '01',
+            'name': 'Alabama',
+            'us_trend_maxdate': '2023-03-01',
+        },
+        {
+            'abbr': 'AR',
+            'tot_cases': 1004753,
+            'new_cases07': 1252,
+            'new_deaths07': 23,
+            'Seven_day_cum_new_cases_per_100k': 41.5,
+            'Seven_day_cum_new_deaths_per_100k': 0.8,
+            'tot_death': 12980,
+            'death_100k': 430,
+            'incidence': 33294,
+            'id': 5,
+            'fips': '05',
+            'name': 'Arkansas',
+            'us_trend_maxdate': '2023-03-01',
+        },
+        {
+            'abbr': 'USA',
+            'tot_cases': 103499382,
+            'new_cases07': 226620,
+            'new_deaths07': 2290,
+            'Seven_day_cum_new_cases_per_100k': 68.3,
+            'Seven_day_cum_new_deaths_per_100k': 0.7,
+            'tot_death': 1117856,
+            'death_100k': 336,
+            'incidence': 31175,
+            'id': 0,
+            'fips': '00',
+            'name': 'United States of America',
+            'us_trend_maxdate': '2023-03-01',
+        }
+    ]
+    return data
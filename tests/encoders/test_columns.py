@@ -0,0 +1,81 @@
+import pytest
+from data_processing.encoders import LineProtocolEncoder, RegionColumns
+from data_processing.encoders.line_protocol import InvalidFieldValueError
+
+numpy = pytest.importorskip('numpy')
+
+
+@pytest.fixture()
+def encoder():
+    return LineProtocolEncoder(
+        'cases',
+        tag_keys=['abbr', 'name'],
+        key_map={'name': 'jurisdiction', 'tot_cases': 'total_cases'},
+        ignored_keys=['burden_text'])
+
+
+@pytest.fixture()
+def records():
+    return [
+        {'abbr': 'AK', 'name': 'Alaska, North', 'tot_cases': 293766, 'incidence': 1.5,
+         'burden_text': 'Low', 'note': 'say "hi"', 'ok': True, 'population': 733583},
+        {'abbr': 'AL', 'name': 'Alabama', 'tot_cases': None, 'incidence': float('nan'),
+         'burden_text': 'High', 'note': '', 'ok': False, 'population': 5024279},
+        {'abbr': '', 'name': 'Nowhere', 'tot_cases': 0, 'incidence': 2,
+         'note': None, 'ok': None, 'population': None},
+        {'abbr': 'XX', 'name': 'Empty', 'tot_cases': None, 'incidence': None},
+    ]
+
+
+def test_encode_matches_encoder(encoder, records):
+    columns = RegionColumns.from_records(records, encoder)
+    assert columns.encode(1678230480) == [
+        'cases,abbr=AK,jurisdiction=Alaska\\,\\ North total_cases=293766i,incidence=1.5,'
+        'note="say \\"hi\\"",ok=true,population=733583i 1678230480',
+        'cases,abbr=AL,jurisdiction=Alabama ok=false,population=5024279i 1678230480',
+        'cases,jurisdiction=Nowhere total_cases=0i,incidence=2.0 1678230480',
+    ]
+
+
+def test_encode_same_as_encode_records(encoder, records):
+    records = [record for record in records if record['incidence'] != 2]
+    columns = RegionColumns.from_records(records, encoder)
+    assert columns.encode(5) == list(encoder.encode_records(records, 5))
+
+
+def test_encode_multiline_string(encoder):
+    records = [{'abbr': 'AK', 'note': 'first\nsecond\r'}]
+    columns = RegionColumns.from_records(records, encoder)
+    assert columns.encode(5) == list(encoder.encode_records(records, 5))
+    assert columns.encode(5) == ['cases,abbr=AK note="first\\nsecond\\r" 5']
+
+
+def test_encode_timestamps(encoder):
+    records = [{'abbr': 'AK', 'value': 1}, {'abbr': 'AL', 'value': 2}]
+    columns = RegionColumns.from_records(records, encoder)
+    assert columns.encode([1, 2]) == ['cases,abbr=AK value=1i 1', 'cases,abbr=AL value=2i 2']
+    assert columns.encode() == ['cases,abbr=AK value=1i', 'cases,abbr=AL value=2i']
+
+
+def test_field_types_coerce(records):
+    encoder = LineProtocolEncoder('cases', tag_keys=['abbr'], field_keys=['tot_cases'],
+                                  field_types={'tot_cases': float})
+    columns = RegionColumns.from_records([{'abbr': 'AK', 'tot_cases': '12'}], encoder)
+    assert columns.encode() == ['cases,abbr=AK tot_cases=12.0']
+    with pytest.raises(InvalidFieldValueError):
+        RegionColumns.from_records([{'tot_cases': 'n/a'}], encoder)
+
+
+def test_aggregates(encoder, records):
+    columns = RegionColumns.from_records(records, encoder)
+    assert columns.total('tot_cases') == 293766
+    assert columns.total('population') == 733583 + 5024279
+    rates = columns.per_100k('tot_cases', 'population')
+    assert rates[0] == pytest.approx(293766 / 733583 * 100000)
+    assert rates.mask.tolist() == [False, True, True, True]
+
+
+def test_dropna(encoder, records):
+    columns = RegionColumns.from_records(records, encoder).dropna(['tot_cases', 'abbr'])
+    assert len(columns) == 1
+    assert columns.column('abbr').tolist() == ['AK']
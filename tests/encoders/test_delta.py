@@ -0,0 +1,80 @@
+import json
+import pytest
+from data_processing.encoders import DeltaFilter
+from data_processing.encoders.delta import split_line
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def lines():
+    return [
+        'cases,abbr=AK total=1i,rate=1.5 1678230480',
+        'cases,abbr=AL total=2i,rate=2.5 1678230480',
+        'cases,abbr=AZ total=3i,rate=3.5 1678230480',
+    ]
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('m,t=a f=1i 123', ('m,t=a', 'f=1i', 123)),
+    ('m,t=a f=1i', ('m,t=a', 'f=1i', None)),
+    ('my\\ m,t=a\\ b f="x 1" 5', ('my\\ m,t=a\\ b', 'f="x 1"', 5)),
+    ('m f="ends 12"', ('m', 'f="ends 12"', None)),
+])
+def test_split_line(line, expected):
+    assert split_line(line) == expected
+
+
+def test_filter_emits_only_changed(lines):
+    delta = DeltaFilter()
+    assert list(delta.filter(lines)) == lines
+    delta.commit()
+    changed = [line.replace('1678230480', '1678316880') for line in lines]
+    changed[1] = 'cases,abbr=AL total=4i,rate=2.5 1678316880'
+    assert list(delta.filter(changed)) == [changed[1]]
+    assert delta.emitted == 4
+    assert delta.suppressed == 2
+
+
+def test_uncommitted_lines_are_emitted_again(lines):
+    delta = DeltaFilter()
+    list(delta.filter(lines))
+    assert list(delta.filter(lines)) == lines
+
+
+def test_state_is_persisted(lines, tmp_path):
+    state_path = str(tmp_path / 'delta' / 'state.json')
+    delta = DeltaFilter(state_path)
+    list(delta.filter(lines))
+    delta.commit()
+    with open(state_path) as state_file:
+        assert len(json.load(state_file)['fingerprints']) == 3
+    assert list(DeltaFilter(state_path).filter(lines)) == []
+
+
+def test_full_refresh(lines):
+    clock = FakeClock()
+    delta = DeltaFilter(full_refresh_interval=60, clock=clock)
+    assert delta.refresh_due
+    list(delta.filter(lines))
+    delta.commit()
+    clock.now += 30
+    assert list(delta.filter(lines)) == []
+    clock.now += 30
+    assert list(delta.filter(lines)) == lines
+    delta.commit()
+    assert delta.refreshed_at == clock.now
+
+
+def test_reset(lines):
+    delta = DeltaFilter()
+    list(delta.filter(lines))
+    delta.commit()
+    delta.reset()
+    assert list(delta.filter(lines)) == lines
@@ -0,0 +1,144 @@
+import pytest
+from data_processing.encoders import LineProtocolEncoder
+from data_processing.encoders.line_protocol import (
+    InvalidFieldValueError,
+    escape_key,
+    escape_measurement,
+    format_field_value
+)
+
+
+@pytest.fixture()
+def encoder():
+    return LineProtocolEncoder(
+        'cases',
+        tag_keys=['abbr', 'name'],
+        key_map={'name': 'jurisdiction', 'tot_cases': 'total_cases'},
+        ignored_keys=['burden_text'])
+
+
+def test_escape_measurement():
+    assert escape_measurement('my measurement,1=2') == 'my\\ measurement\\,1=2'
+
+
+def test_escape_key():
+    assert escape_key('a b,c=d') == 'a\\ b\\,c\\=d'
+    assert escape_key('line\nbreak') == 'line\\nbreak'
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, 'true'),
+    (False, 'false'),
+    (0, '0i'),
+    (-42, '-42i'),
+    (1.5, '1.5'),
+    (0.0, '0.0'),
+    (1e21, '1e+21'),
+    ('text', '"text"'),
+    ('say "hi" \\o/', '"say \\"hi\\" \\\\o/"'),
+    ('two\nlines\r', '"two\\nlines\\r"'),
+    (None, None),
+    (float('nan'), None),
+    (float('inf'), None),
+])
+def test_format_field_value(value, expected):
+    assert format_field_value(value) == expected
+
+
+def test_format_numpy_scalars():
+    numpy = pytest.importorskip('numpy')
+    assert format_field_value(numpy.int64(42)) == '42i'
+    assert format_field_value(numpy.uint8(7)) == '7i'
+    assert format_field_value(numpy.float32(1.5)) == '1.5'
+    assert format_field_value(numpy.float64(0.25)) == '0.25'
+    assert format_field_value(numpy.float32('nan')) is None
+
+
+def test_encode_record_multiline_string(encoder):
+    line = encoder.encode_record({'abbr': 'AK', 'note': 'first\nsecond'}, 1)
+    assert line == 'cases,abbr=AK note="first\\nsecond" 1'
+    assert '\n' not in line
+
+
+def test_encode(encoder):
+    line = encoder.encode(
+        {'state name': 'New York', 'empty': '', 'missing': None},
+        {'count': 3, 'rate': 0.5, 'note': 'a,b=c', 'ok': True, 'skip': None},
+        1678230480.9)
+    assert line == 'cases,state\\ name=New\\ York count=3i,rate=0.5,note="a,b=c",ok=true 1678230480'
+
+
+def test_encode_without_tags_or_timestamp(encoder):
+    assert encoder.encode({}, {'value': 1}) == 'cases value=1i'
+
+
+def test_encode_without_fields(encoder):
+    assert encoder.encode({'abbr': 'AK'}, {'value': None}) is None
+
+
+def test_encode_record(encoder):
+    record = {
+        'abbr': 'AK',
+        'tot_cases': 293766,
+        'new_deaths07': 0,
+        'burden_text': 'Low burden',
+        'name': 'Alaska, North',
+        'comment': 'ok',
+        'missing': None,
+    }
+    assert encoder.encode_record(record, 1678230480) == (
+        'cases,abbr=AK,jurisdiction=Alaska\\,\\ North '
+        'total_cases=293766i,new_deaths07=0i,comment="ok" 1678230480')
+
+
+def test_encode_record_field_keys_and_types():
+    encoder = LineProtocolEncoder(
+        'cases',
+        tag_keys=['abbr'],
+        field_keys=['incidence', 'tot_cases'],
+        field_types={'incidence': float, 'tot_cases': int})
+    record = {'abbr': 'AK', 'incidence': 40157, 'tot_cases': '293766', 'other': 1}
+    assert encoder.encode_record(record) == 'cases,abbr=AK incidence=40157.0,tot_cases=293766i'
+
+
+def test_encode_record_invalid_type():
+    encoder = LineProtocolEncoder('cases', field_types={'tot_cases': int})
+    with pytest.raises(InvalidFieldValueError):
+        encoder.encode_record({'tot_cases': 'n/a'})
+
+
+def test_plan_entry(encoder):
+    assert encoder.plan_entry('name') == (True, 'jurisdiction=', None)
+    assert encoder.plan_entry('new key') == (False, 'new\\ key=', None)
+    assert encoder.plan_entry('burden_text') == LineProtocolEncoder.IGNORE
+
+
+def test_encode_records_skips_empty(encoder):
+    records = [{'abbr': 'AK', 'tot_cases': 1}, {'abbr': 'AL'}, {'abbr': 'AR', 'tot_cases': 2}]
+    assert list(encoder.encode_records(records, 10)) == [
+        'cases,abbr=AK total_cases=1i 10',
+        'cases,abbr=AR total_cases=2i 10',
+    ]
+
+
+def test_encode_batch(encoder):
+    records = [{'abbr': 'AK', 'tot_cases': 1}, {'abbr': 'AL', 'name': 'Alabama', 'tot_cases': 2}]
+    assert encoder.encode_batch(records, 10) == (
+        b'cases,abbr=AK total_cases=1i 10\n'
+        b'cases,abbr=AL,jurisdiction=Alabama total_cases=2i 10')
+
+
+def test_encode_columns(encoder):
+    lines = encoder.encode_columns(
+        {'abbr': ['AK', 'AL', 'AR']},
+        {'cases': [1, 2, None], 'rate': [0.5, None, None]},
+        [10, 20, 30])
+    assert list(lines) == [
+        'cases,abbr=AK cases=1i,rate=0.5 10',
+        'cases,abbr=AL cases=2i 20',
+    ]
+
+
+def test_encode_columns_single_timestamp(encoder):
+    lines = encoder.encode_columns({}, {'cases': [1, 2]}, 10)
+    assert list(lines) == ['cases cases=1i 10', 'cases cases=2i 10']
@@ -0,0 +1,54 @@
+import pytest
+from data_processing.encoders import LineProtocolEncoder
+from data_processing.encoders.parallel import (
+    ParallelEncoder, chunked, default_context, encode_parallel)
+
+
+@pytest.fixture()
+def encoder():
+    return LineProtocolEncoder('cases', tag_keys=['abbr'], key_map={'tot_cases': 'total_cases'})
+
+
+@pytest.fixture()
+def records():
+    return [{'abbr': f'S{i:03d}', 'tot_cases': i, 'note': 'a b' if i % 7 else None}
+            for i in range(250)]
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
+
+def test_encode_ordered(encoder, records):
+    expected = list(encoder.encode_records(records, 1678230480))
+    with ParallelEncoder(encoder, workers=2, chunk_size=40, min_records=0) as parallel_encoder:
+        payloads = list(parallel_encoder.encode(records, 1678230480))
+        assert len(payloads) == 7
+        assert all(isinstance(payload, bytes) for payload in payloads)
+        assert b'\n'.join(payloads).decode('utf-8').split('\n') == expected
+        assert list(parallel_encoder.encode_lines(iter(records), 1678230480)) == expected
+
+
+def test_encode_unordered(encoder, records):
+    expected = list(encoder.encode_records(records, 1678230480))
+    with ParallelEncoder(encoder, workers=2, chunk_size=40, min_records=0) as parallel_encoder:
+        lines = list(parallel_encoder.encode_lines(records, 1678230480, ordered=False))
+    assert sorted(lines) == sorted(expected)
+
+
+def test_encode_small_payload_inline(encoder, records):
+    parallel_encoder = ParallelEncoder(encoder, workers=2, min_records=1000)
+    payloads = list(parallel_encoder.encode(records, 1678230480))
+    assert payloads == [encoder.encode_batch(records, 1678230480)]
+    assert parallel_encoder._executor is None
+    assert list(parallel_encoder.encode([], 1678230480)) == []
+
+
+def test_encode_parallel(encoder, records):
+    payloads = encode_parallel(encoder, records, workers=2, chunk_size=100)
+    assert b'\n'.join(payloads) == encoder.encode_batch(records)
+
+
+def test_default_context_does_not_fork():
+    assert default_context().get_start_method() in ('forkserver', 'spawn')
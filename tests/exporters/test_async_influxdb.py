@@ -0,0 +1,116 @@
+import asyncio
+import gzip
+import json
+import pytest
+from data_processing.exporters import AsyncInfluxDBAPIv2Exporter, WriteSpool
+from data_processing.exporters.influxdb import (
+    BucketAuthenticationError,
+    BucketDoesNotExistError
+)
+
+
+@pytest.fixture()
+def exporter(stub_server):
+    stub_server.set_response(
+        'GET', '/api/v2/buckets',
+        body=json.dumps({'buckets': [{'name': 'bar_bucket'}]}).encode())
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    exporter = AsyncInfluxDBAPIv2Exporter(
+        stub_server.url, 'foo_org', 'bar_bucket', 'baz_token', max_concurrency=3)
+    yield exporter
+    exporter.close()
+
+
+@pytest.fixture()
+def lines():
+    return [f'measurement,tag1=value{i} field={i}i {i}' for i in range(50)]
+
+
+def test_init(exporter):
+    assert exporter.org == 'foo_org'
+    assert exporter.bucket == 'bar_bucket'
+    assert exporter.max_concurrency == 3
+    assert exporter.base_url.endswith('/api/v2')
+
+
+def test_is_authenticated(exporter):
+    assert asyncio.run(exporter.is_authenticated) is True
+
+
+def test_is_authenticated_error(exporter, stub_server):
+    stub_server.set_response('GET', '/api/v2/buckets', status=401)
+    with pytest.raises(BucketAuthenticationError):
+        asyncio.run(exporter.is_authenticated)
+
+
+def test_bucket_does_not_exist_error(exporter, stub_server):
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": []}')
+    with pytest.raises(BucketDoesNotExistError):
+        asyncio.run(exporter.bucket_exists)
+
+
+def test_write_to_bucket(exporter, stub_server, lines):
+    data = '\n'.join(lines)
+    response = asyncio.run(exporter.write_to_bucket(data, precision='s'))
+    assert response.status_code == 204
+    write = stub_server.requests[-1]
+    assert write.path == '/api/v2/write?bucket=bar_bucket&org=foo_org&precision=s'
+    assert write.headers['Authorization'] == 'Token baz_token'
+    assert write.body.decode() == data
+
+
+def test_write_to_bucket_compressed(exporter, stub_server, lines):
+    exporter.compression_threshold = 0
+    data = '\n'.join(lines)
+    asyncio.run(exporter.write_to_bucket(data, compression='gzip'))
+    write = stub_server.requests[-1]
+    assert write.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(write.body).decode() == data
+
+
+def test_write_batches(exporter, stub_server, lines):
+    results = asyncio.run(exporter.write_batches(lines, max_lines=7))
+    assert [result.index for result in results] == list(range(8))
+    assert all(result.ok for result in results)
+    writes = [request for request in stub_server.requests if request.method == 'POST']
+    assert len(writes) == 8
+    received = b'\n'.join(request.body for request in writes).decode().split('\n')
+    assert sorted(received) == sorted(lines)
+    # Bucket check is cached, so only one GET for the whole export
+    assert len(stub_server.requests) == 9
+
+
+def test_write_invalidates_check_cache(exporter, stub_server, lines):
+    stub_server.set_response('POST', '/api/v2/write', status=404)
+    asyncio.run(exporter.write_to_bucket(lines[0]))
+    asyncio.run(exporter.write_to_bucket(lines[0]))
+    gets = [request for request in stub_server.requests if request.method == 'GET']
+    assert len(gets) == 2
+
+
+def test_write_batches_spool_and_replay(exporter, stub_server, lines, tmp_path):
+    exporter.spool = WriteSpool(str(tmp_path / 'spool'))
+    exporter.retries = 0
+    exporter.setup_session()
+    stub_server.set_response('POST', '/api/v2/write', status=503)
+    results = asyncio.run(exporter.write_batches(lines, max_lines=25))
+    assert [result.spooled for result in results] == [True, True]
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    assert exporter.replay_spool() == 2
+    assert exporter.spool.empty
+    replayed = b'\n'.join(request.body for request in stub_server.requests[-2:])
+    assert replayed.decode().split('\n') == lines
+
+
+@pytest.mark.parametrize('status', [None, 503])
+def test_write_batches_spools_when_bucket_check_fails(exporter, stub_server, lines, tmp_path, status):
+    exporter.spool = WriteSpool(str(tmp_path / 'spool'))
+    exporter.retries = 0
+    exporter.setup_session()
+    if status:
+        stub_server.set_response('GET', '/api/v2/buckets', status=status)
+    else:
+        stub_server.stop()
+    results = asyncio.run(exporter.write_batches(lines, max_lines=25))
+    assert [(result.ok, result.spooled) for result in results] == [(False, True)] * 2
+    assert not exporter.spool.empty
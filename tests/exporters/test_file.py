@@ -0,0 +1,87 @@
+import gzip
+import pytest
+from data_processing.exporters import LineProtocolFileExporter
+from data_processing.exporters.file import (
+    file_precision,
+    line_protocol_files,
+    read_line_protocol_files
+)
+from data_processing.exporters.influxdb import UnsupportedCompressionError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1678230480.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def lines():
+    return [f'cases,abbr=S{i} total={i}i {1678230480 + i}' for i in range(50)]
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+def test_write_batches(tmp_path, lines):
+    with LineProtocolFileExporter(str(tmp_path)) as exporter:
+        assert exporter.is_authenticated
+        results = exporter.write_batches(lines, precision='s', max_lines=20)
+    assert [result.lines for result in results] == [20, 20, 10]
+    assert all(result.ok for result in results)
+    assert all(result.data is None for result in results)
+    [path] = line_protocol_files(str(tmp_path))
+    assert results[0].response.path == path
+    assert path.endswith('-000001.s.lp')
+    assert file_precision(path) == 's'
+    with open(path) as line_file:
+        assert line_file.read() == '\n'.join(lines) + '\n'
+
+
+def test_write_to_bucket(tmp_path, lines):
+    with LineProtocolFileExporter(str(tmp_path)) as exporter:
+        response = exporter.write_to_bucket('\n'.join(lines))
+    assert response.status_code == 204
+    assert list(read_line_protocol_files(line_protocol_files(str(tmp_path)))) == lines
+
+
+def test_rotation_by_size_and_precision(tmp_path, lines):
+    with LineProtocolFileExporter(str(tmp_path), max_bytes=500) as exporter:
+        exporter.write_batches(lines, precision='s', max_lines=10)
+        exporter.write_batches(lines[:1], precision='ms')
+    paths = line_protocol_files(str(tmp_path))
+    assert len(paths) == len(exporter.paths) > 2
+    assert [file_precision(path) for path in paths][-2:] == ['s', 'ms']
+    assert list(read_line_protocol_files(paths)) == lines + lines[:1]
+
+
+def test_rotation_by_interval(tmp_path, lines, clock):
+    with LineProtocolFileExporter(str(tmp_path), rotate_interval=60, clock=clock) as exporter:
+        exporter.write_batches(lines[:10])
+        clock.now += 30
+        exporter.write_batches(lines[10:20])
+        clock.now += 30
+        exporter.write_batches(lines[20:])
+    assert len(exporter.paths) == 2
+
+
+def test_gzip(tmp_path, lines):
+    with LineProtocolFileExporter(str(tmp_path), compression='gzip') as exporter:
+        exporter.write_batches(lines, max_lines=7)
+        exporter.rotate()
+        exporter.write_batches(lines)
+    paths = line_protocol_files(str(tmp_path))
+    assert len(paths) == 2
+    assert all(path.endswith('.ms.lp.gz') for path in paths)
+    with gzip.open(paths[0], 'rt') as line_file:
+        assert line_file.read().split('\n')[:-1] == lines
+    assert list(read_line_protocol_files(paths)) == lines + lines
+
+
+def test_unsupported_compression(tmp_path):
+    with pytest.raises(UnsupportedCompressionError):
+        LineProtocolFileExporter(str(tmp_path), compression='deflate')
@@ -1,10 +1,19 @@
+import gzip
+import time
+import zlib
 import pytest
+import requests
 from unittest.mock import patch
-from data_processing.exporters import InfluxDBAPIv2Exporter
+from data_processing.exporters import InfluxDBAPIv2Exporter, WriteSpool
 from data_processing.exporters.influxdb import (
     BucketAuthenticationError,
-    BucketDoesNotExistError
+    BucketDoesNotExistError,
+    UnsupportedCompressionError,
+    batch_lines,
+    compress,
+    iter_lines
 )
+from tests.stub_server import StubHTTPServer
 
 
 @pytest.fixture()
@@ -48,6 +57,11 @@ def line_protocol_data():
     return line_protocol_data
 
 
+@pytest.fixture()
+def bucket_response_content():
+    return b'{"buckets": [{"id": "bcd994cde770d58d", "name": "bar_bucket"}]}'
+
+
 def test_init(scraper, request_object):
     assert scraper
     assert isinstance(scraper, InfluxDBAPIv2Exporter)
@@ -70,6 +84,16 @@ def test_init(scraper, request_object):
     assert scraper.auth(request_object).headers['Authorization'] == 'Token baz_token'
 
 
+def test_init_session_options():
+    exporter = InfluxDBAPIv2Exporter(
+        'http://localhost', 'foo_org', 'bar_bucket', 'baz_token',
+        pool_maxsize=32, timeout=(1, 2), retries=5)
+    adapter = exporter.session.get_adapter('http://localhost')
+    assert exporter.timeout == (1, 2)
+    assert adapter._pool_maxsize == 32
+    assert adapter.max_retries.total == 5
+
+
 def test_write_to_bucket_default(scraper_mock, line_protocol_data, response_object):
     assert scraper_mock.write_to_bucket
     assert scraper_mock.bucket
@@ -108,20 +132,64 @@ def test_write_to_bucket_with_precision(scraper_mock, line_protocol_data, respon
         )
 
 
-def test_write_to_bucket_with_compression(scraper_mock, line_protocol_data):
-    assert scraper_mock.write_to_bucket
-    assert scraper_mock.bucket
-    assert scraper_mock.org
-    with pytest.raises(NotImplementedError):
-        scraper_mock.write_to_bucket(line_protocol_data, compression=True)
+def test_write_to_bucket_with_compression(scraper_mock, line_protocol_data, response_object):
+    scraper_mock.compression_threshold = 0
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
+        scraper_mock.write_to_bucket(line_protocol_data, compression='gzip')
+        args, kwargs = mock.call_args
+        assert args == ('/write',)
+        assert kwargs['headers'] == {'Content-Encoding': 'gzip'}
+        assert gzip.decompress(kwargs['data']).decode() == line_protocol_data
 
 
-def test_write_to_bucket_with_precision_and_compression(scraper_mock, line_protocol_data):
-    assert scraper_mock.write_to_bucket
-    assert scraper_mock.bucket
-    assert scraper_mock.org
-    with pytest.raises(NotImplementedError):
+def test_write_to_bucket_with_precision_and_compression(scraper_mock, line_protocol_data, response_object):
+    scraper_mock.compression_threshold = 0
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
+        scraper_mock.write_to_bucket(line_protocol_data, precision='s', compression='deflate')
+        kwargs = mock.call_args.kwargs
+        assert kwargs['params']['precision'] == 's'
+        assert kwargs['headers'] == {'Content-Encoding': 'deflate'}
+        assert zlib.decompress(kwargs['data']).decode() == line_protocol_data
+
+
+def test_write_to_bucket_compression_true_is_gzip(scraper_mock, line_protocol_data, response_object):
+    scraper_mock.compression_threshold = 0
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
         scraper_mock.write_to_bucket(line_protocol_data, compression=True)
+        assert mock.call_args.kwargs['headers'] == {'Content-Encoding': 'gzip'}
+
+
+def test_write_to_bucket_compression_below_threshold(scraper_mock, line_protocol_data, response_object):
+    scraper_mock.compression_threshold = len(line_protocol_data) + 1
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
+        scraper_mock.write_to_bucket(line_protocol_data, compression='gzip')
+        mock.assert_called_once_with(
+            '/write',
+            params={'bucket': 'bar_bucket', 'org': 'foo_org', 'precision': 'ms'},
+            data=line_protocol_data
+        )
+
+
+def test_write_to_bucket_unsupported_compression(scraper_mock, line_protocol_data):
+    with pytest.raises(UnsupportedCompressionError):
+        scraper_mock.write_to_bucket(line_protocol_data, compression='brotli')
+
+
+def test_write_to_bucket_compressed_on_the_wire(scraper_mock, line_protocol_data):
+    scraper_mock.compression_threshold = 0
+    with StubHTTPServer() as server:
+        scraper_mock.base_url = f'{server.url}{scraper_mock.API_ROOT}'
+        response = scraper_mock.write_to_bucket(line_protocol_data, compression='gzip')
+    assert response.status_code == 200
+    request = server.requests[0]
+    assert request.headers['Content-Encoding'] == 'gzip'
+    assert int(request.headers['Content-Length']) == len(request.body)
+    assert gzip.decompress(request.body).decode() == line_protocol_data
+
+
+def test_compress_multiple_chunks(line_protocol_data):
+    data = compress(line_protocol_data * 10, 'gzip', level=9, chunk_size=7)
+    assert gzip.decompress(data).decode() == line_protocol_data * 10
 
 
 def test_is_authenticated(scraper, response_object):
@@ -150,3 +218,221 @@ def test_bucket_does_not_exist_error(scraper, response_object):
     with patch.object(scraper, 'get', return_value=response_object):
         with pytest.raises(BucketDoesNotExistError):
             scraper.bucket_exists
+
+
+def test_iter_lines_str_bytes_and_iterable():
+    expected = ['a 1', 'b 2', 'c 3']
+    assert list(iter_lines('a 1\nb 2\n\nc 3\n')) == expected
+    assert list(iter_lines(b'a 1\r\nb 2\nc 3')) == [line.encode() for line in expected]
+    assert list(iter_lines(iter(['a 1\n', '', 'b 2', 'c 3']))) == expected
+
+
+def test_batch_lines_max_lines():
+    batches = list(batch_lines('\n'.join(['m f=1'] * 5), max_lines=2))
+    assert batches == [(2, b'm f=1\nm f=1'), (2, b'm f=1\nm f=1'), (1, b'm f=1')]
+
+
+def test_batch_lines_max_bytes():
+    lines = ['m f=1', 'm f=22', 'm f=333', 'x' * 20]
+    batches = list(batch_lines(lines, max_bytes=12))
+    assert batches == [(2, b'm f=1\nm f=22'), (1, b'm f=333'), (1, b'x' * 20)]
+    assert all(len(data) <= 12 for _, data in batches[:-1])
+
+
+def test_write_batches(scraper_mock, line_protocol_data, response_object):
+    lines = [f'measurement,tag1=value{i} field=1 {i}' for i in range(25)]
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
+        results = scraper_mock.write_batches(lines, precision='s', max_lines=10, max_in_flight=2)
+    assert [result.lines for result in results] == [10, 10, 5]
+    assert [result.index for result in results] == [0, 1, 2]
+    assert all(result.ok for result in results)
+    assert mock.call_count == 3
+    sent = b'\n'.join(call.kwargs['data'] for call in mock.call_args_list)
+    assert sent.decode().split('\n') == lines
+    assert mock.call_args.kwargs['params']['precision'] == 's'
+
+
+def test_write_batches_records_errors(scraper_mock, response_object):
+    def post(endpoint, params=None, data=None):
+        if data.startswith(b'bad'):
+            raise requests.ConnectionError('connection reset')
+        return response_object
+
+    with patch.object(scraper_mock, 'post', side_effect=post):
+        results = scraper_mock.write_batches(['good f=1', 'bad f=1', 'good f=2'], max_lines=1)
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, requests.ConnectionError)
+    assert results[1].data == b'bad f=1'
+    # Sent batches do not keep their body
+    assert results[0].data is None and results[2].data is None
+
+
+def test_write_batches_against_server(scraper_mock):
+    lines = [f'measurement,tag1=value{i} field={i}i {i}' for i in range(100)]
+    scraper_mock.compression_threshold = 0
+    with StubHTTPServer() as server:
+        server.set_response('POST', '/api/v2/write', status=204, body=b'')
+        scraper_mock.base_url = f'{server.url}{scraper_mock.API_ROOT}'
+        results = scraper_mock.write_batches(
+            '\n'.join(lines), compression='gzip', max_lines=30, max_in_flight=3)
+    assert [result.response.status_code for result in results] == [204] * 4
+    received = sorted(gzip.decompress(request.body).decode() for request in server.requests)
+    assert sorted('\n'.join(received).split('\n')) == sorted(lines)
+
+
+def test_bucket_exists_is_cached(scraper, response_object, bucket_response_content):
+    response_object._content = bucket_response_content
+    with patch.object(scraper, 'get', return_value=response_object) as mock:
+        assert scraper.bucket_exists
+        assert scraper.bucket_exists
+        assert scraper.is_authenticated
+        assert mock.call_count == 1
+
+
+def test_check_cache_keyed_by_bucket(scraper, response_object, bucket_response_content):
+    response_object._content = bucket_response_content
+    with patch.object(scraper, 'get', return_value=response_object) as mock:
+        assert scraper.bucket_exists
+        scraper.bucket = 'other_bucket'
+        assert scraper.bucket_exists
+        assert mock.call_count == 2
+
+
+def test_check_cache_expires(scraper, response_object):
+    response_object.status_code = 200
+    scraper.check_ttl = 0.01
+    with patch.object(scraper, 'get', return_value=response_object) as mock:
+        assert scraper.is_authenticated
+        time.sleep(0.02)
+        assert scraper.is_authenticated
+        assert mock.call_count == 2
+
+
+def test_check_cache_disabled(scraper, response_object):
+    response_object.status_code = 200
+    scraper.check_ttl = 0
+    with patch.object(scraper, 'get', return_value=response_object) as mock:
+        assert scraper.is_authenticated
+        assert scraper.is_authenticated
+        assert mock.call_count == 2
+
+
+@pytest.mark.parametrize('status_code', [401, 404])
+def test_write_invalidates_check_cache(scraper, response_object, bucket_response_content,
+                                       line_protocol_data, status_code):
+    response_object._content = bucket_response_content
+    with patch.object(scraper, 'get', return_value=response_object) as mock_get:
+        with patch.object(scraper, 'post', return_value=response_object) as mock_post:
+            response_object.status_code = 204
+            scraper.write_to_bucket(line_protocol_data)
+            scraper.write_to_bucket(line_protocol_data)
+            assert mock_get.call_count == 1
+            assert mock_post.call_count == 2
+            response_object.status_code = status_code
+            scraper.write_to_bucket(line_protocol_data)
+            response_object.status_code = 200
+            scraper.write_to_bucket(line_protocol_data)
+            assert mock_get.call_count == 2
+
+
+@pytest.fixture()
+def spool(tmp_path):
+    return WriteSpool(str(tmp_path / 'spool'))
+
+
+def test_write_batches_spools_failures(scraper_mock, spool, response_object):
+    scraper_mock.spool = spool
+    lines = ['m f=1i', 'm f=2i', 'm f=3i']
+
+    def post(endpoint, params=None, data=None):
+        if data == b'm f=2i':
+            raise requests.ConnectionError('connection refused')
+        if data == b'm f=3i':
+            failed = requests.Response()
+            failed.status_code = 400
+            return failed
+        return response_object
+
+    with patch.object(scraper_mock, 'post', side_effect=post):
+        results = scraper_mock.write_batches(lines, precision='s', max_lines=1)
+    assert [result.spooled for result in results] == [False, True, False]
+    with patch.object(scraper_mock, 'post', return_value=response_object) as mock:
+        assert scraper_mock.replay_spool() == 1
+        mock.assert_called_once_with(
+            '/write',
+            params={'bucket': 'bar_bucket', 'org': 'foo_org', 'precision': 's'},
+            data=b'm f=2i')
+    assert spool.empty
+
+
+def test_write_batches_defers_when_unreachable(scraper, spool, stub_server):
+    scraper.spool = spool
+    scraper.retries = 0
+    scraper.setup_session()
+    stub_server.stop()
+    results = scraper.write_batches(['m f=1i', 'm f=2i'], max_lines=1)
+    assert all(result.spooled for result in results)
+    assert not spool.empty
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_write_batches_defers_when_bucket_check_unavailable(scraper, spool, stub_server, status):
+    scraper.spool = spool
+    scraper.base_url = f'{stub_server.url}{scraper.API_ROOT}'
+    scraper.retries = 0
+    scraper.setup_session()
+    stub_server.set_response('GET', '/api/v2/buckets', status=status, body=b'{}')
+    results = scraper.write_batches(['m f=1i', 'm f=2i'], max_lines=1)
+    assert all(result.spooled for result in results)
+    assert [request.path for request in stub_server.requests] == ['/api/v2/buckets?name=bar_bucket']
+
+
+def test_bucket_check_rejected_is_not_spooled(scraper, spool, response_object):
+    scraper.spool = spool
+    response_object.status_code = 400
+    with patch.object(scraper, 'get', return_value=response_object):
+        with pytest.raises(requests.HTTPError):
+            scraper.write_batches(['m f=1i'])
+    assert spool.empty
+
+
+def test_bucket_exists_error_status(scraper, response_object):
+    response_object.status_code = 500
+    response_object._content = b'{"buckets": []}'
+    with patch.object(scraper, 'get', return_value=response_object):
+        with pytest.raises(requests.HTTPError):
+            scraper.bucket_exists
+    response_object.status_code = 403
+    with patch.object(scraper, 'get', return_value=response_object):
+        with pytest.raises(BucketAuthenticationError):
+            scraper.bucket_exists
+
+
+def test_spool_replay_in_background(scraper_mock, spool, stub_server):
+    scraper_mock.spool = spool
+    scraper_mock.base_url = f'{stub_server.url}{scraper_mock.API_ROOT}'
+    stub_server.set_response('POST', '/api/v2/write', status=503)
+    scraper_mock.retries = 0
+    scraper_mock.setup_session()
+    results = scraper_mock.write_batches(['m f=1i', 'm f=2i'], max_lines=1)
+    assert all(result.spooled for result in results)
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    scraper_mock.start_spool_replay(interval=0.01)
+    for _ in range(200):
+        if spool.empty:
+            break
+        time.sleep(0.01)
+    scraper_mock.stop_spool_replay()
+    assert spool.empty
+    bodies = [request.body for request in stub_server.requests]
+    assert bodies[-2:] == [b'm f=1i', b'm f=2i']
+
+
+def test_spooled_batch_rejected_on_replay_is_dropped(scraper_mock, spool):
+    scraper_mock.spool = spool
+    spool.append(b'bad line', {'precision': 's'})
+    rejected = requests.Response()
+    rejected.status_code = 400
+    with patch.object(scraper_mock, 'post', return_value=rejected):
+        assert scraper_mock.replay_spool() == 1
+    assert spool.empty
@@ -0,0 +1,138 @@
+import pytest
+from data_processing.exporters import LineProtocolFileExporter, ShardedExporter
+from data_processing.exporters.file import line_protocol_files, read_line_protocol_files
+from data_processing.exporters.influxdb import BatchResult
+from data_processing.exporters.sharded import HashRing, UnknownShardError, series_key
+
+
+class RefusingExporter:
+    def write_batches(self, lines, precision='ms', compression=None, max_lines=None,
+                      max_bytes=None, max_in_flight=None):
+        return [BatchResult(0, len(lines), b'', error=ConnectionError('refused'))]
+
+
+class RaisingExporter:
+    def write_batches(self, lines, precision='ms', compression=None, max_lines=None,
+                      max_bytes=None, max_in_flight=None):
+        raise RuntimeError('bucket check failed')
+
+
+@pytest.fixture()
+def lines():
+    return [f'cases,abbr=S{i % 40:02d} total={i}i {1678230480 + i}' for i in range(200)]
+
+
+def file_shards(tmp_path, names):
+    return {name: LineProtocolFileExporter(str(tmp_path / name)) for name in names}
+
+
+def read_lines(directory):
+    return list(read_line_protocol_files(line_protocol_files(str(directory))))
+
+
+def test_series_key():
+    assert series_key('cases,abbr=AK total=1i 1') == b'cases,abbr=AK'
+    assert series_key(b'cases,name=New\\ York total=1i 1') == b'cases,name=New\\ York'
+    assert series_key('cases') == b'cases'
+
+
+def test_hash_ring_balance_and_movement():
+    keys = [f'cases,abbr=S{i}'.encode() for i in range(5000)]
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    before = {key: ring.node(key) for key in keys}
+    counts = [list(before.values()).count(node) for node in 'abcd']
+    assert min(counts) > 5000 / 4 * 0.7
+    ring.add('e')
+    after = {key: ring.node(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    # Only keys taken over by the new node move, about 1/5 of them
+    assert all(after[key] == 'e' for key in moved)
+    assert 0.1 < len(moved) / len(keys) < 0.3
+    ring.remove('e')
+    assert {key: ring.node(key) for key in keys} == before
+    assert len(ring) == 4
+
+
+def test_write_batches(tmp_path, lines):
+    exporter = ShardedExporter(file_shards(tmp_path, ['a', 'b', 'c']))
+    # One batch in flight per shard, so each shard's files are written in order
+    results = exporter.write_batches(lines, precision='s', max_lines=20, max_in_flight=1)
+    exporter.close()
+    assert all(result.ok for result in results)
+    assert all(result.data is None for result in results)
+    assert [result.index for result in results] == list(range(len(results)))
+    assert sum(result.lines for result in results) == 200
+    written = {name: read_lines(tmp_path / name) for name in 'abc'}
+    assert sorted(sum(written.values(), [])) == sorted(lines)
+    for name, shard_lines in written.items():
+        assert shard_lines
+        # A series always goes to the same shard, in order
+        assert all(exporter.shard_for(line) == name for line in shard_lines)
+        assert shard_lines == [line for line in lines if line in set(shard_lines)]
+    assert {result.shard for result in results} == {'a', 'b', 'c'}
+
+
+def test_replica(tmp_path, lines):
+    exporter = ShardedExporter(
+        file_shards(tmp_path, ['a', 'b']),
+        replica=LineProtocolFileExporter(str(tmp_path / 'replica')))
+    results = exporter.write_batches(lines, precision='s')
+    exporter.close()
+    assert {result.shard for result in results} == {'a', 'b'}
+    assert sorted(read_lines(tmp_path / 'replica')) == sorted(lines)
+    assert {result.shard for result in exporter.replica_results} == {'replica'}
+
+
+def test_replica_failure_not_returned(tmp_path, lines):
+    exporter = ShardedExporter(file_shards(tmp_path, ['a']), replica=RefusingExporter())
+    results = exporter.write_batches(lines, precision='s')
+    assert all(result.ok for result in results)
+    assert not exporter.replica_results[0].ok
+
+
+def test_shard_failure(tmp_path, lines):
+    exporter = ShardedExporter({**file_shards(tmp_path, ['a']), 'b': RefusingExporter()})
+    results = exporter.write_batches(lines, precision='s')
+    assert {result.shard for result in results if not result.ok} == {'b'}
+
+
+def test_raising_replica_and_shard(tmp_path, lines):
+    exporter = ShardedExporter(
+        {**file_shards(tmp_path, ['a']), 'b': RaisingExporter()}, replica=RaisingExporter())
+    results = exporter.write_batches(lines, precision='s')
+    failed = [result for result in results if not result.ok]
+    assert {result.shard for result in failed} == {'b'}
+    assert isinstance(failed[0].error, RuntimeError)
+    assert all(result.ok for result in results if result.shard == 'a')
+    assert sum(result.lines for result in results) == 200
+    assert read_lines(tmp_path / 'a')
+    assert exporter.replica_results
+    assert not any(result.ok for result in exporter.replica_results)
+
+
+def test_add_and_remove_shard(tmp_path, lines):
+    exporter = ShardedExporter(file_shards(tmp_path, ['a', 'b', 'c', 'd']))
+    before = {line: exporter.shard_for(line) for line in lines}
+    exporter.add_shard('e', LineProtocolFileExporter(str(tmp_path / 'e')))
+    moved = [line for line in lines if exporter.shard_for(line) != before[line]]
+    assert all(exporter.shard_for(line) == 'e' for line in moved)
+    exporter.remove_shard('e')
+    assert {line: exporter.shard_for(line) for line in lines} == before
+    with pytest.raises(UnknownShardError):
+        exporter.remove_shard('e')
+
+
+def test_from_config(tmp_path):
+    exporter = ShardedExporter.from_config({
+        'shards': {
+            'a': {'influx_url': 'http://a:8086', 'influx_org': 'org',
+                  'influx_bucket': 'bucket', 'influx_token': 'token'},
+            'b': {'type': 'file', 'directory': str(tmp_path / 'b')},
+        },
+        'replica': {'type': 'file', 'directory': str(tmp_path / 'replica')},
+        'vnodes': 10,
+    })
+    assert exporter.shards['a'].influxdb_url == 'http://a:8086'
+    assert isinstance(exporter.shards['b'], LineProtocolFileExporter)
+    assert isinstance(exporter.replica, LineProtocolFileExporter)
+    assert exporter.ring.vnodes == 10
@@ -0,0 +1,66 @@
+import pytest
+from data_processing.exporters import Snapshot, write_snapshot
+from data_processing.exporters.snapshot import SnapshotFormatError
+
+
+@pytest.fixture()
+def records():
+    return [
+        {'abbr': 'AK', 'fips': '02', 'tot_cases': 293766, 'rate': 61.7, 'ok': True,
+         'burden': 'Low'},
+        {'abbr': 'AL', 'fips': '01', 'tot_cases': None, 'rate': 2, 'ok': False,
+         'name': 'Alabama é'},
+        {'abbr': '', 'fips': '05', 'tot_cases': 0, 'rate': None, 'mixed': 'a'},
+    ]
+
+
+@pytest.fixture()
+def snapshot_path(tmp_path, records):
+    path = str(tmp_path / 'region.snap')
+    assert write_snapshot(path, records, tag_keys=['abbr', 'fips'],
+                          ignored_keys=['burden'], metadata={'updated': 'Mar 7'}) == 3
+    return path
+
+
+def test_columns(snapshot_path):
+    with Snapshot(snapshot_path) as snapshot:
+        assert snapshot.rows == 3
+        assert snapshot.metadata == {'updated': 'Mar 7'}
+        assert snapshot.columns == ['abbr', 'fips', 'tot_cases', 'rate', 'ok', 'name', 'mixed']
+        assert snapshot.tag_keys == ['abbr', 'fips']
+        assert [snapshot.kind(name) for name in snapshot.columns] == [
+            'str', 'str', 'int64', 'float64', 'bool', 'str', 'str']
+        tot_cases = snapshot.column('tot_cases')
+        assert tot_cases.format == 'q'
+        assert tot_cases.tolist() == [293766, 0, 0]
+        assert snapshot.null('tot_cases').tolist() == [0, 1, 0]
+        assert snapshot.column('fips')[2] == '05'
+        assert snapshot.column('name').tolist() == ['', 'Alabama é', '']
+        tot_cases.release()
+
+
+def test_iter_records(snapshot_path, records):
+    with Snapshot(snapshot_path) as snapshot:
+        assert list(snapshot.iter_records()) == [
+            {'abbr': 'AK', 'fips': '02', 'tot_cases': 293766, 'rate': 61.7, 'ok': True},
+            {'abbr': 'AL', 'fips': '01', 'rate': 2.0, 'ok': False, 'name': 'Alabama é'},
+            {'fips': '05', 'tot_cases': 0, 'mixed': 'a'},
+        ]
+
+
+def test_numpy_view(snapshot_path):
+    numpy = pytest.importorskip('numpy')
+    with Snapshot(snapshot_path) as snapshot:
+        view = snapshot.column('rate')
+        rates = numpy.asarray(view)
+        assert rates.dtype == numpy.float64
+        assert rates.tolist() == [61.7, 2.0, 0.0]
+        del rates
+        view.release()
+
+
+def test_invalid_snapshot(tmp_path):
+    path = tmp_path / 'bad.snap'
+    path.write_bytes(b'not a snapshot at all')
+    with pytest.raises(SnapshotFormatError):
+        Snapshot(str(path))
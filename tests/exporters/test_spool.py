@@ -0,0 +1,144 @@
+import os
+import threading
+import pytest
+from data_processing.exporters import WriteSpool
+from data_processing.exporters.spool import (
+    InvalidSpoolOptionError,
+    SpoolFullError
+)
+
+
+@pytest.fixture()
+def spool_dir(tmp_path):
+    return str(tmp_path / 'spool')
+
+
+@pytest.fixture()
+def spool(spool_dir):
+    spool = WriteSpool(spool_dir, segment_bytes=64)
+    yield spool
+    spool.close()
+
+
+def collect(spool, fail_after=None):
+    sent = []
+
+    def send(data, metadata):
+        if fail_after is not None and len(sent) >= fail_after:
+            return False
+        sent.append((data, metadata))
+        return True
+    return sent, send
+
+
+def test_append_and_drain(spool):
+    for i in range(5):
+        spool.append(f'm f={i}i'.encode() * 5, {'precision': 's', 'batch': i})
+    assert not spool.empty
+    assert len(os.listdir(spool.directory)) > 1
+    sent, send = collect(spool)
+    assert spool.drain(send) == 5
+    assert [metadata['batch'] for _, metadata in sent] == [0, 1, 2, 3, 4]
+    assert sent[0][0] == b'm f=0i' * 5
+    assert spool.empty
+    assert os.listdir(spool.directory) == []
+
+
+def test_drain_stops_at_failure_and_resumes(spool):
+    for i in range(4):
+        spool.append(str(i).encode() * 40)
+    sent, send = collect(spool, fail_after=1)
+    assert spool.drain(send) == 1
+    sent, send = collect(spool)
+    assert spool.drain(send) == 3
+    assert [data[:1] for data, _ in sent] == [b'1', b'2', b'3']
+
+
+def test_drain_resumes_within_segment_after_restart(spool_dir):
+    spool = WriteSpool(spool_dir, segment_bytes=1024)
+    for i in range(3):
+        spool.append(str(i).encode())
+    sent, send = collect(spool, fail_after=2)
+    assert spool.drain(send) == 2
+    spool.close()
+    reopened = WriteSpool(spool_dir)
+    sent, send = collect(reopened)
+    assert reopened.drain(send) == 1
+    assert sent[0][0] == b'2'
+
+
+def test_appends_during_drain_are_kept(spool):
+    spool.append(b'first')
+
+    def send(data, metadata):
+        spool.append(b'during')
+        return True
+
+    assert spool.drain(send) == 1
+    sent, send = collect(spool)
+    assert spool.drain(send) == 1
+    assert sent[0][0] == b'during'
+
+
+def test_torn_tail_is_ignored(spool_dir):
+    spool = WriteSpool(spool_dir, segment_bytes=1024)
+    spool.append(b'complete')
+    spool.append(b'torn record')
+    spool.close()
+    segment = os.path.join(spool_dir, os.listdir(spool_dir)[0])
+    with open(segment, 'r+b') as segment_file:
+        segment_file.truncate(os.path.getsize(segment) - 3)
+    sent, send = collect(spool)
+    assert WriteSpool(spool_dir).drain(send) == 1
+    assert sent[0][0] == b'complete'
+
+
+def test_evict_oldest_when_full(spool_dir):
+    spool = WriteSpool(spool_dir, max_bytes=200, segment_bytes=50)
+    for i in range(10):
+        spool.append(str(i).encode() * 30)
+    assert spool.size <= 200
+    assert spool.evicted
+    sent, send = collect(spool)
+    spool.drain(send)
+    assert sent[-1][0] == b'9' * 30
+    assert sent[0][0] != b'0' * 30
+
+
+def test_block_when_full_raises_after_timeout(spool_dir):
+    spool = WriteSpool(spool_dir, max_bytes=100, on_full='block', block_timeout=0.05)
+    spool.append(b'x' * 60)
+    with pytest.raises(SpoolFullError):
+        spool.append(b'y' * 60)
+
+
+def test_block_when_full_waits_for_drain(spool_dir):
+    spool = WriteSpool(spool_dir, max_bytes=100, on_full='block', block_timeout=5)
+    spool.append(b'x' * 60)
+    timer = threading.Timer(0.05, spool.drain, args=(lambda data, metadata: True,))
+    timer.start()
+    spool.append(b'y' * 60)
+    timer.join()
+    sent, send = collect(spool)
+    assert spool.drain(send) == 1
+    assert sent[0][0] == b'y' * 60
+
+
+def test_record_larger_than_spool(spool_dir):
+    with pytest.raises(SpoolFullError):
+        WriteSpool(spool_dir, max_bytes=10).append(b'x' * 20)
+
+
+@pytest.mark.parametrize('options', [{'fsync': 'sometimes'}, {'on_full': 'panic'}])
+def test_invalid_options(spool_dir, options):
+    with pytest.raises(InvalidSpoolOptionError):
+        WriteSpool(spool_dir, **options)
+
+
+@pytest.mark.parametrize('fsync', ['always', 'segment', 'never'])
+def test_fsync_policies(spool_dir, fsync):
+    spool = WriteSpool(spool_dir, fsync=fsync, segment_bytes=10)
+    spool.append(b'a' * 20)
+    spool.append(b'b' * 20)
+    sent, send = collect(spool)
+    assert spool.drain(send) == 2
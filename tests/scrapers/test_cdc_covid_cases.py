@@ -1,5 +1,9 @@
+import json
+import pickle
 import pytest
+from data_processing.encoders import DeltaFilter
 from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.scrapers.cdc_covid_cases import CDCRegionRecord
 
 
 @pytest.fixture()
@@ -9,104 +13,22 @@ def scraper(measurement='measurement_name'):
 
 
 @pytest.fixture()
-def mock_data():
-    """Mock data returned from CDC Covid Data API"""
-    data = {}
-    data['CSVInfo'] = {
-        'filename': 'US_MAP_DATA',
-        'update': 'Mar  7 2023  3:08PM',
-        'disclaimer': 'Case and Death data updated as of Mar  7 2023  3:08PM.  Testing data updated as of Mar  7 2023  3:11PM',
-        'fieldpropertymap': [
-            {'abbr': 'abbr'},
-            {'fips': 'fips'},
-            {'name': 'jurisdiction'},
-            {'tot_cases': 'Total Cases'},
-            {'tot_death': 'Total Death'},
-            {'death_100k': 'Death_100k'},
-            {'new_cases07': 'CasesInLast7Days'},
-            {'new_deaths07': 'DeathsInLast7Days'},
-            {'Seven_day_avg_new_cases_per_100k': 'Seven_day_avg_new_cases_per_100k'},
-            {'Seven_day_avg_new_deaths_per_100k': 'Seven_day_avg_new_deaths_per_100k'},
-            {'Seven_day_cum_new_cases_per_100k': 'Seven_day_cum_new_cases_per_100k'},
-            {'Seven_day_cum_new_deaths_per_100k': 'Seven_day_cum_new_deaths_per_100k'},
-            {'incidence': 'RatePer100000'},
-            {'us_trend_new_case': 'us_trend_new_case'},
-            {'us_trend_new_death': 'us_trend_new_death'}
-        ]
-    }
-    data['US_MAP_DATA'] = [
-        {
-            'abbr': 'AK',
-            'tot_cases': 293766,
-            'new_cases07': 451,
-            'new_deaths07': 0,
-            'Seven_day_cum_new_cases_per_100k': 61.7,
-            'Seven_day_cum_new_deaths_per_100k': 0.0,
-            'tot_death': 1449,
-            'death_100k': 198,
-            'incidence': 40157,
-            'id': 2,
-            'fips': '02',
-            'name': 'Alaska',
-            'us_trend_maxdate': '2023-03-01',
-        },
-        {
-            'abbr': 'AL',
-            'tot_cases': 1642062,
-            'new_cases07': 3714,
-            'new_deaths07': 69,
-            'Seven_day_cum_new_cases_per_100k': 75.7,
-            'Seven_day_cum_new_deaths_per_100k': 1.4,
-            'tot_death': 21001,
-            'death_100k': 428,
-            'incidence': 33490,
-            'id': 1,
-            'fips': '01',
-            'name': 'Alabama',
-            'us_trend_maxdate': '2023-03-01',
-        },
-        {
-            'abbr': 'AR',
-            'tot_cases': 1004753,
-            'new_cases07': 1252,
-            'new_deaths07': 23,
-            'Seven_day_cum_new_cases_per_100k': 41.5,
-            'Seven_day_cum_new_deaths_per_100k': 0.8,
-            'tot_death': 12980,
-            'death_100k': 430,
-            'incidence': 33294,
-            'id': 5,
-            'fips': '05',
-            'name': 'Arkansas',
-            'us_trend_maxdate': '2023-03-01',
-        },
-        {
-            'abbr': 'USA',
-            'tot_cases': 103499382,
-            'new_cases07': 226620,
-            'new_deaths07': 2290,
-            'Seven_day_cum_new_cases_per_100k': 68.3,
-            'Seven_day_cum_new_deaths_per_100k': 0.7,
-            'tot_death': 1117856,
-            'death_100k': 336,
-            'incidence': 31175,
-            'id': 0,
-            'fips': '00',
-            'name': 'United States of America',
-            'us_trend_maxdate': '2023-03-01',
-        }
+def region_records(mock_data):
+    """mock_data regions as kept in region_data: without ignored keys"""
+    return [
+        {key: value for key, value in record.items() if key not in CDCCovidCasesScraper.IGNORED_KEYS}
+        for record in mock_data['US_MAP_DATA']
     ]
-    return data
 
 
 @pytest.fixture
 def line_protocol_lines():
     """Mock line protocol data to match mock_data"""
     line_protocol_lines = [
-        'measurement_name,abbr=AK,fips=02,jurisdiction=Alaska total_cases=293766,cases_7_days=451,Seven_day_cum_new_cases_per_100k=61.7,total_deaths=1449,death_per_100k=198,rate_per_100k=40157,id=2 1678230480',
-        'measurement_name,abbr=AL,fips=01,jurisdiction=Alabama total_cases=1642062,cases_7_days=3714,deaths_7_days=69,Seven_day_cum_new_cases_per_100k=75.7,Seven_day_cum_new_deaths_per_100k=1.4,total_deaths=21001,death_per_100k=428,rate_per_100k=33490,id=1 1678230480',
-        'measurement_name,abbr=AR,fips=05,jurisdiction=Arkansas total_cases=1004753,cases_7_days=1252,deaths_7_days=23,Seven_day_cum_new_cases_per_100k=41.5,Seven_day_cum_new_deaths_per_100k=0.8,total_deaths=12980,death_per_100k=430,rate_per_100k=33294,id=5 1678230480',
-        'measurement_name,abbr=USA,fips=00,jurisdiction=United\\ States\\ of\\ America total_cases=103499382,cases_7_days=226620,deaths_7_days=2290,Seven_day_cum_new_cases_per_100k=68.3,Seven_day_cum_new_deaths_per_100k=0.7,total_deaths=1117856,death_per_100k=336,rate_per_100k=31175 1678230480',
+        'measurement_name,abbr=AK,fips=02,jurisdiction=Alaska total_cases=293766i,cases_7_days=451i,deaths_7_days=0i,Seven_day_cum_new_cases_per_100k=61.7,Seven_day_cum_new_deaths_per_100k=0.0,total_deaths=1449i,death_per_100k=198.0,rate_per_100k=40157.0,id=2i 1678230480',
+        'measurement_name,abbr=AL,fips=01,jurisdiction=Alabama total_cases=1642062i,cases_7_days=3714i,deaths_7_days=69i,Seven_day_cum_new_cases_per_100k=75.7,Seven_day_cum_new_deaths_per_100k=1.4,total_deaths=21001i,death_per_100k=428.0,rate_per_100k=33490.0,id=1i 1678230480',
+        'measurement_name,abbr=AR,fips=05,jurisdiction=Arkansas total_cases=1004753i,cases_7_days=1252i,deaths_7_days=23i,Seven_day_cum_new_cases_per_100k=41.5,Seven_day_cum_new_deaths_per_100k=0.8,total_deaths=12980i,death_per_100k=430.0,rate_per_100k=33294.0,id=5i 1678230480',
+        'measurement_name,abbr=USA,fips=00,jurisdiction=United\\ States\\ of\\ America total_cases=103499382i,cases_7_days=226620i,deaths_7_days=2290i,Seven_day_cum_new_cases_per_100k=68.3,Seven_day_cum_new_deaths_per_100k=0.7,total_deaths=1117856i,death_per_100k=336.0,rate_per_100k=31175.0,id=0i 1678230480',
     ]
     return line_protocol_lines
 
@@ -164,7 +86,7 @@ def test_init(scraper):
     ]
 
 
-def test_update(scraper, mock_data, line_protocol_lines):
+def test_update(scraper, mock_data, region_records, line_protocol_lines):
     scraper.data = mock_data
     assert scraper.data
     scraper.update()
@@ -172,7 +94,9 @@ def test_update(scraper, mock_data, line_protocol_lines):
     assert scraper.region_data
     assert scraper.line_protocol_lines == line_protocol_lines
     assert scraper.metadata == mock_data['CSVInfo']
-    assert scraper.region_data == mock_data['US_MAP_DATA']
+    assert scraper.region_data == region_records
+    assert all(isinstance(record, CDCRegionRecord) for record in scraper.region_data)
+    assert scraper.data['US_MAP_DATA'] is scraper.region_data
     assert scraper.line_protocol_data == '\n'.join(scraper.line_protocol_lines)
 
 
@@ -190,3 +114,158 @@ def test_reset(scraper, mock_data):
     assert not scraper.region_data
     assert not scraper.line_protocol_lines
     assert not scraper.line_protocol_data
+
+
+@pytest.fixture()
+def streaming_scraper(stub_server, mock_data, measurement='measurement_name'):
+    stub_server.set_response('GET', '/getAjaxData', body=json.dumps(mock_data).encode())
+    scraper = CDCCovidCasesScraper(measurement, stream=True)
+    scraper.url = f'{stub_server.url}/getAjaxData?id=US_MAP_DATA'
+    scraper.chunk_size = 64
+    return scraper
+
+
+def test_iter_line_protocol_lines(scraper, mock_data, line_protocol_lines):
+    scraper.data = mock_data
+    assert list(scraper.iter_line_protocol_lines()) == line_protocol_lines
+
+
+def test_iter_line_protocol_lines_streaming(streaming_scraper, mock_data, line_protocol_lines):
+    assert list(streaming_scraper.iter_line_protocol_lines()) == line_protocol_lines
+    assert streaming_scraper.metadata == mock_data['CSVInfo']
+    assert not streaming_scraper.region_data
+    assert not streaming_scraper.line_protocol_lines
+
+
+def test_iter_line_protocol_lines_streaming_records_first(
+        streaming_scraper, stub_server, mock_data, line_protocol_lines):
+    reordered = {'US_MAP_DATA': mock_data['US_MAP_DATA'], 'CSVInfo': mock_data['CSVInfo']}
+    stub_server.set_response('GET', '/getAjaxData', body=json.dumps(reordered).encode())
+    assert list(streaming_scraper.iter_line_protocol_lines()) == line_protocol_lines
+
+
+def test_update_streaming(streaming_scraper, region_records, line_protocol_lines):
+    streaming_scraper.update()
+    assert streaming_scraper.region_data == region_records
+    assert streaming_scraper.line_protocol_lines == line_protocol_lines
+
+
+def test_update_unchanged(stub_server, mock_data, tmp_path, line_protocol_lines):
+    stub_server.set_response('GET', '/getAjaxData', body=json.dumps(mock_data).encode())
+    scraper = CDCCovidCasesScraper('measurement_name', cache_dir=str(tmp_path))
+    scraper.url = f'{stub_server.url}/getAjaxData?id=US_MAP_DATA'
+    scraper.update()
+    assert scraper.changed
+    assert scraper.line_protocol_lines == line_protocol_lines
+    scraper.commit()
+    scraper.reset()
+    scraper.update()
+    assert not scraper.changed
+    assert not scraper.region_data
+    assert not scraper.line_protocol_lines
+
+
+def test_update_delta(mock_data, tmp_path, line_protocol_lines):
+    state_path = str(tmp_path / 'delta.json')
+    scraper = CDCCovidCasesScraper('measurement_name', delta_state_path=state_path)
+    scraper.data = mock_data
+    scraper.update()
+    assert scraper.line_protocol_lines == line_protocol_lines
+    scraper.commit_delta()
+    scraper.reset()
+    mock_data['US_MAP_DATA'][0]['tot_cases'] += 1
+    scraper.data = mock_data
+    scraper.update()
+    assert len(scraper.line_protocol_lines) == 1
+    assert scraper.line_protocol_lines[0].startswith('measurement_name,abbr=AK,')
+
+
+def test_iter_line_protocol_lines_streaming_delta(
+        streaming_scraper, tmp_path, line_protocol_lines):
+    streaming_scraper.delta = DeltaFilter(str(tmp_path / 'delta.json'))
+    assert list(streaming_scraper.iter_line_protocol_lines()) == line_protocol_lines
+    streaming_scraper.commit_delta()
+    streaming_scraper.reset()
+    assert list(streaming_scraper.iter_line_protocol_lines()) == []
+
+
+def test_update_columnar(mock_data, line_protocol_lines):
+    pytest.importorskip('numpy')
+    scraper = CDCCovidCasesScraper('measurement_name', columnar=True)
+    scraper.data = mock_data
+    scraper.update()
+    assert scraper.line_protocol_lines == line_protocol_lines
+    assert scraper.region_columns.total('tot_cases') == sum(
+        record['tot_cases'] for record in mock_data['US_MAP_DATA'])
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_field_types_stable_across_regions(mock_data, columnar):
+    if columnar:
+        pytest.importorskip('numpy')
+    mock_data['US_MAP_DATA'][0]['death_100k'] = 0
+    mock_data['US_MAP_DATA'][1]['death_100k'] = 0.7
+    scraper = CDCCovidCasesScraper('measurement_name', columnar=columnar)
+    scraper.data = mock_data
+    scraper.update()
+    assert 'death_per_100k=0.0,' in scraper.line_protocol_lines[0]
+    assert 'death_per_100k=0.7,' in scraper.line_protocol_lines[1]
+    assert 'total_cases=293766i,' in scraper.line_protocol_lines[0]
+
+
+def test_snapshot_round_trip(scraper, mock_data, tmp_path, line_protocol_lines):
+    scraper.data = mock_data
+    scraper.update()
+    path = str(tmp_path / 'cdc.snap')
+    scraper.save_snapshot(path)
+    offline = CDCCovidCasesScraper('measurement_name')
+    offline.load_snapshot(path)
+    offline.update()
+    assert offline.metadata == mock_data['CSVInfo']
+    assert offline.line_protocol_lines == line_protocol_lines
+
+
+def test_update_parallel(mock_data, line_protocol_lines):
+    scraper = CDCCovidCasesScraper('measurement_name', encode_workers=2, encode_chunk_size=3)
+    scraper.parallel_encoder.min_records = 0
+    scraper.data = mock_data
+    try:
+        scraper.update()
+    finally:
+        scraper.close()
+    assert scraper.line_protocol_lines == line_protocol_lines
+    assert scraper.parallel_encoder._executor is None
+
+
+def test_region_record_converts_numeric_strings(scraper, mock_data, line_protocol_lines):
+    alaska = dict(mock_data['US_MAP_DATA'][0], tot_cases='293766', new_cases07='451',
+                  Seven_day_cum_new_cases_per_100k='61.7')
+    mock_data['US_MAP_DATA'][0] = alaska
+    scraper.data = mock_data
+    scraper.update()
+    record = scraper.region_data[0]
+    assert record['tot_cases'] == 293766
+    assert record['fips'] == '02'
+    assert not hasattr(record, '__dict__')
+    assert scraper.line_protocol_lines == line_protocol_lines
+
+
+def test_backfill_and_live_types_match(
+        scraper, streaming_scraper, stub_server, mock_data, line_protocol_lines):
+    # A field added upstream, outside FIELD_TYPES, is typed by the record
+    alaska = dict(mock_data['US_MAP_DATA'][0], tot_cases='293766', death_100k='198',
+                  Seven_day_cum_new_cases_per_100k='61.7', new_metric='5')
+    mock_data['US_MAP_DATA'][0] = alaska
+    line_protocol_lines[0] = line_protocol_lines[0].replace(' 1678230480', ',new_metric=5i 1678230480')
+    stub_server.set_response('GET', '/getAjaxData', body=json.dumps(mock_data).encode())
+    assert list(scraper.page_lines('2023-03-07', mock_data)) == line_protocol_lines
+    assert list(streaming_scraper.iter_line_protocol_lines()) == line_protocol_lines
+    scraper.data = mock_data
+    scraper.update()
+    assert scraper.line_protocol_lines == line_protocol_lines
+
+
+def test_region_record_pickle(scraper, mock_data):
+    scraper.data = mock_data
+    scraper.update()
+    assert pickle.loads(pickle.dumps(scraper.region_data)) == scraper.region_data
@@ -0,0 +1,80 @@
+import copy
+import json
+import pytest
+from data_processing import registry
+from data_processing.base.fan_out import FanOutError
+from data_processing.scrapers import CDCCovidCasesFanOutScraper, CDCCovidCasesScraper
+
+
+@pytest.fixture()
+def bodies(mock_data):
+    """mock_data split into two bodies: the second was updated earlier
+    and repeats USA with other values
+    """
+    alaska, alabama, arkansas, usa = mock_data['US_MAP_DATA']
+    older = dict(mock_data['CSVInfo'], update='Mar  6 2023  3:08PM')
+    return {
+        'states_a': {'CSVInfo': mock_data['CSVInfo'], 'US_MAP_DATA': [alaska, alabama, usa]},
+        'states_b': {'CSVInfo': older, 'US_MAP_DATA': [arkansas, dict(usa, tot_cases=1)]},
+    }
+
+
+@pytest.fixture()
+def fan_out_scraper(stub_server, bodies):
+    def respond(method, path, headers, body):
+        data_id = path.split('id=')[1]
+        if data_id not in bodies:
+            return 404, {}, b''
+        return 200, {'Content-Type': 'application/json'}, json.dumps(bodies[data_id]).encode()
+
+    stub_server.responses[('GET', '/getAjaxData')] = respond
+    return CDCCovidCasesFanOutScraper(
+        'measurement_name', ['states_a', 'states_b'], url=f'{stub_server.url}/getAjaxData')
+
+
+def test_update_merges_bodies(fan_out_scraper, stub_server, mock_data):
+    fan_out_scraper.update()
+    assert sorted(request.path for request in stub_server.requests) == [
+        '/getAjaxData?id=states_a', '/getAjaxData?id=states_b']
+    # The same lines as one body with every region, in target order
+    alaska, alabama, arkansas, usa = mock_data['US_MAP_DATA']
+    reference = CDCCovidCasesScraper('measurement_name')
+    reference.data = {'CSVInfo': mock_data['CSVInfo'],
+                      'US_MAP_DATA': copy.deepcopy([alaska, alabama, usa, arkansas])}
+    reference.update()
+    assert fan_out_scraper.line_protocol_lines == reference.line_protocol_lines
+    assert fan_out_scraper.metadata == mock_data['CSVInfo']
+    assert [region['abbr'] for region in fan_out_scraper.region_data] == ['AK', 'AL', 'USA', 'AR']
+    assert fan_out_scraper.region_data[2]['tot_cases'] == 103499382
+
+
+def test_iter_line_protocol_lines_after_reset(fan_out_scraper, stub_server):
+    lines = list(fan_out_scraper.iter_line_protocol_lines())
+    assert len(lines) == 4
+    fan_out_scraper.reset()
+    assert list(fan_out_scraper.iter_line_protocol_lines()) == lines
+    assert len(stub_server.requests) == 4
+
+
+def test_partial_failure(fan_out_scraper, stub_server):
+    fan_out_scraper.targets['missing'] = {'id': 'missing'}
+    with pytest.raises(FanOutError):
+        fan_out_scraper.update()
+    fan_out_scraper.allow_partial = True
+    fan_out_scraper.reset()
+    fan_out_scraper.update()
+    assert len(fan_out_scraper.line_protocol_lines) == 4
+    assert list(fan_out_scraper.errors) == ['missing']
+
+
+def test_all_targets_failed(stub_server):
+    stub_server.set_response('GET', '/missing', status=404)
+    scraper = CDCCovidCasesFanOutScraper(
+        'measurement_name', ['missing'], url=f'{stub_server.url}/missing', allow_partial=True)
+    scraper.update()
+    assert not scraper.changed
+    assert scraper.line_protocol_lines == []
+
+
+def test_registered():
+    assert registry.scrapers.resolve('CDCCovidCasesFanOutScraper') is CDCCovidCasesFanOutScraper
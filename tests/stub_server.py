@@ -0,0 +1,124 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RecordedRequest:
+    """Request received by StubHTTPServer"""
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class StubHTTPServer:
+    """Threaded local HTTP server for tests and benchmarks. Records every
+    request and replies with canned (status, headers, body) responses keyed
+    by (method, path without query). bandwidth (bytes/s) and latency
+    (seconds) optionally simulate a slow link.
+    """
+
+    DEFAULT_RESPONSE = (200, {'Content-Type': 'application/json'}, b'{}')
+
+    def __init__(self, responses=None, bandwidth=None, latency=0.0):
+        self.responses = responses or {}
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.01},
+            daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def set_response(self, method, path, status=200, headers=None, body=b'{}'):
+        if headers is None:
+            headers = {'Content-Type': 'application/json'}
+        self.responses[(method, path)] = (status, headers, body)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _respond(self, handler):
+        body = handler.read_body()
+        path = handler.path.split('?', 1)[0]
+        with self._lock:
+            self.requests.append(RecordedRequest(
+                handler.command,
+                handler.path,
+                dict(handler.headers),
+                body))
+        delay = self.latency
+        if self.bandwidth:
+            delay += len(body) / self.bandwidth
+        response = self.responses.get((handler.command, path), self.DEFAULT_RESPONSE)
+        if callable(response):
+            response = response(handler.command, handler.path, handler.headers, body)
+        status, headers, content = response
+        if self.bandwidth:
+            delay += len(content) / self.bandwidth
+        if delay:
+            time.sleep(delay)
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Don't let Nagle delay bodies written after the headers
+            disable_nagle_algorithm = True
+
+            def read_body(self):
+                if self.headers.get('Transfer-Encoding') == 'chunked':
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if not size:
+                            self.rfile.readline()
+                            return b''.join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length)
+
+            def do_GET(self):
+                stub._respond(self)
+
+            def do_PUT(self):
+                stub._respond(self)
+
+            def do_POST(self):
+                stub._respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
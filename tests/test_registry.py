@@ -0,0 +1,76 @@
+import subprocess
+import sys
+import pytest
+from data_processing import registry
+from data_processing.exporters import InfluxDBAPIv2Exporter, LineProtocolFileExporter
+from data_processing.registry import Registry, UnknownPluginError
+from data_processing.scrapers import CDCCovidCasesScraper
+
+
+def test_resolve_registered_names():
+    assert registry.scrapers.resolve('CDCCovidCasesScraper') is CDCCovidCasesScraper
+    assert registry.exporters.resolve('influxdb') is InfluxDBAPIv2Exporter
+    assert registry.exporters.resolve('file') is LineProtocolFileExporter
+
+
+def test_resolve_paths():
+    assert registry.exporters.resolve(
+        'data_processing.exporters.influxdb.InfluxDBAPIv2Exporter') is InfluxDBAPIv2Exporter
+    assert registry.exporters.resolve(
+        'data_processing.exporters.file:LineProtocolFileExporter') is LineProtocolFileExporter
+
+
+def test_resolve_unknown():
+    plugins = Registry('widget', 'data_processing.tests.widgets', {'a': 'json:dumps'})
+    with pytest.raises(UnknownPluginError, match=r"Unknown widget 'b'. Known widgets: \['a'\]"):
+        plugins.resolve('b')
+
+
+def test_register():
+    plugins = Registry('widget', 'data_processing.tests.widgets')
+    plugins.register('lazy', 'json:dumps')
+    plugins.register('eager', dict)
+    assert plugins.names() == ['eager', 'lazy']
+    import json
+    assert plugins.resolve('lazy') is json.dumps
+    assert plugins.resolve('eager') is dict
+
+
+def imported_modules(statement):
+    code = f'import sys; {statement}; print(" ".join(sys.modules))'
+    output = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+@pytest.mark.parametrize('statement', [
+    'import data_processing.ui.cli',
+    'import data_processing.base',
+    'import data_processing.encoders',
+    'import data_processing.exporters',
+    'import data_processing.scrapers',
+])
+def test_lazy_package_imports(statement):
+    modules = imported_modules(statement)
+    assert not modules & {'requests', 'urllib3', 'numpy', 'yaml'}
+
+
+def test_scraper_imports_optional_modules_lazily():
+    modules = imported_modules('from data_processing.scrapers import CDCCovidCasesScraper')
+    assert 'data_processing.scrapers.cdc_covid_cases' in modules
+    assert not modules & {
+        'data_processing.encoders.parallel', 'data_processing.exporters.snapshot',
+        'concurrent.futures.process', 'mmap'}
+
+
+def test_metrics_imports_encoder_lazily():
+    modules = imported_modules('from data_processing.base import Metrics')
+    assert 'data_processing.base.metrics' in modules
+    assert 'data_processing.encoders' not in modules
+
+
+def test_lazy_package_attribute():
+    modules = imported_modules('from data_processing.encoders import LineProtocolEncoder')
+    assert 'data_processing.encoders.line_protocol' in modules
+    assert 'data_processing.encoders.columns' not in modules
+    assert 'numpy' not in modules
@@ -0,0 +1,101 @@
+import gzip
+import json
+import pytest
+import requests
+from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.ui.api import LatestResults, Resource, ResultsServer
+
+
+@pytest.fixture()
+def regions(mock_data):
+    """Regions as served: without the scraper's ignored keys"""
+    return [
+        {key: value for key, value in record.items() if key not in CDCCovidCasesScraper.IGNORED_KEYS}
+        for record in mock_data['US_MAP_DATA']
+    ]
+
+
+@pytest.fixture()
+def scraper(stub_server, mock_data, tmp_path):
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    scraper = CDCCovidCasesScraper('covid_cases', cache_dir=str(tmp_path))
+    scraper.url = f'{stub_server.url}/cdc'
+    return scraper
+
+
+@pytest.fixture()
+def server(scraper):
+    with ResultsServer(scraper, port=0) as server:
+        yield server
+
+
+def test_resource():
+    resource = Resource(b'x' * 2000)
+    assert resource.etag.startswith('"') and resource.etag.endswith('"')
+    assert gzip.decompress(resource.gzip_body) == resource.body
+    assert Resource(b'{}').gzip_body is None
+
+
+def test_latest_results_index(scraper, regions):
+    scraper.update()
+    results = LatestResults.from_scraper(scraper)
+    alaska = regions[0]
+    assert json.loads(results.get('/regions/AK').body) == alaska
+    assert results.get('/regions/02') is results.get('/regions/AK')
+    assert results.get('/regions/ZZ') is None
+
+
+def test_not_ready(server):
+    response = requests.get(f'{server.url}/regions')
+    assert response.status_code == 503
+
+
+def test_serves_latest_results(server, mock_data, regions):
+    assert server.update()
+    session = requests.Session()
+    response = session.get(f'{server.url}/regions')
+    assert response.status_code == 200
+    assert response.json() == regions
+    response = session.get(f'{server.url}/regions/al')
+    assert response.json()['name'] == 'Alabama'
+    response = session.get(f'{server.url}/regions.lp')
+    assert response.headers['Content-Type'].startswith('text/plain')
+    assert len(response.text.split('\n')) == 4
+    assert session.get(f'{server.url}/metadata').json()['CSVInfo'] == mock_data['CSVInfo']
+    assert session.get(f'{server.url}/nope').status_code == 404
+
+
+def test_serves_gzip(server, stub_server, mock_data):
+    # Enough regions for a body over the gzip threshold
+    mock_data['US_MAP_DATA'] *= 3
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    assert server.update()
+    response = requests.get(f'{server.url}/regions')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(response.json()) == 12
+
+
+def test_etag(server):
+    server.update()
+    response = requests.get(f'{server.url}/regions/AK')
+    etag = response.headers['ETag']
+    response = requests.get(f'{server.url}/regions/AK', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert not response.content
+
+
+def test_update_unchanged_keeps_results(server, stub_server):
+    assert server.update()
+    results = server.results
+    assert not server.update()
+    assert server.results is results
+    assert server.updates == 1
+
+
+def test_update_from_cache_in_new_process(server, scraper, tmp_path):
+    assert server.update()
+    fresh = CDCCovidCasesScraper('covid_cases', cache_dir=str(tmp_path))
+    fresh.url = scraper.url
+    with ResultsServer(fresh, port=0) as restarted:
+        assert restarted.update()
+        assert restarted.results.get('/regions/AK')
@@ -0,0 +1,329 @@
+import json
+import threading
+import pytest
+from data_processing.exporters import InfluxDBAPIv2Exporter
+from data_processing.exporters.file import line_protocol_files, read_line_protocol_files
+from data_processing.registry import UnknownPluginError
+from data_processing.scrapers import CDCCovidCasesScraper
+from data_processing.ui.cli import (
+    InvalidJobConfigError,
+    Job,
+    Scheduler,
+    build_scheduler,
+    load_config,
+    main
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeJob:
+    def __init__(self, name, interval, block=None):
+        self.name = name
+        self.interval = interval
+        self.block = block
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.closed = False
+
+    def run(self):
+        self.runs += 1
+        if self.block:
+            self.block.wait(5)
+
+    def close(self):
+        self.closed = True
+
+
+def wait_idle(*jobs):
+    for _ in range(1000):
+        if not any(job.running for job in jobs):
+            return
+        threading.Event().wait(0.001)
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def job_config():
+    return {
+        'name': 'cdc_cases',
+        'scraper': 'CDCCovidCasesScraper',
+        'scraper_options': {'measurement': 'covid_cases'},
+        'interval': 60,
+        'exporter': {
+            'influx_url': 'http://localhost:8086',
+            'influx_org': 'foo_org',
+            'influx_bucket': 'bar_bucket',
+            'influx_token': 'baz_token',
+            'https_verify': False,
+            'options': {'retries': 1},
+        },
+    }
+
+
+def test_job_from_config_unknown_exporter_type(job_config):
+    job_config['exporter']['type'] = 'carrier_pigeon'
+    with pytest.raises(UnknownPluginError, match='carrier_pigeon'):
+        Job.from_config(job_config)
+
+
+def test_job_from_config_dotted_scraper(job_config):
+    job_config['scraper'] = 'data_processing.scrapers.cdc_covid_cases:CDCCovidCasesScraper'
+    job = Job.from_config(job_config)
+    assert isinstance(job.scraper, CDCCovidCasesScraper)
+
+
+def test_job_from_config(job_config):
+    job = Job.from_config(job_config)
+    assert job.name == 'cdc_cases'
+    assert job.interval == 60.0
+    assert job.precision == 's'
+    assert isinstance(job.scraper, CDCCovidCasesScraper)
+    assert job.scraper.measurement == 'covid_cases'
+    assert isinstance(job.exporter, InfluxDBAPIv2Exporter)
+    assert job.exporter.bucket == 'bar_bucket'
+    assert job.exporter.verify is False
+    assert job.exporter.retries == 1
+
+
+def test_job_from_config_fan_out_scraper(job_config):
+    job_config['scraper'] = 'CDCCovidCasesFanOutScraper'
+    job_config['scraper_options']['targets'] = ['US_MAP_DATA', {'id': 'other'}]
+    job = Job.from_config(job_config)
+    assert job.scraper.targets == {0: {'id': 'US_MAP_DATA'}, 1: {'id': 'other'}}
+    assert job.scraper.measurement == 'covid_cases'
+
+
+def test_job_from_config_spool(job_config, tmp_path):
+    job_config['exporter']['spool_dir'] = str(tmp_path / 'spool')
+    job_config['exporter']['spool_options'] = {'fsync': 'never'}
+    job = Job.from_config(job_config)
+    assert job.exporter.spool.fsync == 'never'
+    assert job.exporter._replay_thread.is_alive()
+    job.close()
+    assert job.exporter._replay_thread is None
+
+
+def test_job_from_config_spool_file(job_config, tmp_path):
+    job_config['exporter'] = {
+        'type': 'file', 'directory': str(tmp_path / 'lines'), 'spool_dir': str(tmp_path / 'spool')}
+    with pytest.raises(InvalidJobConfigError, match='file does not support spool_dir'):
+        Job.from_config(job_config)
+
+
+def test_job_from_config_spool_sharded(job_config, tmp_path):
+    shard = dict(job_config['exporter'])
+    job_config['exporter'] = {
+        'type': 'sharded',
+        'shards': {'a': shard, 'b': dict(shard, influx_url='http://localhost:8087')},
+        'spool_dir': str(tmp_path / 'spool'),
+    }
+    with pytest.raises(InvalidJobConfigError, match='sharded does not support spool_dir'):
+        Job.from_config(job_config)
+    assert not (tmp_path / 'spool').exists()
+
+
+@pytest.mark.parametrize('key', ['scraper', 'interval', 'exporter'])
+def test_job_from_config_missing_key(job_config, key):
+    del job_config[key]
+    with pytest.raises(InvalidJobConfigError):
+        Job.from_config(job_config)
+
+
+def test_job_from_config_missing_exporter_key(job_config):
+    del job_config['exporter']['influx_token']
+    with pytest.raises(InvalidJobConfigError):
+        Job.from_config(job_config)
+
+
+def test_scheduler_runs_due_jobs_in_order(clock):
+    fast = FakeJob('fast', 10)
+    slow = FakeJob('slow', 30)
+    scheduler = Scheduler([fast, slow], workers=2, clock=clock)
+    assert scheduler.run_pending() == 10
+    wait_idle(fast, slow)
+    clock.now += 10
+    assert scheduler.run_pending() == 10
+    wait_idle(fast, slow)
+    clock.now += 20
+    assert scheduler.run_pending() == 10
+    scheduler.stop()
+    assert fast.runs == 3
+    assert slow.runs == 2
+    assert fast.closed and slow.closed
+
+
+def test_scheduler_skips_overlapping_runs(clock):
+    block = threading.Event()
+    job = FakeJob('slow', 10, block=block)
+    scheduler = Scheduler([job], workers=2, clock=clock)
+    scheduler.run_pending()
+    clock.now += 10
+    scheduler.run_pending()
+    clock.now += 10
+    scheduler.run_pending()
+    assert job.skipped == 2
+    block.set()
+    scheduler.stop()
+    assert job.runs == 1
+    assert not job.running
+
+
+def test_scheduler_does_not_catch_up_missed_ticks(clock):
+    job = FakeJob('job', 10)
+    scheduler = Scheduler([job], clock=clock)
+    scheduler.run_pending()
+    wait_idle(job)
+    clock.now += 100
+    assert scheduler.run_pending() == 10
+    scheduler.stop()
+    assert job.runs == 2
+
+
+def test_scheduler_serve_and_stop():
+    job = FakeJob('job', 0.01)
+    scheduler = Scheduler([job])
+    thread = threading.Thread(target=scheduler.serve)
+    thread.start()
+    threading.Event().wait(0.1)
+    scheduler.stop()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert job.runs >= 2
+
+
+def test_job_run_end_to_end(stub_server, mock_data, job_config):
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": [{"name": "bar_bucket"}]}')
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    job_config['exporter']['influx_url'] = stub_server.url
+    job = Job.from_config(job_config)
+    job.scraper.url = f'{stub_server.url}/cdc'
+    results = job.run()
+    results += job.run()
+    assert [result.lines for result in results] == [4, 4]
+    paths = [request.path.split('?')[0] for request in stub_server.requests]
+    # The bucket check is cached after the first run
+    assert paths == ['/api/v2/buckets', '/cdc', '/api/v2/write', '/cdc', '/api/v2/write']
+    assert job.runs == 2
+
+
+def test_job_run_delta(stub_server, mock_data, job_config, tmp_path):
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": [{"name": "bar_bucket"}]}')
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    job_config['exporter']['influx_url'] = stub_server.url
+    job_config['scraper_options']['delta_state_path'] = str(tmp_path / 'delta.json')
+    job = Job.from_config(job_config)
+    job.scraper.url = f'{stub_server.url}/cdc'
+    assert [result.lines for result in job.run()] == [4]
+    # Nothing changed, so the second run writes nothing
+    assert job.run() == []
+
+
+def test_job_run_reexports_after_failed_write(stub_server, mock_data, job_config, tmp_path):
+    stub_server.set_response('GET', '/cdc', headers={'ETag': '"v1"'},
+                             body=json.dumps(mock_data).encode())
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": [{"name": "bar_bucket"}]}')
+    stub_server.set_response('POST', '/api/v2/write', status=400, body=b'{}')
+    job_config['exporter']['influx_url'] = stub_server.url
+    job_config['scraper_options']['cache_dir'] = str(tmp_path)
+    job = Job.from_config(job_config)
+    job.scraper.url = f'{stub_server.url}/cdc'
+    assert [result.ok for result in job.run()] == [False]
+    # The failed write left the response uncommitted, so it is exported again
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    assert [result.lines for result in job.run()] == [4]
+    assert job.run() == []
+
+
+def test_job_run_exports_metrics(stub_server, mock_data, job_config):
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": [{"name": "bar_bucket"}]}')
+    stub_server.set_response('POST', '/api/v2/write', status=204, body=b'')
+    job_config['exporter']['influx_url'] = stub_server.url
+    metrics_config = dict(job_config['exporter'], influx_bucket='metrics')
+    scheduler = build_scheduler({'jobs': [job_config], 'metrics': metrics_config})
+    [job] = scheduler.jobs
+    job.scraper.url = f'{stub_server.url}/cdc'
+    job.run()
+    scheduler.stop()
+    write = stub_server.requests[-1]
+    assert 'bucket=metrics' in write.path
+    assert 'precision=ns' in write.path
+    stages = [line.split(',')[2] for line in write.body.decode().split('\n')]
+    assert stages == [
+        'stage=http_request', 'stage=fetch', 'stage=decode', 'stage=encode',
+        'stage=http_request']
+
+
+def test_job_file_exporter(stub_server, mock_data, job_config, tmp_path):
+    stub_server.set_response('GET', '/cdc', body=json.dumps(mock_data).encode())
+    job_config['exporter'] = {'type': 'file', 'directory': str(tmp_path), 'options': {'compression': 'gzip'}}
+    job = Job.from_config(job_config)
+    job.scraper.url = f'{stub_server.url}/cdc'
+    assert [result.lines for result in job.run()] == [4]
+    job.close()
+    [path] = line_protocol_files(str(tmp_path))
+    assert len(list(read_line_protocol_files([path]))) == 4
+
+
+def test_job_file_exporter_missing_directory(job_config):
+    job_config['exporter'] = {'type': 'file'}
+    with pytest.raises(InvalidJobConfigError):
+        Job.from_config(job_config)
+
+
+def test_load_config_and_build_scheduler(tmp_path, job_config):
+    config_path = tmp_path / 'jobs.yaml'
+    config_path.write_text(json.dumps({'workers': 2, 'jobs': [job_config]}))
+    config = load_config(str(config_path))
+    scheduler = build_scheduler(config)
+    assert [job.name for job in scheduler.jobs] == ['cdc_cases']
+    assert scheduler.executor._max_workers == 2
+    scheduler.stop()
+
+
+def test_main_once(tmp_path, stub_server, job_config):
+    # The bucket check fails before the job would reach the real CDC URL;
+    # the failure is logged and main still returns
+    stub_server.set_response('GET', '/api/v2/buckets', body=b'{"buckets": []}')
+    job_config['exporter']['influx_url'] = stub_server.url
+    config_path = tmp_path / 'jobs.yaml'
+    config_path.write_text(json.dumps({'jobs': [job_config]}))
+    main([str(config_path), '--once'])
+    assert [request.path for request in stub_server.requests] == ['/api/v2/buckets?name=bar_bucket']
+
+
+def test_main_backfill(tmp_path, stub_server, mock_data, job_config):
+    body = json.dumps(mock_data).encode()
+    for day in ('2023-03-06', '2023-03-07'):
+        stub_server.set_response('GET', f'/archive/{day}', body=body)
+    job_config['scraper_options']['page_url_template'] = f'{stub_server.url}/archive/{{page}}'
+    job_config['exporter'] = {'type': 'file', 'directory': str(tmp_path / 'lines')}
+    config_path = tmp_path / 'jobs.yaml'
+    config_path.write_text(json.dumps({'jobs': [job_config]}))
+    checkpoint_path = tmp_path / 'backfill.json'
+    main([str(config_path), '--backfill', 'cdc_cases', '--start', '2023-03-06',
+          '--end', '2023-03-07', '--checkpoint', str(checkpoint_path)])
+    assert json.loads(checkpoint_path.read_text())['next'] == 2
+    paths = line_protocol_files(str(tmp_path / 'lines'))
+    assert len(list(read_line_protocol_files(paths))) == 8
+
+
+def test_main_backfill_unknown_job(tmp_path, job_config):
+    config_path = tmp_path / 'jobs.yaml'
+    config_path.write_text(json.dumps({'jobs': [job_config]}))
+    with pytest.raises(InvalidJobConfigError):
+        main([str(config_path), '--backfill', 'nope', '--start', '2023-03-06', '--end', '2023-03-07'])